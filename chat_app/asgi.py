@@ -2,6 +2,9 @@
 ASGI config for chat_app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections (live reaction counts at
+``/ws/profiles/<id>/``) are handled by ``core.realtime``. Serve it with an
+ASGI server such as uvicorn or daphne to enable WebSockets.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -12,5 +15,20 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chat_app.settings')
+# Route the read views to their async versions (core/async_views.py)
+os.environ.setdefault('ASYNC_VIEWS', '1')
+# Async requests run their queries in per-request threads, so a connection
+# kept open after the request would never be reused (see settings.py)
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from core.realtime import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -48,11 +48,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack; inert unless
+    # REQUEST_METRICS_ENABLED is set
+    'core.instrumentation.RequestMetricsMiddleware',
+    # Development aid, inert unless NPLUSONE_DETECT (defaults to DEBUG)
+    'core.nplusone.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.CurrentProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +93,16 @@ load_dotenv(BASE_DIR / '.env')
 
 DB_CONNECTION = os.getenv('DB_CONNECTION', 'sqlite').lower()
 
+# Persistent connections: seconds a connection is kept open for reuse by
+# later requests of the same worker thread (0 closes it after every request,
+# empty keeps it forever). Health checks ping a reused connection once per
+# request and reconnect if the server dropped it. Django's MySQL backend has
+# no built-in pool, so this is the pool: one connection per worker thread,
+# i.e. size it with the server's thread/process count. chat_app/asgi.py
+# defaults it to 0, since async requests don't reuse worker threads.
+DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '60')
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1'
+
 if DB_CONNECTION == 'mysql':
     DATABASES = {
         'default': {
@@ -96,16 +112,37 @@ if DB_CONNECTION == 'mysql':
             'PASSWORD': os.getenv('DB_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', '127.0.0.1'),
             'PORT': os.getenv('DB_PORT', '3306'),
+            'OPTIONS': {
+                # Seconds to wait for the server before failing the request
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+            },
         }
     }
 else:
+    # WAL lets readers run alongside the single writer; synchronous=NORMAL is
+    # durable under WAL except for the last commits on power loss. Writers
+    # take the write lock up front (IMMEDIATE) and wait up to DB_TIMEOUT
+    # seconds for it instead of failing with "database is locked".
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / os.getenv('DB_DATABASE', 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': ';'.join([
+                    f"PRAGMA journal_mode={os.getenv('DB_SQLITE_JOURNAL_MODE', 'WAL')}",
+                    f"PRAGMA synchronous={os.getenv('DB_SQLITE_SYNCHRONOUS', 'NORMAL')}",
+                    'PRAGMA temp_store=MEMORY',
+                    f"PRAGMA cache_size=-{int(os.getenv('DB_SQLITE_CACHE_KIB', '20000'))}",
+                ]),
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': float(os.getenv('DB_TIMEOUT', '5')),
+            },
         }
     }
 
+DATABASES['default']['CONN_MAX_AGE'] = int(DB_CONN_MAX_AGE) if DB_CONN_MAX_AGE else None
+DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -126,6 +163,23 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing (core/hashers.py). PASSWORD_PBKDF2_ITERATIONS sets the
+# PBKDF2 cost (0 = Django's default); after a change each user's hash is
+# upgraded at their next login. PASSWORD_HASHER=md5 puts a fast, insecure
+# hasher first, for throwaway environments such as load tests only: its
+# hashes stop verifying once it is switched off. Tests always use MD5.
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '0'))
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if os.getenv('PASSWORD_HASHER', '').lower() == 'md5':
+    PASSWORD_HASHERS.insert(0, 'django.contrib.auth.hashers.MD5PasswordHasher')
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -157,3 +211,106 @@ LOGOUT_REDIRECT_URL = '/'  # where to go after logout
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Profile directory pagination (keyset on UserProfile.id).
+# Clients may opt into a different size with ?page_size=, capped at the max.
+PROFILE_PAGE_SIZE = int(os.getenv('PROFILE_PAGE_SIZE', '20'))
+PROFILE_MAX_PAGE_SIZE = int(os.getenv('PROFILE_MAX_PAGE_SIZE', '100'))
+
+# Sharded reaction counters for hot profiles. 0 updates UserProfile counters
+# directly; N > 0 spreads each profile's counter writes over N shard rows that
+# `manage.py flush_reaction_shards` folds back periodically.
+REACTION_COUNTER_SHARDS = int(os.getenv('REACTION_COUNTER_SHARDS', '0'))
+
+# Caching
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Defaults to a per-process LRU (LocMemCache evicts once MAX_ENTRIES is hit);
+# point CACHE_BACKEND/CACHE_LOCATION at e.g. Redis or Memcached to share it.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', 'chat-app'),
+    }
+}
+if CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000')),
+    }
+
+# Cache alias and lifetime (seconds) for profile snapshots, the user ->
+# profile mapping and per-viewer reaction state (see core/cache.py)
+PROFILE_CACHE_ALIAS = os.getenv('PROFILE_CACHE_ALIAS', 'default')
+PROFILE_CACHE_TIMEOUT = int(os.getenv('PROFILE_CACHE_TIMEOUT', '300'))
+
+# Profile pictures: uploads are downscaled to PROFILE_IMAGE_MAX_DIMENSION
+# and a PROFILE_THUMBNAIL_SIZE square thumbnail (WebP, or JPEG when Pillow
+# lacks WebP) is rendered on the background worker pool (core/tasks.py).
+PROFILE_IMAGE_MAX_DIMENSION = int(os.getenv('PROFILE_IMAGE_MAX_DIMENSION', '1600'))
+PROFILE_IMAGE_MAX_PIXELS = int(os.getenv('PROFILE_IMAGE_MAX_PIXELS', '40000000'))
+PROFILE_THUMBNAIL_SIZE = int(os.getenv('PROFILE_THUMBNAIL_SIZE', '200'))
+PROFILE_THUMBNAIL_FORMAT = os.getenv('PROFILE_THUMBNAIL_FORMAT', 'WEBP')
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '2'))
+BACKGROUND_TASKS_ASYNC = os.getenv('BACKGROUND_TASKS_ASYNC', '1') == '1'
+# Uploads above this many bytes are rejected while streaming (core/uploads.py)
+PROFILE_IMAGE_MAX_UPLOAD_SIZE = int(os.getenv('PROFILE_IMAGE_MAX_UPLOAD_SIZE', str(10 * 1024 * 1024)))
+
+# Maximum number of profile ids accepted by the bulk reaction-state endpoint
+REACTION_STATE_MAX_IDS = int(os.getenv('REACTION_STATE_MAX_IDS', '100'))
+
+# Longest range (days) served by the per-profile daily reaction series
+REACTION_SERIES_MAX_DAYS = int(os.getenv('REACTION_SERIES_MAX_DAYS', '366'))
+
+# Daily reaction rollups (core/rollups.py) are buffered per process and
+# written this many seconds after the first buffered change
+ROLLUP_FLUSH_SECONDS = float(os.getenv('ROLLUP_FLUSH_SECONDS', '10'))
+
+# "Most liked" / "most loved" boards (core/leaderboard.py): how many
+# profiles each keeps and how often the cached top-K is rebuilt (seconds)
+LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', '100'))
+LEADERBOARD_REFRESH_SECONDS = int(os.getenv('LEADERBOARD_REFRESH_SECONDS', '300'))
+
+# Direct messages (core/chat.py)
+CHAT_MESSAGE_MAX_LENGTH = int(os.getenv('CHAT_MESSAGE_MAX_LENGTH', '2000'))
+
+# Profile and user deletion (core/deletion.py): rows are hidden at once and
+# purged on the background worker pool, this many per DELETE statement.
+DELETION_BATCH_SIZE = int(os.getenv('DELETION_BATCH_SIZE', '1000'))
+
+# Rate limits (core/ratelimit.py): token buckets of 'count/period' per scope.
+# Reactions are limited per user and per user and profile, which stops
+# like/unlike hammering on one profile before it contends for its row lock;
+# chat messages per sender.
+# The default backend counts per process; RATELIMIT_BACKEND=
+# core.ratelimit.CacheTokenBuckets shares buckets through RATELIMIT_CACHE_ALIAS.
+RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', '1') == '1'
+RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'core.ratelimit.LocalTokenBuckets')
+RATELIMIT_CACHE_ALIAS = os.getenv('RATELIMIT_CACHE_ALIAS', 'default')
+RATELIMIT_LOCAL_MAX_KEYS = int(os.getenv('RATELIMIT_LOCAL_MAX_KEYS', '10000'))
+RATELIMITS = {
+    'react-user': os.getenv('RATELIMIT_REACT_USER', '120/m'),
+    'react-profile': os.getenv('RATELIMIT_REACT_PROFILE', '10/10s'),
+    'chat-send': os.getenv('RATELIMIT_CHAT_SEND', '30/m'),
+}
+
+# Live updates over WebSockets (core/pubsub.py, core/realtime.py). The
+# in-process broker only reaches clients connected to the same ASGI process.
+PUBSUB_BACKEND = os.getenv('PUBSUB_BACKEND', 'core.pubsub.InProcessBroker')
+REALTIME_MAX_UPDATES_PER_SECOND = float(os.getenv('REALTIME_MAX_UPDATES_PER_SECOND', '4'))
+
+# Per-request timing, SQL and cache metrics (core/instrumentation.py):
+# Server-Timing headers plus per-view histograms at /core/metrics/ (staff)
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', '0') == '1'
+
+# N+1 query detector (core/nplusone.py): reports query shapes repeated
+# NPLUSONE_THRESHOLD times in one request; NPLUSONE_RAISE turns reports
+# into errors. The test runner enables it for every test run.
+NPLUSONE_DETECT = os.getenv('NPLUSONE_DETECT', '1' if DEBUG else '0') == '1'
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', '3'))
+NPLUSONE_RAISE = os.getenv('NPLUSONE_RAISE', '0') == '1'
+TEST_RUNNER = 'core.test_runner.DetectingTestRunner'
+
+# Serve the read-heavy profile pages and reaction JSON with the async views
+# in core/async_views.py. chat_app/asgi.py turns this on by default; under
+# WSGI the sync views avoid a thread hop per request.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _repair_fulltext(using, **kwargs):
+    from django.db import connections
+
+    from .search import repair_fulltext_triggers
+    repair_fulltext_triggers(connections[using])
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        post_migrate.connect(_repair_fulltext, sender=self)
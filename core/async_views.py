@@ -0,0 +1,132 @@
+"""Async versions of the read-heavy views, served under ASGI.
+
+Selected in ``core/urls.py`` when ``ASYNC_VIEWS`` is on. They await the
+async ORM and cache APIs instead of blocking a worker thread per request;
+only the reaction write and the shard lookups still run through
+``sync_to_async``. Rendering, validators and responses are shared with the
+sync views in ``core/views.py``.
+
+Everything a template or helper touches synchronously (``request.user``,
+the session and ``request.profile``) is resolved with awaits up front, so
+nothing falls back to a blocking query on the event loop.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect, render
+
+from . import cache as profile_cache
+from . import models
+from .conditional import not_modified, set_validators
+from .middleware import aget_current_profile, aget_current_profile_id
+from .pagination import akeyset_page, get_cursor, get_page_size
+from .ratelimit import ratelimit, user_profile_key
+from .reactions import include_pending_counts
+from .views import (
+    PROFILE_LIST_FIELDS, detail_validators, is_ajax_request, list_validators,
+    reaction_state_response, record_reaction, _reaction_error, _reaction_limited, _reaction_response,
+)
+
+
+async def _prepare(request):
+    """Load the user, session and current profile without blocking."""
+    request.user = await request.auser()
+    await aget_current_profile(request)
+
+
+@login_required
+async def profile_view(request):
+    await _prepare(request)
+    page_size = get_page_size(request)
+    after = get_cursor(request)
+    profiles, next_cursor = await akeyset_page(
+        models.UserProfile.objects.visible().only(*PROFILE_LIST_FIELDS),
+        after=after, size=page_size,
+    )
+    await sync_to_async(include_pending_counts)(profiles)
+
+    etag, last_modified = list_validators(request, profiles, page_size, after, next_cursor)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    response = render(request, 'core/profile.html', {
+        'profiles': profiles,
+        'my_profile': await aget_current_profile_id(request),
+        'page_size': page_size,
+        'after': after,
+        'next_cursor': next_cursor,
+    })
+    return set_validators(request, response, etag, last_modified)
+
+
+@login_required
+async def view_profile(request, pk):
+    """Show a single profile with options to edit or delete."""
+    await _prepare(request)
+    profile = await profile_cache.aget_profile(pk)
+    if profile is None:
+        raise Http404('No UserProfile matches the given query.')
+    await sync_to_async(include_pending_counts)([profile])
+    my_reaction = await profile_cache.aget_reaction(request.user.pk, pk)
+
+    etag, last_modified = detail_validators(request, profile, my_reaction)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    response = render(request, 'core/profile_detail.html', {'profile': profile, 'my_reaction': my_reaction})
+    return set_validators(request, response, etag, last_modified)
+
+
+@login_required
+async def my_profile(request):
+    """Redirect the current user to their own profile detail, or to create one."""
+    await _prepare(request)
+    profile_id = await aget_current_profile_id(request)
+    if profile_id:
+        return redirect('view_profile', pk=profile_id)
+    messages.info(request, "You don't have a profile yet. Let's create one.")
+    return redirect('create_profile')
+
+
+@login_required
+@ratelimit('react-profile', key=user_profile_key, limited=_reaction_limited)
+@ratelimit('react-user', limited=_reaction_limited)
+async def react_profile(request, pk):
+    """Async counterpart of ``views.react_profile``.
+
+    Reads are served from the async cache/ORM; the write goes through the
+    same ``record_reaction`` as the sync view, in a worker thread.
+    """
+    await _prepare(request)
+    is_ajax = is_ajax_request(request)
+
+    if request.method != 'POST':
+        if is_ajax and request.method in ('GET', 'HEAD'):
+            return await _reaction_state(request, pk)
+        if is_ajax:
+            return JsonResponse({'error': 'Method not allowed'}, status=405)
+        return redirect('view_profile', pk=pk)
+
+    try:
+        state = await sync_to_async(record_reaction)(request.user, pk, request.POST.get('reaction'))
+    except models.UserProfile.DoesNotExist:
+        raise Http404('No UserProfile matches the given query.')
+    except ValidationError as e:
+        return _reaction_error(request, pk, e, is_ajax)
+    return _reaction_response(pk, state, is_ajax)
+
+
+async def _reaction_state(request, pk):
+    profile = await profile_cache.aget_profile(pk)
+    if profile is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    await sync_to_async(include_pending_counts)([profile])
+    state = {
+        'likes_count': profile.likes_count,
+        'loves_count': profile.loves_count,
+        'dislikes_count': profile.dislikes_count,
+        'my_reaction': await profile_cache.aget_reaction(request.user.pk, pk),
+    }
+    return reaction_state_response(request, pk, state)
@@ -0,0 +1,153 @@
+"""Read-through cache for profile pages.
+
+Three kinds of entries live in the cache selected by ``PROFILE_CACHE_ALIAS``:
+
+- ``profile``: the ``UserProfile`` snapshot shown on the detail page,
+- ``user_profile``: the user id -> profile id mapping,
+- ``reaction``: a viewer's reaction on a profile (or None).
+
+Views invalidate entries explicitly when they change the underlying rows.
+Hit/miss counters are kept per kind and exposed through ``stats()``. The
+``a``-prefixed functions are the async-ORM equivalents for async views.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .instrumentation import record_cache
+from .models import Reaction, UserProfile
+
+_MISSING = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'PROFILE_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300)
+
+
+def _record(kind, hit):
+    with _stats_lock:
+        _stats[f'{kind}_hits' if hit else f'{kind}_misses'] += 1
+    record_cache(hit)
+
+
+def stats():
+    """Return a snapshot of the hit/miss counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def profile_key(pk):
+    return f'core:profile:{pk}'
+
+
+def user_profile_key(user_id):
+    return f'core:user_profile:{user_id}'
+
+
+def reaction_key(user_id, profile_id):
+    return f'core:reaction:{user_id}:{profile_id}'
+
+
+def _get_or_load(kind, key, loader):
+    cache = _cache()
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _record(kind, True)
+        return value
+    _record(kind, False)
+    value = loader()
+    # None is cached too, so missing rows don't hit the database every time
+    cache.set(key, value, _timeout())
+    return value
+
+
+def get_profile(pk):
+    """Return the ``UserProfile`` with ``pk`` or None."""
+    return _get_or_load(
+        'profile', profile_key(pk),
+        lambda: UserProfile.objects.visible().filter(pk=pk).first(),
+    )
+
+
+def get_profile_id_for_user(user_id):
+    """Return the id of the profile owned by ``user_id`` or None."""
+    return _get_or_load(
+        'user_profile', user_profile_key(user_id),
+        lambda: UserProfile.objects.filter(user_id=user_id).values_list('pk', flat=True).first(),
+    )
+
+
+def get_reaction(user_id, profile_id):
+    """Return ``user_id``'s reaction value on ``profile_id`` or None."""
+    return _get_or_load(
+        'reaction', reaction_key(user_id, profile_id),
+        lambda: Reaction.objects.filter(user_id=user_id, profile_id=profile_id)
+        .values_list('reaction', flat=True).first(),
+    )
+
+
+async def _aget_or_load(kind, key, loader):
+    cache = _cache()
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        _record(kind, True)
+        return value
+    _record(kind, False)
+    value = await loader()
+    await cache.aset(key, value, _timeout())
+    return value
+
+
+async def aget_profile(pk):
+    """Async version of ``get_profile``."""
+    return await _aget_or_load(
+        'profile', profile_key(pk),
+        lambda: UserProfile.objects.visible().filter(pk=pk).afirst(),
+    )
+
+
+async def aget_profile_id_for_user(user_id):
+    """Async version of ``get_profile_id_for_user``."""
+    return await _aget_or_load(
+        'user_profile', user_profile_key(user_id),
+        lambda: UserProfile.objects.filter(user_id=user_id).values_list('pk', flat=True).afirst(),
+    )
+
+
+async def aget_reaction(user_id, profile_id):
+    """Async version of ``get_reaction``."""
+    return await _aget_or_load(
+        'reaction', reaction_key(user_id, profile_id),
+        lambda: Reaction.objects.filter(user_id=user_id, profile_id=profile_id)
+        .values_list('reaction', flat=True).afirst(),
+    )
+
+
+def set_reaction(user_id, profile_id, value):
+    """Store a reaction state that was just written."""
+    _cache().set(reaction_key(user_id, profile_id), value, _timeout())
+
+
+def invalidate_profile(pk):
+    _cache().delete(profile_key(pk))
+
+
+def invalidate_user_profile(user_id):
+    _cache().delete(user_profile_key(user_id))
+
+
+def invalidate_reaction(user_id, profile_id):
+    _cache().delete(reaction_key(user_id, profile_id))
@@ -0,0 +1,208 @@
+"""Direct conversations between users who reacted to each other.
+
+A conversation opens by itself once two users both like or love each
+other's profile: ``open_if_mutual`` runs in the background after each
+like/love commits and checks the reverse reaction with a point lookup on
+the ``Reaction`` unique ``(user, profile)`` index. It starts with a notice
+message (no sender), so every conversation has a position in the inbox.
+A conversation stays open if either reaction is later withdrawn.
+
+``send_message`` costs three statements inside one transaction: the
+members read (the ``(conversation, user)`` unique index), the ``INSERT``
+into the append-only ``Message`` table and one ``UPDATE`` of both member
+rows (inbox position and unread counter). History and inbox reads are
+keyset pages over ``(conversation, id)`` and ``(user, last_message_id)``,
+so their cost depends on the page size only. New messages are pushed to
+the participants' ``/ws/messages/`` sockets (``core.realtime``).
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.db.models import F, Sum
+
+from . import tasks
+from .models import Conversation, ConversationMember, Message, Reaction, UserProfile
+from .pagination import keyset_page
+from .pubsub import publish_message
+
+MUTUAL_REACTIONS = (Reaction.LIKE, Reaction.LOVE)
+
+
+def ordered_pair(user_id, other_id):
+    return (user_id, other_id) if user_id < other_id else (other_id, user_id)
+
+
+def mutual_partner(user_id, profile_id):
+    """Return the owner of ``profile_id`` if both users like/love each other."""
+    reactions = Reaction.objects.filter(reaction__in=MUTUAL_REACTIONS)
+    if not reactions.filter(user_id=user_id, profile_id=profile_id).exists():
+        return None
+    return (
+        reactions.filter(user__profile=profile_id, profile__user=user_id)
+        .values_list('user_id', flat=True).first()
+    )
+
+
+def open_conversation(user_id, other_id):
+    """Return the conversation between two users, creating it if needed."""
+    low, high = ordered_pair(user_id, other_id)
+    with transaction.atomic():
+        conversation, created = Conversation.objects.get_or_create(user_low_id=low, user_high_id=high)
+        if not created:
+            return conversation
+        notice = Message.objects.create(conversation=conversation)
+        ConversationMember.objects.bulk_create([
+            ConversationMember(
+                conversation=conversation, user_id=member, last_message_id=notice.pk, unread_count=1,
+            )
+            for member in (low, high)
+        ])
+    transaction.on_commit(lambda: publish_message((low, high), serialize(notice)))
+    return conversation
+
+
+def open_if_mutual(user_id, profile_id):
+    """Open a conversation if ``user_id`` and the owner of ``profile_id`` match."""
+    partner = mutual_partner(user_id, profile_id)
+    if partner is not None:
+        return open_conversation(user_id, partner)
+    return None
+
+
+def schedule_match_check(user_id, profile_id, reaction):
+    """Check for a match in the background once a like/love commits."""
+    if reaction in MUTUAL_REACTIONS:
+        tasks.submit_on_commit(open_if_mutual, user_id, profile_id)
+
+
+def get_membership(user, conversation_id):
+    """Return ``user``'s member row, with the conversation, or raise ``Conversation.DoesNotExist``."""
+    member = (
+        ConversationMember.objects.select_related('conversation')
+        .filter(conversation_id=conversation_id, user=user).first()
+    )
+    if member is None:
+        raise Conversation.DoesNotExist('No Conversation matches the given query.')
+    return member
+
+
+def clean_body(body):
+    body = (body or '').strip()
+    if not body:
+        raise ValidationError('Message is empty.')
+    limit = getattr(settings, 'CHAT_MESSAGE_MAX_LENGTH', 2000)
+    if len(body) > limit:
+        raise ValidationError(f'Messages are limited to {limit} characters.')
+    return body
+
+
+def _members_update_sql(connection):
+    """The per-message ``UPDATE`` of both member rows.
+
+    Raw SQL because this is the hottest statement of the chat: building the
+    equivalent ``Case``/``Greatest`` expressions costs several times more
+    than running it. The comparisons keep the newest id when concurrent
+    sends commit out of order.
+    """
+    qn = connection.ops.quote_name
+    return (
+        f"UPDATE {qn(ConversationMember._meta.db_table)} SET "
+        f"last_message_id = CASE WHEN last_message_id > %(message)s THEN last_message_id ELSE %(message)s END, "
+        f"last_read_id = CASE WHEN user_id = %(sender)s AND last_read_id < %(message)s "
+        f"THEN %(message)s ELSE last_read_id END, "
+        f"unread_count = unread_count + CASE WHEN user_id = %(sender)s THEN 0 ELSE 1 END "
+        f"WHERE conversation_id = %(conversation)s"
+    )
+
+
+def send_message(user, conversation_id, body):
+    """Append a message from ``user`` and return it.
+
+    Raises ``Conversation.DoesNotExist`` unless ``user`` is a participant
+    and ``ValidationError`` for an empty or oversized body.
+    """
+    body = clean_body(body)
+    with transaction.atomic():
+        members = list(
+            ConversationMember.objects.filter(conversation_id=conversation_id)
+            .values_list('user_id', flat=True)
+        )
+        if user.pk not in members:
+            raise Conversation.DoesNotExist('No Conversation matches the given query.')
+        message = Message.objects.create(conversation_id=conversation_id, sender=user, body=body)
+        with connections[ConversationMember.objects.db].cursor() as cursor:
+            cursor.execute(_members_update_sql(cursor.db), {
+                'message': message.pk, 'sender': user.pk, 'conversation': conversation_id,
+            })
+    transaction.on_commit(lambda: publish_message(members, serialize(message)))
+    return message
+
+
+def mark_read(user, conversation_id):
+    """Mark everything up to the conversation's latest message as read."""
+    return ConversationMember.objects.filter(conversation_id=conversation_id, user=user).update(
+        last_read_id=F('last_message_id'), unread_count=0,
+    )
+
+
+def history(conversation_id, before=None, after=None, size=50):
+    """One page of messages as ``(messages, next_cursor)``.
+
+    Without ``after``, pages go backwards from the newest message (or from
+    ``before``) and ``next_cursor`` is the ``before`` of the older page.
+    With ``after``, messages newer than it are returned oldest first, for
+    catching up. Messages are always returned in chronological order.
+    """
+    messages = Message.objects.filter(conversation_id=conversation_id)
+    if after is not None:
+        return keyset_page(messages, after=after, size=size)
+    page, next_cursor = keyset_page(messages, after=before, size=size, descending=True)
+    page.reverse()
+    return page, next_cursor
+
+
+def inbox(user, before=None, size=20):
+    """One page of ``user``'s conversations, most recent activity first.
+
+    Each entry is ``{'member', 'conversation', 'partner', 'last_message'}``
+    with ``partner`` the other user's profile (None if they have none).
+    """
+    members, next_cursor = keyset_page(
+        ConversationMember.objects.select_related('conversation').filter(user=user),
+        after=before, size=size, field='last_message_id', descending=True,
+    )
+    partner_ids = [m.conversation.partner_id(user.pk) for m in members]
+    profiles = {
+        p.user_id: p
+        for p in UserProfile.objects.only(
+            'id', 'user_id', 'firstname', 'lastname', 'profile_picture', 'profile_thumbnail',
+        ).filter(user_id__in=partner_ids)
+    }
+    last_messages = Message.objects.in_bulk([m.last_message_id for m in members])
+    entries = [
+        {
+            'member': member,
+            'conversation': member.conversation,
+            'partner': profiles.get(partner_id),
+            'last_message': last_messages.get(member.last_message_id),
+        }
+        for member, partner_id in zip(members, partner_ids)
+    ]
+    return entries, next_cursor
+
+
+def unread_total(user):
+    return (
+        ConversationMember.objects.filter(user=user, unread_count__gt=0)
+        .aggregate(total=Sum('unread_count'))['total'] or 0
+    )
+
+
+def serialize(message):
+    return {
+        'id': message.pk,
+        'conversation_id': message.conversation_id,
+        'sender_id': message.sender_id,
+        'body': message.body,
+        'created_at': message.created_at.isoformat(),
+    }
@@ -0,0 +1,64 @@
+"""ETag / Last-Modified support for the profile pages and reaction JSON.
+
+Validators are derived from cheap per-profile state (``updated_at`` and the
+counters) plus everything viewer-specific the response depends on, so a
+matching ``If-None-Match`` / ``If-Modified-Since`` is answered with 304
+before any template is rendered.
+"""
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .middleware import get_current_profile
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def viewer_parts(request):
+    """Viewer-dependent inputs of a rendered page.
+
+    Covers the logged-in user, the header avatar (their own profile) and the
+    CSRF token embedded in forms.
+    """
+    # The masked token in the page changes every render, but any masking of
+    # the same secret stays valid, so the secret is what matters
+    get_token(request)
+    parts = [request.user.pk, request.META.get('CSRF_COOKIE')]
+    profile = get_current_profile(request)
+    if profile is not None:
+        parts += [profile.pk, profile.updated_at]
+    return parts
+
+
+def latest(*timestamps):
+    """Return the most recent of ``timestamps``, ignoring None."""
+    return max((ts for ts in timestamps if ts is not None), default=None)
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 response if the client's copy is current, else None.
+
+    Pages carrying one-off flash messages are never answered from cache.
+    """
+    if len(get_messages(request)):
+        return None
+    return get_conditional_response(
+        request, etag=etag,
+        last_modified=last_modified.timestamp() if last_modified else None,
+    )
+
+
+def set_validators(request, response, etag, last_modified=None):
+    """Attach ETag/Last-Modified to ``response`` and require revalidation."""
+    if request.method in ('GET', 'HEAD') and not len(get_messages(request)):
+        response.headers['ETag'] = etag
+        if last_modified:
+            response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    # Per-user content: browsers may keep it, shared caches may not
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,179 @@
+"""Bulk deletion of profiles and users in bounded chunks.
+
+``profile.delete()`` and ``user.delete()`` remove all related reactions
+with one unbounded ``DELETE`` per table, inside the request. Deleting a
+user also left the counters of every profile they reacted to stale.
+Here deletion has two steps:
+
+1. ``schedule_profile_deletion`` / ``schedule_user_deletion`` run in the
+   request. One ``UPDATE`` marks the profile ``pending_delete`` and
+   detaches it from its owner, so readers using
+   ``UserProfile.objects.visible()`` stop showing it at once. A deleted
+   user is also deactivated. The purge is then queued on the worker pool
+   (``core.tasks``) for after commit.
+2. ``purge_profile`` / ``purge_user`` delete the related rows by primary
+   key, ``DELETION_BATCH_SIZE`` at a time, each chunk in its own
+   transaction. Memory stays bounded by the chunk size whatever the
+   profile's popularity. Reactions given by a deleted user are
+   subtracted from the counters and daily rollups of the profiles they
+   were on.
+
+The purge is resumable: ``manage.py purge_deleted_profiles`` finishes any
+profile left pending, e.g. by a restart.
+"""
+import logging
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+
+from . import cache as profile_cache
+from . import leaderboard, rollups, tasks
+from .models import (
+    Conversation, ConversationMember, Message, Reaction, ReactionCounterShard, ReactionDailyRollup,
+    UserProfile,
+)
+from .reactions import (
+    COUNTER_FIELDS, add_to_shard, counter_updates, get_counts, get_shard_count,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_batch_size():
+    return getattr(settings, 'DELETION_BATCH_SIZE', 1000)
+
+
+def _raw_delete(model, ids):
+    """``DELETE ... WHERE pk IN (ids)`` without the deletion collector."""
+    connection = connections[model.objects.db]
+    qn = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {qn(model._meta.db_table)} WHERE {qn(model._meta.pk.column)} IN ({placeholders})',
+            list(ids),
+        )
+        return cursor.rowcount
+
+
+def delete_in_chunks(queryset, fields=(), on_chunk=None, batch_size=None):
+    """Delete the rows of ``queryset`` a batch at a time; return how many.
+
+    ``on_chunk(rows)`` runs inside each chunk's transaction with the
+    ``(pk, *fields)`` tuples about to be deleted.
+    """
+    size = batch_size or get_batch_size()
+    # No ORDER BY: any batch will do, and the filter's index is enough to find it
+    queryset = queryset.order_by()
+    total = 0
+    while True:
+        with transaction.atomic(using=queryset.db):
+            rows = list(queryset.values_list('pk', *fields)[:size])
+            if rows:
+                if on_chunk is not None:
+                    on_chunk(rows)
+                _raw_delete(queryset.model, [row[0] for row in rows])
+        total += len(rows)
+        if len(rows) < size:
+            return total
+
+
+def hide_profile(profile_id):
+    """Mark a profile for deletion and detach it from its owner.
+
+    Returns False if it was already gone or pending.
+    """
+    with transaction.atomic():
+        row = (
+            UserProfile.objects.select_for_update().visible()
+            .filter(pk=profile_id).values('user_id').first()
+        )
+        if row is None:
+            return False
+        UserProfile.objects.filter(pk=profile_id).update(pending_delete=True, user=None)
+    profile_cache.invalidate_profile(profile_id)
+    if row['user_id'] is not None:
+        profile_cache.invalidate_user_profile(row['user_id'])
+    leaderboard.remove_profile(profile_id)
+    return True
+
+
+def schedule_profile_deletion(profile_id):
+    """Hide a profile now and purge it in the background."""
+    hide_profile(profile_id)
+    tasks.submit_on_commit(purge_profile, profile_id)
+
+
+def purge_profile(profile_id, batch_size=None):
+    """Delete a pending profile and its reactions, rollups and shards in chunks.
+
+    Returns the number of reactions deleted, or None if the profile is not
+    pending deletion.
+    """
+    if not UserProfile.objects.filter(pk=profile_id, pending_delete=True).exists():
+        return None
+    reactions = delete_in_chunks(Reaction.objects.filter(profile_id=profile_id), batch_size=batch_size)
+    for model in (ReactionDailyRollup, ReactionCounterShard):
+        delete_in_chunks(model.objects.filter(profile_id=profile_id), batch_size=batch_size)
+    # Nothing is left for the collector to cascade to
+    UserProfile.objects.filter(pk=profile_id).delete()
+    logger.info("Purged profile %s (%s reactions)", profile_id, reactions)
+    return reactions
+
+
+def _subtract_reactions(rows):
+    """Take a chunk of ``(pk, profile_id, reaction)`` rows off their profiles' counters."""
+    by_profile = defaultdict(Counter)
+    for pk, profile_id, reaction in rows:
+        by_profile[profile_id][reaction] += 1
+    shards = get_shard_count()
+    for profile_id, removed in by_profile.items():
+        deltas = {}
+        for reaction, count in removed.items():
+            deltas[COUNTER_FIELDS[reaction]] = -count
+            rollups.record_removed(profile_id, reaction, count)
+        if shards:
+            add_to_shard(profile_id, deltas, shards)
+        else:
+            UserProfile.objects.filter(pk=profile_id).update(**counter_updates(deltas))
+    affected = list(by_profile)
+    transaction.on_commit(lambda: _refresh_profiles(affected))
+
+
+def _refresh_profiles(profile_ids):
+    for profile_id, counts in get_counts(profile_ids).items():
+        profile_cache.invalidate_profile(profile_id)
+        leaderboard.record_counts(profile_id, counts)
+
+
+def schedule_user_deletion(user):
+    """Deactivate ``user``, hide their profile now and purge everything in the background."""
+    get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+    profile_id = UserProfile.objects.visible().filter(user=user).values_list('pk', flat=True).first()
+    if profile_id is not None:
+        hide_profile(profile_id)
+    tasks.submit_on_commit(purge_user, user.pk, profile_id)
+
+
+def purge_user(user_id, profile_id=None, batch_size=None):
+    """Delete a user in chunks: their reactions (fixing counters), profile and messages."""
+    delete_in_chunks(
+        Reaction.objects.filter(user_id=user_id),
+        fields=('profile_id', 'reaction'), on_chunk=_subtract_reactions, batch_size=batch_size,
+    )
+    if profile_id is None:
+        profile_id = UserProfile.objects.filter(user_id=user_id).values_list('pk', flat=True).first()
+        if profile_id is not None:
+            hide_profile(profile_id)
+    if profile_id is not None:
+        purge_profile(profile_id, batch_size)
+    conversation_ids = list(
+        ConversationMember.objects.filter(user_id=user_id).values_list('conversation_id', flat=True)
+    )
+    for conversation_id in conversation_ids:
+        delete_in_chunks(Message.objects.filter(conversation_id=conversation_id), batch_size=batch_size)
+    Conversation.objects.filter(pk__in=conversation_ids).delete()
+    get_user_model().objects.filter(pk=user_id).delete()
+    logger.info("Purged user %s", user_id)
@@ -1,4 +1,6 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from .images import prepare_upload
 from .models import UserProfile
 
 
@@ -10,7 +12,23 @@ class UserProfileForm(forms.ModelForm):
             'gender': forms.Select(),
         }
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Files rejected while streaming (see core.uploads) never reach the form
+        self.upload_errors = upload_errors or {}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, message in self.upload_errors.items():
+            # Replace the generic "required" error of a dropped upload
+            self._errors.pop(field, None)
+            self.add_error(field, message)
+        return cleaned_data
+
     def clean_profile_picture(self):
         pic = self.cleaned_data.get('profile_picture')
-        # Add basic validation if needed (size/type)
+        # Only new uploads are checked and downscaled; an unchanged picture
+        # comes back as the stored FieldFile
+        if isinstance(pic, UploadedFile):
+            pic = prepare_upload(pic)
         return pic
@@ -0,0 +1,16 @@
+"""Password hasher with a configurable cost.
+
+``PBKDF2PasswordHasher`` is Django's ``pbkdf2_sha256`` hasher with the
+iteration count taken from ``PASSWORD_PBKDF2_ITERATIONS`` (0 keeps Django's
+default). Hashes made at another cost still verify, and Django re-encodes
+them at the configured cost on the user's next successful login
+(``must_update``), so raising or lowering the cost needs no migration.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', 0) or hashers.PBKDF2PasswordHasher.iterations
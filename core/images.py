@@ -0,0 +1,136 @@
+"""Profile picture processing built on Pillow.
+
+Uploads are validated and downscaled in the form, then a fixed-size
+thumbnail is rendered on the background worker pool and stored in
+``UserProfile.profile_thumbnail`` for the list page and avatar.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from . import cache as profile_cache
+from . import tasks
+from .models import UserProfile
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+THUMBNAIL_DIR = 'profile_pictures/thumbs'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def open_image(file):
+    """Open ``file`` with Pillow and check format and pixel count.
+
+    Only the header is parsed here; pixel data is decoded later, and only for
+    images within ``PROFILE_IMAGE_MAX_PIXELS``.
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError:
+        raise ValidationError('Image dimensions are too large.', code='too_large')
+    except (UnidentifiedImageError, OSError):
+        raise ValidationError('Upload a valid JPEG, PNG, GIF or WebP image.', code='invalid')
+    if image.format not in ALLOWED_FORMATS:
+        raise ValidationError('Upload a valid JPEG, PNG, GIF or WebP image.', code='invalid')
+    width, height = image.size
+    if width * height > _setting('PROFILE_IMAGE_MAX_PIXELS', 40_000_000):
+        raise ValidationError('Image dimensions are too large.', code='too_large')
+    return image
+
+
+def _encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+    elif fmt == 'WEBP':
+        image.save(buffer, 'WEBP', quality=80, method=4)
+    else:
+        image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def prepare_upload(file):
+    """Validate an uploaded picture and downscale it to ``PROFILE_IMAGE_MAX_DIMENSION``.
+
+    Returns the original file if it is already small enough, otherwise a
+    re-encoded ``ContentFile`` with the same name.
+    """
+    max_size = _setting('PROFILE_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+    if file.size and file.size > max_size:
+        raise ValidationError(
+            f'Image files must be smaller than {filesizeformat(max_size)}.', code='too_large',
+        )
+    image = open_image(file)
+    max_dimension = _setting('PROFILE_IMAGE_MAX_DIMENSION', 1600)
+    if max(image.size) <= max_dimension:
+        file.seek(0)
+        return file
+    fmt = image.format
+    # Animated GIFs are flattened to their first frame
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    return ContentFile(_encode(image, fmt), name=os.path.basename(file.name))
+
+
+def thumbnail_format():
+    fmt = _setting('PROFILE_THUMBNAIL_FORMAT', 'WEBP').upper()
+    if fmt == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return fmt
+
+
+def thumbnail_name(picture_name, size, fmt):
+    stem = os.path.splitext(os.path.basename(picture_name))[0]
+    extension = 'webp' if fmt == 'WEBP' else 'jpg'
+    return f'{THUMBNAIL_DIR}/{stem}_{size}.{extension}'
+
+
+def generate_thumbnail(profile_id):
+    """Render and store the thumbnail for a profile's current picture.
+
+    Returns the stored thumbnail name, or None if there was nothing to do.
+    """
+    picture = (
+        UserProfile.objects.filter(pk=profile_id)
+        .values_list('profile_picture', flat=True)
+        .first()
+    )
+    if not picture or not default_storage.exists(picture):
+        return None
+    size = _setting('PROFILE_THUMBNAIL_SIZE', 200)
+    fmt = thumbnail_format()
+    with default_storage.open(picture, 'rb') as source:
+        image = ImageOps.exif_transpose(open_image(source))
+        thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+    if fmt == 'JPEG' or thumb.mode not in ('RGB', 'RGBA'):
+        thumb = thumb.convert('RGBA' if fmt == 'WEBP' else 'RGB')
+    name = default_storage.save(
+        thumbnail_name(picture, size, fmt), ContentFile(_encode(thumb, fmt)),
+    )
+    # Only attach it if the picture was not replaced in the meantime
+    updated = UserProfile.objects.filter(pk=profile_id, profile_picture=picture).update(
+        profile_thumbnail=name, updated_at=timezone.now(),
+    )
+    if not updated:
+        default_storage.delete(name)
+        return None
+    profile_cache.invalidate_profile(profile_id)
+    return name
+
+
+def schedule_thumbnail(profile_id):
+    """Generate the thumbnail on the worker pool after the transaction commits."""
+    tasks.submit_on_commit(generate_thumbnail, profile_id)
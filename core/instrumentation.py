@@ -0,0 +1,230 @@
+"""Opt-in per-request metrics: wall time, SQL, template rendering, cache hits.
+
+Enable with ``REQUEST_METRICS_ENABLED``. ``RequestMetricsMiddleware`` then
+
+- times every query through ``connection.execute_wrapper`` on each
+  configured database,
+- times top-level template renders,
+- counts profile cache hits/misses (reported by ``core.cache``),
+- adds a ``Server-Timing`` header to the response, and
+- folds the numbers into per-view histograms (``registry``), served as
+  JSON by ``views.request_metrics``.
+
+When disabled the middleware raises ``MiddlewareNotUsed``, so it is removed
+from the stack and costs nothing; the cache hook is a context-variable
+lookup that finds no active request.
+
+The middleware runs natively in both stacks, so it does not push async
+views through a thread. Database connections are per thread, and the
+async ORM runs queries in the request's sync worker thread, so on the async
+path the execute wrappers are installed from that thread.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# Upper bounds of the histogram buckets; the last bucket is open-ended
+DURATION_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50)
+
+_current = ContextVar('core_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Numbers collected for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def record_cache(hit):
+    """Count a cache lookup against the current request, if one is measured."""
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def as_dict(self):
+        labels = [str(bound) for bound in self.bounds] + ['+Inf']
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'count': self.total,
+            'sum': round(self.sum, 3),
+        }
+
+
+class MetricsRegistry:
+    """Per-view aggregates, shared by all threads of the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, total, metrics):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = {
+                    'duration_ms': Histogram(DURATION_BUCKETS_MS),
+                    'db_ms': Histogram(DURATION_BUCKETS_MS),
+                    'template_ms': Histogram(DURATION_BUCKETS_MS),
+                    'queries': Histogram(QUERY_BUCKETS),
+                    'cache_hits': 0,
+                    'cache_misses': 0,
+                }
+            stats['duration_ms'].observe(total * 1000)
+            stats['db_ms'].observe(metrics.db_time * 1000)
+            stats['template_ms'].observe(metrics.template_time * 1000)
+            stats['queries'].observe(metrics.queries)
+            stats['cache_hits'] += metrics.cache_hits
+            stats['cache_misses'] += metrics.cache_misses
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {
+                    key: value.as_dict() if isinstance(value, Histogram) else value
+                    for key, value in stats.items()
+                }
+                for view, stats in self._views.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def is_enabled():
+    return getattr(settings, 'REQUEST_METRICS_ENABLED', False)
+
+
+_template_patch_lock = threading.Lock()
+_template_patched = False
+
+
+def _instrument_templates():
+    """Time top-level renders of the Django template backend."""
+    global _template_patched
+    from django.template.backends.django import Template
+
+    with _template_patch_lock:
+        if _template_patched:
+            return
+        original = Template.render
+
+        def render(self, context=None, request=None):
+            metrics = _current.get()
+            if metrics is None:
+                return original(self, context, request)
+            start = time.perf_counter()
+            try:
+                return original(self, context, request)
+            finally:
+                metrics.template_time += time.perf_counter() - start
+
+        Template.render = render
+        _template_patched = True
+
+
+class RequestMetricsMiddleware:
+    """Measure each request; see the module docstring. Put it first in MIDDLEWARE.
+
+    Works in both sync and async stacks. On the async path the query
+    wrappers are installed from the request's sync thread, where the async
+    ORM runs its queries.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        _instrument_templates()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                _wrap_queries(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, metrics, response)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            stack = ExitStack()
+            await sync_to_async(_wrap_queries)(stack, metrics)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current.reset(token)
+        return self.finish(request, metrics, response)
+
+    def finish(self, request, metrics, response):
+        total = time.perf_counter() - metrics.started
+        match = getattr(request, 'resolver_match', None)
+        registry.observe(match.view_name if match else '<unresolved>', total, metrics)
+        response.headers['Server-Timing'] = metrics.server_timing(total)
+        return response
+
+
+def _wrap_queries(stack, metrics):
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(metrics.record_query))
@@ -0,0 +1,139 @@
+"""Cached top-K rankings built from the denormalized reaction counters.
+
+Each board keeps the ``LEADERBOARD_SIZE`` highest ``(count, id)`` pairs in
+the profile cache together with a ``floor``: no profile outside the list has
+a higher count. ``refresh`` rebuilds an entry from the descending counter
+index (a bounded index scan, not a sort of the table), and entries expire
+``LEADERBOARD_REFRESH_SECONDS`` after that rebuild, so drift is corrected
+periodically. Incremental updates keep the original expiry (``built_at``);
+they never extend an entry's life.
+
+Between refreshes ``record_counts`` keeps the boards current as reactions
+commit:
+
+- a profile whose count rises above the floor enters the list; if the list
+  overflows, its last entry drops out and raises the floor,
+- a listed profile whose count falls below the floor is dropped, since
+  unlisted profiles may now outrank it.
+
+Read-modify-write of an entry is serialized per process only; an update
+lost to a concurrent writer elsewhere is repaired by the next refresh.
+With sharded counters the boards follow the base columns plus whatever
+``record_counts`` was told, so run ``flush_reaction_shards`` before
+refreshing.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import UserProfile
+
+# Board slug -> counter column it ranks by
+BOARDS = {
+    'liked': 'likes_count',
+    'loved': 'loves_count',
+}
+
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'PROFILE_CACHE_ALIAS', 'default')]
+
+
+def get_size():
+    return getattr(settings, 'LEADERBOARD_SIZE', 100)
+
+
+def _timeout():
+    return getattr(settings, 'LEADERBOARD_REFRESH_SECONDS', 300)
+
+
+def board_key(board):
+    return f'core:leaderboard:{board}'
+
+
+def refresh(board):
+    """Rebuild ``board`` from the database and store it."""
+    field = BOARDS[board]
+    size = get_size()
+    rows = [
+        list(row) for row in
+        UserProfile.objects.visible().order_by(f'-{field}', '-id').values_list(field, 'id')[:size]
+    ]
+    # A short list holds every profile, so anything new must beat 0
+    entry = {'rows': rows, 'floor': rows[-1][0] if len(rows) == size else 0, 'built_at': time.time()}
+    _cache().set(board_key(board), entry, _timeout())
+    return entry
+
+
+def _remaining(entry):
+    """Seconds ``entry`` has left until its scheduled rebuild."""
+    return entry.get('built_at', 0) + _timeout() - time.time()
+
+
+def _store(cache, board, entry):
+    # Keep the expiry set by refresh(); a fresh TTL here would postpone the
+    # rebuild forever under steady traffic
+    remaining = _remaining(entry)
+    if remaining > 0:
+        cache.set(board_key(board), entry, remaining)
+    else:
+        cache.delete(board_key(board))
+
+
+def get_board(board):
+    """Return the cached entry for ``board``, refreshing it when missing or due."""
+    entry = _cache().get(board_key(board))
+    if entry is None or _remaining(entry) <= 0:
+        entry = refresh(board)
+    return entry
+
+
+def ranked_ids(board):
+    """Profile ids of ``board`` in rank order."""
+    return [pk for count, pk in get_board(board)['rows']]
+
+
+def _apply(entry, profile_id, count, size):
+    rows = [row for row in entry['rows'] if row[1] != profile_id]
+    listed = len(rows) != len(entry['rows'])
+    if count > entry['floor'] or (listed and count == entry['floor']):
+        rows.append([count, profile_id])
+        rows.sort(key=lambda row: (-row[0], -row[1]))
+        while len(rows) > size:
+            entry['floor'] = max(entry['floor'], rows.pop()[0])
+    elif not listed:
+        return False
+    entry['rows'] = rows
+    return True
+
+
+def record_counts(profile_id, counts):
+    """Fold a profile's new counters into every cached board."""
+    cache = _cache()
+    size = get_size()
+    with _lock:
+        for board, field in BOARDS.items():
+            if field not in counts:
+                continue
+            entry = cache.get(board_key(board))
+            # Nothing cached: the next read rebuilds it from the database
+            if entry is not None and _apply(entry, profile_id, counts[field], size):
+                _store(cache, board, entry)
+
+
+def remove_profile(profile_id):
+    """Drop a deleted profile from every cached board."""
+    cache = _cache()
+    with _lock:
+        for board in BOARDS:
+            entry = cache.get(board_key(board))
+            if entry is None:
+                continue
+            rows = [row for row in entry['rows'] if row[1] != profile_id]
+            if len(rows) != len(entry['rows']):
+                entry['rows'] = rows
+                _store(cache, board, entry)
@@ -0,0 +1,73 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import Reaction, ReactionDailyRollup, UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Build daily reaction rollups for the days before inline recording "
+        "started, from the reactions' created_at. Only reactions that still "
+        "exist can be counted, so these days show additions only. Days from "
+        "--until on are left alone; re-running replaces earlier output."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until', metavar='YYYY-MM-DD',
+            help='First day not to backfill (default: the earliest day already rolled up, else today).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Profiles aggregated per chunk (default: 2000).',
+        )
+
+    def handle(self, *args, **options):
+        until = self.cutoff(options['until'])
+        tz = timezone.get_current_timezone()
+        boundary = timezone.make_aware(datetime.combine(until, time.min), tz)
+        batch_size = options['batch_size']
+
+        created = last_id = 0
+        while True:
+            ids = list(
+                UserProfile.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            first_id, last_id = ids[0], ids[-1]
+            grouped = (
+                Reaction.objects
+                .filter(profile_id__gte=first_id, profile_id__lte=last_id, created_at__lt=boundary)
+                .annotate(day=TruncDate('created_at', tzinfo=tz))
+                .order_by()
+                .values_list('profile_id', 'day', 'reaction')
+                .annotate(total=Count('pk'))
+            )
+            rows = [
+                ReactionDailyRollup(profile_id=profile_id, day=day, reaction=reaction, added=total)
+                for profile_id, day, reaction, total in grouped
+            ]
+            with transaction.atomic():
+                ReactionDailyRollup.objects.filter(
+                    profile_id__gte=first_id, profile_id__lte=last_id, day__lt=until,
+                ).delete()
+                ReactionDailyRollup.objects.bulk_create(rows, batch_size=1000)
+            created += len(rows)
+
+        self.stdout.write(f"Wrote {created} rollup row(s) for days before {until.isoformat()}.")
+
+    def cutoff(self, value):
+        if value:
+            try:
+                return datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--until must be a date like 2024-01-31.')
+        earliest = ReactionDailyRollup.objects.aggregate(day=Min('day'))['day']
+        return earliest or timezone.localdate()
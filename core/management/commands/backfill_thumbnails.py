@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.images import generate_thumbnail
+from core.models import UserProfile
+
+
+def generate_or_skip(profile_id):
+    try:
+        return generate_thumbnail(profile_id)
+    except ValidationError:
+        # Unreadable or oversized source image
+        return None
+
+
+def _generate(profile_id):
+    # Runs on a pool thread, which holds its own database connection
+    try:
+        return generate_or_skip(profile_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Render thumbnails for profiles that have a picture but no thumbnail yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Profiles fetched per query.')
+        parser.add_argument('--workers', type=int, default=4, help='Images processed in parallel.')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate thumbnails that already exist.',
+        )
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(profile_picture='')
+        if not options['force']:
+            profiles = profiles.filter(profile_thumbnail='')
+        done = skipped = 0
+        last_id = 0
+        pool = ThreadPoolExecutor(max_workers=options['workers']) if options['workers'] > 1 else None
+        try:
+            while True:
+                ids = list(
+                    profiles.filter(pk__gt=last_id).order_by('pk')
+                    .values_list('pk', flat=True)[:options['batch_size']]
+                )
+                if not ids:
+                    break
+                last_id = ids[-1]
+                results = pool.map(_generate, ids) if pool else map(generate_or_skip, ids)
+                for name in results:
+                    if name:
+                        done += 1
+                    else:
+                        skipped += 1
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write(f"Generated {done} thumbnail(s); skipped {skipped} (missing or replaced picture).")
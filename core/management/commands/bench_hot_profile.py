@@ -0,0 +1,81 @@
+import threading
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from core.models import Reaction, UserProfile
+from core.reactions import apply_reaction, fold_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure reaction throughput on a single hot profile with and without "
+        "sharded counters. Creates temporary users and a profile in the "
+        "configured database and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent reactors.')
+        parser.add_argument('--ops', type=int, default=200, help='Reactions per thread.')
+        parser.add_argument('--shards', type=int, default=16, help='Shard count for the sharded run.')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        owner = User.objects.create_user(username=f'bench-owner-{tag}')
+        profile = UserProfile.objects.create(
+            user=owner, firstname='Hot', lastname='Profile', age=30,
+            address='-', profile_picture='profile_pictures/bench.jpg',
+        )
+        reactors = [
+            User.objects.create_user(username=f'bench-{tag}-{i}')
+            for i in range(options['threads'])
+        ]
+        try:
+            for shards in (0, options['shards']):
+                ops, errors, elapsed = self.run(profile.pk, reactors, options['ops'], shards)
+                fold_shards(profile.pk)
+                Reaction.objects.filter(profile=profile).delete()
+                UserProfile.objects.filter(pk=profile.pk).update(
+                    likes_count=0, loves_count=0, dislikes_count=0,
+                )
+                label = f'{shards} shards' if shards else 'unsharded'
+                self.stdout.write(
+                    f"{label:>12}: {ops / elapsed:8.1f} reactions/s "
+                    f"({ops} ok, {errors} errors, {elapsed:.2f}s)"
+                )
+        finally:
+            profile.delete()
+            User.objects.filter(pk__in=[owner.pk] + [u.pk for u in reactors]).delete()
+
+    def run(self, profile_id, reactors, ops, shards):
+        results = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(reactors))
+
+        def worker(user):
+            ok = failed = 0
+            barrier.wait()
+            try:
+                for _ in range(ops):
+                    try:
+                        # Toggle a like on and off: alternating create and delete
+                        apply_reaction(user, profile_id, Reaction.LIKE, shards=shards)
+                        ok += 1
+                    except DatabaseError:
+                        failed += 1
+            finally:
+                connection.close()
+            with lock:
+                results.append((ok, failed))
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in reactors]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return sum(r[0] for r in results), sum(r[1] for r in results), elapsed
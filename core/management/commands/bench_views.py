@@ -0,0 +1,255 @@
+import io
+import json
+import statistics
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from core.models import Reaction, UserProfile
+from core.reactions import apply_reaction
+
+SEED_PREFIX = 'bench'
+SEED_PASSWORD = 'seed-password'
+AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest', 'HTTP_ACCEPT': 'application/json'}
+
+# Maximum queries per request, including session and auth lookups. A run
+# exceeding any of them fails; raise one only with a reason in the commit.
+QUERY_BUDGETS = {
+    'profile_view': 3,
+    'view_profile': 2,
+    # Cold: also the user -> profile lookup, no longer trusted from the session
+    'view_profile_cold': 6,
+    # BEGIN, profile lock, reaction read, write, counters, COMMIT; the daily
+    # rollups are written after the response
+    'react_create_ajax': 8,
+    'react_switch_ajax': 8,
+    'react_toggle_ajax': 8,
+    'react_create_form': 8,
+    'react_switch_form': 8,
+    'react_toggle_form': 8,
+    'signup': 11,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the profile views, the reaction write path and signup "
+        "against a seeded dataset. Reports latency percentiles, queries per "
+        "request and allocations, optionally as JSON for comparing commits, "
+        "and fails when a view exceeds its query budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Seeded users/profiles.')
+        parser.add_argument('--reactions', type=int, default=40000, help='Seeded reactions.')
+        parser.add_argument('--reuse', action='store_true', help='Reuse an earlier bench dataset instead of reseeding.')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per scenario.')
+        parser.add_argument('--json', metavar='PATH', help='Write the results to PATH as JSON.')
+        parser.add_argument('--baseline', metavar='PATH', help='Earlier --json output to compare against.')
+        parser.add_argument(
+            '--budget', action='append', default=[], metavar='NAME=QUERIES',
+            help='Override a query budget (repeatable).',
+        )
+
+    def handle(self, *args, **options):
+        budgets = dict(QUERY_BUDGETS)
+        for override in options['budget']:
+            name, _, value = override.partition('=')
+            if name not in budgets or not value.isdigit():
+                raise CommandError(f'Invalid --budget {override!r}.')
+            budgets[name] = int(value)
+
+        if not options['reuse'] or not User.objects.filter(username=f'{SEED_PREFIX}-0').exists():
+            call_command(
+                'seed_load', users=options['users'], reactions=options['reactions'],
+                prefix=SEED_PREFIX, password=SEED_PASSWORD, clear=True, verbosity=0,
+                stdout=self.stdout if options['verbosity'] >= 2 else io.StringIO(),
+            )
+        self.viewer = User.objects.get(username=f'{SEED_PREFIX}-0')
+        # Most popular profile: the heaviest counters and reaction rows
+        self.target = (
+            UserProfile.objects.exclude(user=self.viewer)
+            .filter(user__username__startswith=f'{SEED_PREFIX}-')
+            .order_by('-likes_count').first()
+        )
+        if Reaction.objects.filter(user=self.viewer, profile=self.target).exists():
+            # Start each reaction cycle from "no reaction"; keeps counters right
+            current = Reaction.objects.get(user=self.viewer, profile=self.target).reaction
+            apply_reaction(self.viewer, self.target.pk, current)
+
+        self.client = make_client()
+        self.client.force_login(self.viewer)
+        self.signup_tag = uuid.uuid4().hex[:8]
+        self.signups = 0
+        try:
+            # The reaction cycles repeat far faster than any client may react
+            with override_settings(RATELIMIT_ENABLED=False):
+                results = self.run_all(options['iterations'])
+        finally:
+            User.objects.filter(username__startswith=f'bench-signup-{self.signup_tag}-').delete()
+
+        failures = []
+        for name, result in results.items():
+            result['query_budget'] = budgets.get(name)
+            if result['query_budget'] is not None and result['queries'] > result['query_budget']:
+                failures.append(f"{name}: {result['queries']} queries > budget {result['query_budget']}")
+
+        report = {
+            'database': connection.vendor,
+            'dataset': {'users': UserProfile.objects.count(), 'reactions': Reaction.objects.count()},
+            'iterations': options['iterations'],
+            'scenarios': results,
+            'failures': failures,
+        }
+        baseline = self.load_baseline(options['baseline'])
+        self.print_table(results, baseline)
+        if options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+        if failures:
+            raise CommandError('Query budget exceeded:\n' + '\n'.join(failures))
+
+    def scenario_groups(self):
+        """Groups of ``(name, request, before)`` steps run in order per iteration.
+
+        ``before`` runs untimed ahead of its step. A reaction group leaves
+        the viewer without a reaction again, so iterations are identical.
+        """
+        detail = reverse('view_profile', args=[self.target.pk])
+        react = reverse('react_profile', args=[self.target.pk])
+
+        def post_reaction(value, headers):
+            return lambda: self.client.post(react, {'reaction': value}, **headers)
+
+        return [
+            [('profile_view', lambda: self.client.get(reverse('profile_view')), None)],
+            [('view_profile', lambda: self.client.get(detail), None)],
+            [('view_profile_cold', lambda: self.client.get(detail), cache.clear)],
+            [
+                ('react_create_ajax', post_reaction(Reaction.LIKE, AJAX), None),
+                ('react_switch_ajax', post_reaction(Reaction.LOVE, AJAX), None),
+                ('react_toggle_ajax', post_reaction(Reaction.LOVE, AJAX), None),
+            ],
+            [
+                ('react_create_form', post_reaction(Reaction.LIKE, {}), None),
+                ('react_switch_form', post_reaction(Reaction.LOVE, {}), None),
+                ('react_toggle_form', post_reaction(Reaction.LOVE, {}), None),
+            ],
+            [('signup', self.signup, None)],
+        ]
+
+    def signup(self):
+        self.signups += 1
+        response = make_client().post(reverse('signup'), {
+            'username': f'bench-signup-{self.signup_tag}-{self.signups}',
+            'password1': 'Maple-river-7301',
+            'password2': 'Maple-river-7301',
+        })
+        if response.status_code != 302:
+            raise CommandError('signup did not create the account.')
+        return response
+
+    def run_all(self, iterations):
+        results = {}
+        for group in self.scenario_groups():
+            timings = {name: [] for name, request, before in group}
+            self.run_group(group)  # warm-up
+            for _ in range(iterations):
+                for name, request, before in group:
+                    if before:
+                        before()
+                    start = time.perf_counter()
+                    response = request()
+                    timings[name].append(time.perf_counter() - start)
+                    if response.status_code >= 400:
+                        raise CommandError(f'{name} returned HTTP {response.status_code}.')
+
+            queries = {}
+            for name, request, before in group:
+                if before:
+                    before()
+                with CaptureQueriesContext(connection) as ctx:
+                    request()
+                queries[name] = len(ctx.captured_queries)
+
+            allocations = {}
+            for name, request, before in group:
+                if before:
+                    before()
+                tracemalloc.start()
+                request()
+                retained, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                allocations[name] = (peak, retained)
+
+            for name, samples in timings.items():
+                results[name] = {
+                    **latency_summary(samples),
+                    'queries': queries[name],
+                    'peak_kib': round(allocations[name][0] / 1024, 1),
+                    'retained_kib': round(allocations[name][1] / 1024, 1),
+                }
+        return results
+
+    def run_group(self, group):
+        for name, request, before in group:
+            if before:
+                before()
+            request()
+
+    def load_baseline(self, path):
+        if not path:
+            return {}
+        with open(path) as fh:
+            return json.load(fh).get('scenarios', {})
+
+    def print_table(self, results, baseline):
+        self.stdout.write(
+            f"{'scenario':<20} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>7} {'budget':>6} {'peak KiB':>9}"
+            + (f" {'p50 vs base':>11}" if baseline else '')
+        )
+        for name, r in results.items():
+            line = (
+                f"{name:<20} {r['p50_ms']:8.2f} {r['p90_ms']:8.2f} {r['p99_ms']:8.2f} "
+                f"{r['queries']:7d} {r['query_budget'] if r['query_budget'] is not None else '-':>6} "
+                f"{r['peak_kib']:9.1f}"
+            )
+            base = baseline.get(name)
+            if base and base.get('p50_ms'):
+                line += f" {(r['p50_ms'] / base['p50_ms'] - 1) * 100:+10.1f}%"
+            self.stdout.write(line)
+
+
+def make_client():
+    # A host the settings accept; with an empty ALLOWED_HOSTS, DEBUG allows localhost
+    host = next(
+        (h for h in settings.ALLOWED_HOSTS if h not in ('*', '') and not h.startswith('.')),
+        'localhost',
+    )
+    return Client(SERVER_NAME=host)
+
+
+def latency_summary(samples):
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))] * 1000
+
+    return {
+        'p50_ms': round(pct(50), 3),
+        'p90_ms': round(pct(90), 3),
+        'p99_ms': round(pct(99), 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
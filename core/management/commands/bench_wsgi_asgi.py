@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from core.models import UserProfile
+
+HOST = 'localhost'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/second and latency percentiles of the profile pages "
+        "served by the sync views under WSGI and the async views under ASGI. "
+        "Each mode runs in its own process (so ASYNC_VIEWS takes effect) and "
+        "calls the Django handler in-process, without a web server, at the "
+        "given concurrency. Temporary users and profiles are created in the "
+        "configured database and removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64, help='Requests in flight.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode.')
+        parser.add_argument('--profiles', type=int, default=50, help='Profiles to seed.')
+        parser.add_argument('--mode', choices=('wsgi', 'asgi'), help='Run one mode and print JSON (internal).')
+        parser.add_argument('--username', help='Existing user to run as (internal).')
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            result = self.run_mode(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        tag = uuid.uuid4().hex[:8]
+        users = [User.objects.create_user(username=f'bench-{tag}-{i}') for i in range(options['profiles'])]
+        UserProfile.objects.bulk_create([
+            UserProfile(
+                user=user, firstname=f'Bench{i}', lastname='User', age=30,
+                address='-', profile_picture='profile_pictures/bench.jpg',
+            )
+            for i, user in enumerate(users)
+        ])
+        try:
+            self.stdout.write(f"{'mode':>5} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+            for mode in ('wsgi', 'asgi'):
+                result = self.spawn(mode, users[0].username, options)
+                self.stdout.write(
+                    f"{mode:>5} {result['rps']:9.1f} {result['p50']:8.1f} "
+                    f"{result['p99']:8.1f} {result['errors']:7d}"
+                )
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def spawn(self, mode, username, options):
+        env = dict(os.environ, ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        output = subprocess.run(
+            [
+                sys.executable, sys.argv[0], 'bench_wsgi_asgi', '--mode', mode,
+                '--username', username,
+                '--concurrency', str(options['concurrency']),
+                '--requests', str(options['requests']),
+            ],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def run_mode(self, options):
+        client = Client()
+        client.force_login(User.objects.get(username=options['username']))
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        profile_ids = list(UserProfile.objects.order_by('-pk').values_list('pk', flat=True)[:20])
+        # A mix of the list page, detail pages and reaction polling
+        paths = ['/core/'] + [f'/core/profile/{pk}/' for pk in profile_ids] + [
+            f'/core/profile/{pk}/react/' for pk in profile_ids
+        ]
+        targets = [paths[i % len(paths)] for i in range(options['requests'])]
+        connection.close()
+
+        start = time.perf_counter()
+        if options['mode'] == 'wsgi':
+            latencies, errors = self.run_wsgi(targets, cookie, options['concurrency'])
+        else:
+            latencies, errors = asyncio.run(self.run_asgi(targets, cookie, options['concurrency']))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            'rps': len(targets) / elapsed,
+            'p50': percentile(latencies, 50) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'errors': errors,
+        }
+
+    def run_wsgi(self, targets, cookie, concurrency):
+        handler = WSGIHandler()
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def request(path):
+            status = []
+            environ = wsgi_environ(path, cookie)
+            began = time.perf_counter()
+            response = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+            b''.join(response)
+            response.close()
+            took = time.perf_counter() - began
+            with lock:
+                latencies.append(took)
+                if not status[0].startswith('200'):
+                    errors.append(status[0])
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(request, targets))
+        return latencies, len(errors)
+
+    async def run_asgi(self, targets, cookie, concurrency):
+        handler = ASGIHandler()
+        latencies, errors = [], []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(path):
+            async with semaphore:
+                messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+                sent = []
+
+                async def receive():
+                    if messages:
+                        return messages.pop()
+                    # The handler watches for a disconnect that never comes
+                    await asyncio.Event().wait()
+
+                async def send(message):
+                    sent.append(message)
+
+                began = time.perf_counter()
+                await handler(asgi_scope(path, cookie), receive, send)
+                latencies.append(time.perf_counter() - began)
+                if sent[0]['status'] != 200:
+                    errors.append(sent[0]['status'])
+
+        await asyncio.gather(*(request(path) for path in targets))
+        return latencies, len(errors)
+
+
+def headers_for(path, cookie):
+    headers = {'host': HOST, 'cookie': cookie}
+    if path.endswith('/react/'):
+        headers['x-requested-with'] = 'XMLHttpRequest'
+        headers['accept'] = 'application/json'
+    return headers
+
+
+def wsgi_environ(path, cookie):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+        'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    for name, value in headers_for(path, cookie).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    return environ
+
+
+def asgi_scope(path, cookie):
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'root_path': '', 'query_string': b'',
+        'headers': [(name.encode(), value.encode()) for name, value in headers_for(path, cookie).items()],
+        'server': (HOST, 80), 'client': ('127.0.0.1', 0),
+    }
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, round(pct / 100 * (len(values) - 1)))
+    return values[index]
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import ReactionCounterShard
+from core.reactions import fold_shards
+
+
+class Command(BaseCommand):
+    help = "Fold sharded reaction counter deltas back into the UserProfile counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', type=float, default=0, metavar='SECONDS',
+            help='Keep running, flushing every SECONDS (0 runs once).',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['loop']
+        while True:
+            flushed = self.flush()
+            if options['verbosity'] >= 1:
+                self.stdout.write(f"Flushed shards for {flushed} profile(s).")
+            if not interval:
+                break
+            time.sleep(interval)
+
+    def flush(self):
+        profile_ids = (
+            ReactionCounterShard.objects.order_by('profile_id')
+            .values_list('profile_id', flat=True)
+            .distinct()
+        )
+        flushed = 0
+        # Materialize the id list first: fold_shards deletes from the same table
+        for profile_id in list(profile_ids):
+            if fold_shards(profile_id):
+                flushed += 1
+        return flushed
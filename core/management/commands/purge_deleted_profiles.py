@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import deletion
+from core.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Finish deleting profiles left pending (e.g. by a restart during a "
+        "background purge), or delete users with --user, in bounded chunks "
+        "that keep other profiles' reaction counters right."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', default=[], metavar='ID',
+            help='Also delete this user and everything they own (repeatable).',
+        )
+        parser.add_argument('--batch-size', type=int, help='Rows per DELETE (default DELETION_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        User = get_user_model()
+        for user_id in options['user']:
+            if not User.objects.filter(pk=user_id).exists():
+                raise CommandError(f'No user with id {user_id}.')
+            deletion.purge_user(user_id, batch_size=batch_size)
+            self.stdout.write(f"Deleted user {user_id}.")
+
+        pending = list(UserProfile.objects.filter(pending_delete=True).values_list('pk', flat=True))
+        for profile_id in pending:
+            reactions = deletion.purge_profile(profile_id, batch_size)
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"Purged profile {profile_id} ({reactions} reaction(s)).")
+        self.stdout.write(f"Purged {len(pending)} pending profile(s).")
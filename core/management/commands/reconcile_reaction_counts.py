@@ -0,0 +1,131 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from core import cache as profile_cache
+from core.models import Reaction, ReactionCounterShard, UserProfile
+from core.reactions import COUNTER_FIELDS
+
+FIELDS = tuple(COUNTER_FIELDS.values())
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute UserProfile reaction counters from the Reaction table and "
+        "fix the rows that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Profiles compared per chunk (default: 2000).',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report the differences without writing them.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        # The per-profile diff is always shown for --dry-run
+        self.show_diffs = dry_run or options['verbosity'] >= 2
+        checked = drifted = 0
+        last_id = 0
+        while True:
+            # Walk profiles by primary key so memory stays bounded by the batch
+            chunk = list(
+                UserProfile.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', *FIELDS)[:batch_size]
+            )
+            if not chunk:
+                break
+            first_id, last_id = chunk[0][0], chunk[-1][0]
+            expected = self.expected_counts(first_id, last_id)
+            stored = {row[0]: dict(zip(FIELDS, row[1:])) for row in chunk}
+            diffs = {
+                pk: expected.get(pk, dict.fromkeys(FIELDS, 0))
+                for pk, counts in stored.items()
+                if counts != expected.get(pk, dict.fromkeys(FIELDS, 0))
+            }
+            checked += len(chunk)
+            drifted += len(diffs)
+            for pk, counts in diffs.items():
+                self.report(pk, stored[pk], counts)
+            if diffs and not dry_run:
+                self.fix(list(diffs))
+
+        verb = 'would be updated' if dry_run else 'updated'
+        self.stdout.write(f"Checked {checked} profile(s); {drifted} {verb}.")
+
+    def expected_counts(self, first_id, last_id, profile_ids=None):
+        """Return ``{profile_id: counts}`` the counter columns should hold.
+
+        One grouped aggregate over the (profile, reaction) index for the id
+        range. Pending shard deltas are subtracted, since reads add them on
+        top of the stored columns.
+        """
+        reactions = Reaction.objects.filter(profile_id__gte=first_id, profile_id__lte=last_id)
+        shards = ReactionCounterShard.objects.filter(profile_id__gte=first_id, profile_id__lte=last_id)
+        if profile_ids is not None:
+            reactions = reactions.filter(profile_id__in=profile_ids)
+            shards = shards.filter(profile_id__in=profile_ids)
+
+        expected = {}
+        grouped = (
+            reactions.order_by()
+            .values_list('profile_id', 'reaction')
+            .annotate(total=Count('pk'))
+        )
+        for profile_id, reaction, total in grouped.iterator():
+            counts = expected.setdefault(profile_id, dict.fromkeys(FIELDS, 0))
+            counts[COUNTER_FIELDS[reaction]] = total
+
+        pending = shards.order_by().values('profile_id').annotate(
+            **{field: Sum(field) for field in FIELDS}
+        )
+        for row in pending:
+            counts = expected.setdefault(row['profile_id'], dict.fromkeys(FIELDS, 0))
+            for field in FIELDS:
+                counts[field] = max(0, counts[field] - row[field])
+        return expected
+
+    def fix(self, profile_ids):
+        # Lock the drifted rows and recompute them, so reactions committed
+        # since the first comparison are not overwritten
+        with transaction.atomic():
+            locked = list(
+                UserProfile.objects.select_for_update()
+                .filter(pk__in=profile_ids)
+                .order_by('pk')
+                .values_list('pk', flat=True)
+            )
+            if not locked:
+                return
+            expected = self.expected_counts(locked[0], locked[-1], profile_ids=locked)
+            now = timezone.now()
+            UserProfile.objects.bulk_update(
+                [
+                    UserProfile(pk=pk, updated_at=now, **expected.get(pk, dict.fromkeys(FIELDS, 0)))
+                    for pk in locked
+                ],
+                FIELDS + ('updated_at',),
+            )
+            # Cached profile pages still show the drifted counters
+            transaction.on_commit(lambda: self.invalidate(locked))
+
+    def invalidate(self, profile_ids):
+        for pk in profile_ids:
+            profile_cache.invalidate_profile(pk)
+
+    def report(self, pk, stored, expected):
+        if not self.show_diffs:
+            return
+        changes = ', '.join(
+            f"{field} {stored[field]} -> {expected[field]}"
+            for field in FIELDS
+            if stored[field] != expected[field]
+        )
+        self.stdout.write(f"profile {pk}: {changes}")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached top-K leaderboards from the reaction counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', type=float, default=0, metavar='SECONDS',
+            help='Keep running, refreshing every SECONDS (0 runs once).',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['loop']
+        while True:
+            for board in leaderboard.BOARDS:
+                entry = leaderboard.refresh(board)
+                if options['verbosity'] >= 1:
+                    self.stdout.write(f"{board}: {len(entry['rows'])} profile(s), floor {entry['floor']}.")
+            if not interval:
+                break
+            time.sleep(interval)
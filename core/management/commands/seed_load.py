@@ -0,0 +1,192 @@
+import random
+import time
+from array import array
+from itertools import accumulate
+
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Reaction, ReactionDailyRollup, UserProfile
+from core.reactions import COUNTER_FIELDS
+
+REACTION_TYPES = list(COUNTER_FIELDS)
+# Share of likes / loves / dislikes among generated reactions
+REACTION_WEIGHTS = [0.6, 0.25, 0.15]
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-create users, profiles and reactions for load testing. Profile "
+        "popularity follows a power law (a few profiles get most reactions). "
+        "Counters and today's rollups are written consistent with the "
+        "generated reactions. All seeded users share --password, hashed once "
+        "at a low --hash-iterations cost; a login upgrades it to the configured cost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Users to create, each with a profile.')
+        parser.add_argument('--reactions', type=int, default=100000, help='Approximate number of reactions.')
+        parser.add_argument('--alpha', type=float, default=1.1, help='Power-law exponent of profile popularity.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk INSERT.')
+        parser.add_argument('--prefix', default='seed', help='Username prefix of the seeded users.')
+        parser.add_argument('--password', default='seed-password', help='Password of every seeded user.')
+        parser.add_argument(
+            '--hash-iterations', type=int, default=1000,
+            help='PBKDF2 iterations of the shared password hash (0: the configured cost).',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible datasets.')
+        parser.add_argument('--clear', action='store_true', help='Delete users with --prefix first.')
+
+    def handle(self, *args, **options):
+        self.started = time.perf_counter()
+        self.batch_size = options['batch_size']
+        prefix = f"{options['prefix']}-"
+        existing = User.objects.filter(username__startswith=prefix)
+        if options['clear']:
+            deleted, _ = existing.delete()
+            self.log(f"Deleted {deleted} existing row(s) for prefix {prefix!r}.")
+        elif existing.exists():
+            raise CommandError(f"Users named {prefix!r}* already exist; pass --clear or another --prefix.")
+
+        users = options['users']
+        if users < 2:
+            raise CommandError('--users must be at least 2.')
+        per_user = min(options['reactions'] // users, users - 1)
+        extra = options['reactions'] - per_user * users if per_user < users - 1 else 0
+        plan = Plan(users, per_user, extra, options['alpha'], options['seed'])
+
+        # Pass 1: only count, so profiles are inserted with final counters
+        counts = [array('l', [0]) * users for _ in REACTION_TYPES]
+        total = 0
+        for reactor, target, kind in plan.reactions():
+            counts[kind][target] += 1
+            total += 1
+        self.log(f"Planned {total} reaction(s).")
+
+        user_ids = self.create_users(prefix, users, seed_password(options['password'], options['hash_iterations']))
+        profile_ids = self.create_profiles(user_ids, counts, options['seed'])
+
+        # Pass 2: the same random sequence again, now written out
+        batch = []
+        for reactor, target, kind in plan.reactions():
+            batch.append(Reaction(
+                user_id=user_ids[reactor], profile_id=profile_ids[target], reaction=REACTION_TYPES[kind],
+            ))
+            if len(batch) >= self.batch_size:
+                Reaction.objects.bulk_create(batch)
+                batch = []
+        Reaction.objects.bulk_create(batch)
+        self.log(f"Created {total} reaction(s).")
+
+        self.create_rollups(profile_ids, counts)
+        self.log("Done.")
+
+    def log(self, message):
+        self.stdout.write(f"[{time.perf_counter() - self.started:7.1f}s] {message}")
+
+    def create_users(self, prefix, count, password):
+        ids = array('q')
+        for start in range(0, count, self.batch_size):
+            names = [f'{prefix}{i}' for i in range(start, min(start + self.batch_size, count))]
+            with transaction.atomic():
+                User.objects.bulk_create([User(username=name, password=password) for name in names])
+            # Not every backend returns ids from bulk_create, so read them back
+            by_name = dict(User.objects.filter(username__in=names).values_list('username', 'id'))
+            ids.extend(by_name[name] for name in names)
+        self.log(f"Created {count} user(s).")
+        return ids
+
+    def create_profiles(self, user_ids, counts, seed):
+        ids = array('q')
+        # Its own stream, so attributes do not shift the reaction plan
+        rng = random.Random(f'profiles-{seed}')
+        for start in range(0, len(user_ids), self.batch_size):
+            indexes = range(start, min(start + self.batch_size, len(user_ids)))
+            UserProfile.objects.bulk_create([
+                UserProfile(
+                    user_id=user_ids[i],
+                    firstname=f'User{i}', lastname=rng.choice(['Smith', 'Jones', 'Brown', 'Garcia', 'Okafor']),
+                    age=rng.randint(18, 80), gender=rng.choice(['M', 'F', None]),
+                    address=f'{rng.randint(1, 999)} Example Street',
+                    profile_picture=f'profile_pictures/seed/{i % 100}.jpg',
+                    **{
+                        COUNTER_FIELDS[kind]: counts[k][i]
+                        for k, kind in enumerate(REACTION_TYPES)
+                    },
+                )
+                for i in indexes
+            ])
+            chunk = [user_ids[i] for i in indexes]
+            by_user = dict(UserProfile.objects.filter(user_id__in=chunk).values_list('user_id', 'id'))
+            ids.extend(by_user[user_id] for user_id in chunk)
+        self.log(f"Created {len(user_ids)} profile(s).")
+        return ids
+
+    def create_rollups(self, profile_ids, counts):
+        today = timezone.localdate()
+        batch = []
+        for k, kind in enumerate(REACTION_TYPES):
+            for i, added in enumerate(counts[k]):
+                if added:
+                    batch.append(ReactionDailyRollup(
+                        profile_id=profile_ids[i], day=today, reaction=kind, added=added,
+                    ))
+                if len(batch) >= self.batch_size:
+                    ReactionDailyRollup.objects.bulk_create(batch)
+                    batch = []
+        ReactionDailyRollup.objects.bulk_create(batch)
+        self.log("Wrote today's rollups.")
+
+
+def seed_password(password, iterations):
+    """Encode ``password`` with the preferred hasher at a reduced cost.
+
+    The hasher's ``must_update`` sees the lower iteration count, so the
+    hash is redone at the configured cost on the user's first login.
+    """
+    hasher = get_hasher()
+    if not iterations or not hasattr(hasher, 'iterations'):
+        return make_password(password)
+    return hasher.encode(password, hasher.salt(), iterations=iterations)
+
+
+class Plan:
+    """Deterministic stream of ``(reactor, target, kind)`` index triples.
+
+    Each reactor reacts to ``per_user`` distinct profiles other than their
+    own (the first ``extra`` reactors to one more); targets are drawn with
+    probability proportional to ``1 / rank ** alpha`` over a shuffled
+    popularity ranking.
+    """
+
+    def __init__(self, users, per_user, extra, alpha, seed):
+        self.users = users
+        self.per_user = per_user
+        self.extra = min(extra, users)
+        self.alpha = alpha
+        self.seed = seed
+
+    def reactions(self):
+        rng = random.Random(self.seed)
+        ranking = list(range(self.users))
+        rng.shuffle(ranking)
+        cum_weights = list(accumulate(1 / (rank + 1) ** self.alpha for rank in range(self.users)))
+        kind_weights = list(accumulate(REACTION_WEIGHTS))
+        for reactor in range(self.users):
+            wanted = self.per_user + (1 if reactor < self.extra else 0)
+            wanted = min(wanted, self.users - 1)
+            chosen = set()
+            attempts = 0
+            # Popular profiles repeat often; give up on a reactor rather than loop forever
+            while len(chosen) < wanted and attempts < wanted * 20:
+                for rank in rng.choices(range(self.users), cum_weights=cum_weights, k=wanted - len(chosen)):
+                    target = ranking[rank]
+                    if target != reactor:
+                        chosen.add(target)
+                attempts += wanted
+            kinds = rng.choices(range(len(REACTION_TYPES)), cum_weights=kind_weights, k=len(chosen))
+            for target, kind in zip(sorted(chosen), kinds):
+                yield reactor, target, kind
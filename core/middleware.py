@@ -0,0 +1,89 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from . import cache as profile_cache
+
+
+def get_current_profile_id(request):
+    """Return the id of the logged-in user's profile, or None.
+
+    Resolved at most once per request, from the shared user -> profile
+    cache entry (``core.cache``), which is invalidated whenever the user
+    creates or deletes a profile, in any session.
+    """
+    if not hasattr(request, '_cached_profile_id'):
+        request._cached_profile_id = _resolve_profile_id(request)
+    return request._cached_profile_id
+
+
+def _resolve_profile_id(request):
+    if not request.user.is_authenticated:
+        return None
+    return profile_cache.get_profile_id_for_user(request.user.pk)
+
+
+async def aget_current_profile_id(request):
+    """Async version of ``get_current_profile_id``."""
+    if not hasattr(request, '_cached_profile_id'):
+        request._cached_profile_id = await _aresolve_profile_id(request)
+    return request._cached_profile_id
+
+
+async def _aresolve_profile_id(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None
+    return await profile_cache.aget_profile_id_for_user(user.pk)
+
+
+async def aget_current_profile(request):
+    """Async version of ``get_current_profile``.
+
+    Once awaited, ``request.profile`` resolves without touching the database,
+    so templates can use it from async views.
+    """
+    if not hasattr(request, '_cached_profile'):
+        profile_id = await aget_current_profile_id(request)
+        request._cached_profile = await profile_cache.aget_profile(profile_id) if profile_id else None
+    return request._cached_profile
+
+
+def get_current_profile(request):
+    """Return the logged-in user's ``UserProfile`` instance, or None."""
+    if not hasattr(request, '_cached_profile'):
+        profile_id = get_current_profile_id(request)
+        request._cached_profile = profile_cache.get_profile(profile_id) if profile_id else None
+    return request._cached_profile
+
+
+def remember_profile(request, profile_id):
+    """Record that the current user's profile is now ``profile_id`` (or None)."""
+    request._cached_profile_id = profile_id
+    if hasattr(request, '_cached_profile'):
+        del request._cached_profile
+    profile_cache.invalidate_user_profile(request.user.pk)
+
+
+class CurrentProfileMiddleware:
+    """Expose the logged-in user's profile as a lazy ``request.profile``.
+
+    Must come after ``AuthenticationMiddleware``. Works in both sync and
+    async stacks, so async views are not forced through a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.profile = SimpleLazyObject(lambda: get_current_profile(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.profile = SimpleLazyObject(lambda: get_current_profile(request))
+        return await self.get_response(request)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_userprofile_dislikes_count_userprofile_likes_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactionCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('likes_count', models.IntegerField(default=0)),
+                ('loves_count', models.IntegerField(default=0)),
+                ('dislikes_count', models.IntegerField(default=0)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='core.userprofile')),
+            ],
+            options={
+                'unique_together': {('profile', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_reactioncountershard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='profile_pictures/thumbs/'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+"""Full-text index over ``UserProfile.address`` used by ``core.search``.
+
+SQLite gets an external-content FTS5 table kept in sync by triggers (skipped
+when SQLite lacks FTS5), MySQL a FULLTEXT index; other backends get nothing.
+
+The statements are spelled out here rather than imported from
+``core.search``, so later changes to that module cannot alter what this
+migration does.
+"""
+from django.db import migrations
+from django.db.utils import OperationalError
+
+SQLITE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_userprofile_address_fts USING fts5("
+    "address, content='core_userprofile', content_rowid='id')"
+)
+SQLITE_TRIGGERS = {
+    'core_userprofile_address_fts_ai': """
+        CREATE TRIGGER IF NOT EXISTS core_userprofile_address_fts_ai AFTER INSERT ON core_userprofile BEGIN
+            INSERT INTO core_userprofile_address_fts(rowid, address) VALUES (new.id, new.address);
+        END
+    """,
+    'core_userprofile_address_fts_ad': """
+        CREATE TRIGGER IF NOT EXISTS core_userprofile_address_fts_ad AFTER DELETE ON core_userprofile BEGIN
+            INSERT INTO core_userprofile_address_fts(core_userprofile_address_fts, rowid, address)
+            VALUES ('delete', old.id, old.address);
+        END
+    """,
+    'core_userprofile_address_fts_au': """
+        CREATE TRIGGER IF NOT EXISTS core_userprofile_address_fts_au AFTER UPDATE OF address ON core_userprofile BEGIN
+            INSERT INTO core_userprofile_address_fts(core_userprofile_address_fts, rowid, address)
+            VALUES ('delete', old.id, old.address);
+            INSERT INTO core_userprofile_address_fts(rowid, address) VALUES (new.id, new.address);
+        END
+    """,
+}
+
+
+def forwards(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(SQLITE_TABLE)
+            except OperationalError:
+                # SQLite compiled without FTS5
+                return
+            for statement in SQLITE_TRIGGERS.values():
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO core_userprofile_address_fts(core_userprofile_address_fts) VALUES ('rebuild')"
+            )
+        elif connection.vendor == 'mysql':
+            cursor.execute('CREATE FULLTEXT INDEX core_profile_address_ft ON core_userprofile (address)')
+
+
+def backwards(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute('DROP TABLE IF EXISTS core_userprofile_address_fts')
+        elif connection.vendor == 'mysql':
+            cursor.execute('DROP INDEX core_profile_address_ft ON core_userprofile')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_userprofile_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
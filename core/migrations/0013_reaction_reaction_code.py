@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_conversations'),
+    ]
+
+    operations = [
+        # Filled by 0014, then swapped in for the string column by 0015
+        migrations.AddField(
+            model_name='reaction',
+            name='reaction_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+    ]
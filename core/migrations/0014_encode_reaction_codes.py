@@ -0,0 +1,58 @@
+"""Copy ``Reaction.reaction`` names into the integer ``reaction_code`` column.
+
+Runs in primary-key batches of ``BATCH_SIZE``, each committed on its own
+(the migration is not atomic), and only touches rows whose code is still
+NULL. An interrupted run therefore keeps its progress and simply resumes
+when ``migrate`` is run again; 0015 repeats the pass to pick up rows
+written in between.
+"""
+from django.db import migrations, transaction
+from django.db.models import Case, Value, When
+
+BATCH_SIZE = 10000
+
+# Must match core.models.ReactionField.CODES
+CODES = {'like': 1, 'love': 2, 'dislike': 3}
+
+
+def batches(queryset):
+    """Yield ``(first_pk, last_pk)`` ranges of up to ``BATCH_SIZE`` rows."""
+    last = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE])
+        if not ids:
+            return
+        yield ids[0], ids[-1]
+        last = ids[-1]
+
+
+def encode(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Reaction = apps.get_model('core', 'Reaction')
+    pending = Reaction.objects.using(db).filter(reaction_code__isnull=True)
+    code = Case(*[When(reaction=name, then=Value(value)) for name, value in CODES.items()])
+    for first, last in batches(pending):
+        with transaction.atomic(using=db):
+            pending.filter(pk__gte=first, pk__lte=last).update(reaction_code=code)
+
+
+def decode(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Reaction = apps.get_model('core', 'Reaction')
+    rows = Reaction.objects.using(db).all()
+    name = Case(*[When(reaction_code=value, then=Value(name)) for name, value in CODES.items()])
+    for first, last in batches(rows):
+        with transaction.atomic(using=db):
+            rows.filter(pk__gte=first, pk__lte=last).update(reaction=name)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_reaction_reaction_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode, decode),
+    ]
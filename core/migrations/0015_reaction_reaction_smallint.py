@@ -0,0 +1,72 @@
+"""Replace the string ``Reaction.reaction`` column with the integer codes.
+
+The ``(profile, reaction)`` index is rebuilt over the 2-byte column, and
+the indexes duplicating a composite index's leading column are dropped:
+``user`` (twice: the FK index and an explicit one, both covered by the
+``(user, profile)`` unique index) and ``profile`` (covered by
+``(profile, reaction)``).
+"""
+from importlib import import_module
+
+import core.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+encoding = import_module('core.migrations.0014_encode_reaction_codes')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_encode_reaction_codes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Rows written since 0014 ran
+        migrations.RunPython(encoding.encode, migrations.RunPython.noop),
+        # Nullable so unapplying can re-add the column before refilling it
+        migrations.AlterField(
+            model_name='reaction',
+            name='reaction',
+            field=models.CharField(choices=[('like', 'Like'), ('love', 'Love'), ('dislike', 'Dislike')], max_length=7, null=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, encoding.decode),
+        migrations.RemoveIndex(
+            model_name='reaction',
+            name='core_reacti_profile_0e0b0c_idx',
+        ),
+        migrations.RemoveField(
+            model_name='reaction',
+            name='reaction',
+        ),
+        migrations.RenameField(
+            model_name='reaction',
+            old_name='reaction_code',
+            new_name='reaction',
+        ),
+        migrations.AlterField(
+            model_name='reaction',
+            name='reaction',
+            field=core.models.ReactionField(choices=[('like', 'Like'), ('love', 'Love'), ('dislike', 'Dislike')]),
+        ),
+        migrations.AddIndex(
+            model_name='reaction',
+            index=models.Index(fields=['profile', 'reaction'], name='core_reacti_profile_0e0b0c_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='reaction',
+            name='core_reacti_user_id_c0746d_idx',
+        ),
+        migrations.AlterField(
+            model_name='reaction',
+            name='profile',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='core.userprofile'),
+        ),
+        migrations.AlterField(
+            model_name='reaction',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
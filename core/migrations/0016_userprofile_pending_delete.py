@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_reaction_reaction_smallint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='pending_delete',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
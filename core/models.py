@@ -1,6 +1,14 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
+
+class UserProfileQuerySet(models.QuerySet):
+    def visible(self):
+        """Exclude profiles hidden while ``core.deletion`` purges them."""
+        return self.filter(pending_delete=False)
+
 
 # Create your models here.
 class UserProfile(models.Model):
@@ -22,15 +30,67 @@ class UserProfile(models.Model):
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, blank=True, null=True)
     address = models.TextField()
     profile_picture = models.ImageField(upload_to='profile_pictures/')
+    # Fixed-size thumbnail rendered in the background by core.images
+    profile_thumbnail = models.ImageField(upload_to='profile_pictures/thumbs/', blank=True, editable=False)
     # Denormalized reaction counters
     likes_count = models.PositiveIntegerField(default=0)
     loves_count = models.PositiveIntegerField(default=0)
     dislikes_count = models.PositiveIntegerField(default=0)
+    # Bumped by every save and counter update; drives ETag/Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
+    # Set (and ``user`` cleared) when deletion starts; see core.deletion
+    pending_delete = models.BooleanField(default=False, editable=False)
+
+    objects = UserProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Case-insensitive name prefix search (core.search) filters on
+            # ranges of LOWER(name), which these expression indexes serve
+            models.Index(Lower('firstname'), name='core_profile_firstname_lower'),
+            models.Index(Lower('lastname'), name='core_profile_lastname_lower'),
+            models.Index(fields=['gender', 'age'], name='core_profile_gender_age'),
+            models.Index(fields=['age'], name='core_profile_age'),
+            # Top-K leaderboards (core.leaderboard) read these in index order
+            models.Index(fields=['-likes_count', '-id'], name='core_profile_likes_rank'),
+            models.Index(fields=['-loves_count', '-id'], name='core_profile_loves_rank'),
+        ]
 
     def __str__(self):
         return f"{self.firstname} {self.lastname}"
 
 
+class ReactionField(models.PositiveSmallIntegerField):
+    """A reaction stored as a small integer code.
+
+    Python code, forms and JSON keep using the names (``Reaction.LIKE``
+    is still ``'like'``); only the column holds ``CODES``. The codes are
+    stored data: never renumber them, only append.
+    """
+    CODES = {'like': 1, 'love': 2, 'dislike': 3}
+    NAMES = {code: name for name, code in CODES.items()}
+
+    @cached_property
+    def validators(self):
+        # Values are names, checked against choices; skip the integer range checks
+        return list(self._validators)
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else self.NAMES.get(value, value)
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            if value not in self.NAMES:
+                raise ValidationError(f'Unknown reaction code {value}.', code='invalid')
+            return self.NAMES[value]
+        return value
+
+    def get_prep_value(self, value):
+        if isinstance(value, str) and value in self.CODES:
+            return self.CODES[value]
+        return super().get_prep_value(value)
+
+
 class Reaction(models.Model):
     LIKE = 'like'
     LOVE = 'love'
@@ -41,9 +101,14 @@ class Reaction(models.Model):
         (DISLIKE, 'Dislike'),
     ]
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reactions')
-    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='reactions')
-    reaction = models.CharField(max_length=7, choices=REACTION_CHOICES)
+    # No single-column FK indexes: the composite indexes below lead with
+    # these columns and serve the same lookups
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reactions', db_index=False,
+    )
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='reactions', db_index=False)
+    # Stored as a 2-byte code (ReactionField.CODES), also in the index below
+    reaction = ReactionField(choices=REACTION_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -51,7 +116,6 @@ class Reaction(models.Model):
         unique_together = ('user', 'profile')
         indexes = [
             models.Index(fields=['profile', 'reaction']),
-            models.Index(fields=['user']),
         ]
 
     def __str__(self):
@@ -65,4 +129,127 @@ class Reaction(models.Model):
     def save(self, *args, **kwargs):
         # Ensure clean() is called even when saving programmatically
         self.full_clean()
-        return super().save(*args, **kwargs)
\ No newline at end of file
+        return super().save(*args, **kwargs)
+
+
+class ReactionCounterShard(models.Model):
+    """Pending counter deltas for one profile, spread over several rows.
+
+    With ``REACTION_COUNTER_SHARDS`` enabled, each reaction updates a random
+    shard instead of the single ``UserProfile`` row; ``flush_reaction_shards``
+    folds the shards back into the denormalized counters.
+    """
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    likes_count = models.IntegerField(default=0)
+    loves_count = models.IntegerField(default=0)
+    dislikes_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('profile', 'shard')
+
+    def __str__(self):
+        return f"{self.profile_id}#{self.shard}"
+
+
+class ReactionDailyRollup(models.Model):
+    """Reaction activity on one profile, per day and reaction type.
+
+    ``added`` counts reactions of this type set that day (new or switched
+    to), ``removed`` those withdrawn or switched away. Written in batches
+    by ``core.rollups`` after the reactions commit; analytics read only
+    this table.
+    """
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    reaction = models.CharField(max_length=7, choices=Reaction.REACTION_CHOICES)
+    added = models.PositiveIntegerField(default=0)
+    removed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Also the index behind per-profile date-range reads
+        unique_together = ('profile', 'day', 'reaction')
+
+    def __str__(self):
+        return f"{self.profile_id} {self.day} {self.reaction}"
+
+
+class Conversation(models.Model):
+    """A direct conversation between two users.
+
+    Opened by ``core.chat`` once both users like or love each other's
+    profile. The pair is stored ordered (``user_low`` < ``user_high``) so
+    each pair of users has at most one conversation.
+    """
+    user_low = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user_low', 'user_high')
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(user_low__lt=models.F('user_high')), name='core_conversation_ordered_pair',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_low_id}-{self.user_high_id}"
+
+    def partner_id(self, user_id):
+        return self.user_high_id if self.user_low_id == user_id else self.user_low_id
+
+
+class ConversationMember(models.Model):
+    """One participant's view of a conversation: inbox position and unread count.
+
+    ``last_message_id`` and ``unread_count`` are maintained by every send,
+    so the inbox and unread totals never scan messages.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversation_memberships',
+        db_index=False,
+    )
+    last_message_id = models.BigIntegerField(default=0)
+    last_read_id = models.BigIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('conversation', 'user')
+        indexes = [
+            # Inbox, most recent activity first (keyset on last_message_id)
+            models.Index(fields=['user', '-last_message_id'], name='core_member_inbox'),
+            models.Index(fields=['user', 'unread_count'], name='core_member_unread'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in {self.conversation_id}"
+
+
+class Message(models.Model):
+    """A chat message. Append-only: rows are never updated."""
+    id = models.BigAutoField(primary_key=True)
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name='messages', db_index=False,
+    )
+    # None for the notice that opens a conversation
+    sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', null=True, blank=True,
+    )
+    body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # History pages are keyset ranges over this index
+            models.Index(fields=['conversation', 'id'], name='core_message_history'),
+        ]
+
+    def __str__(self):
+        return f"{self.conversation_id}#{self.pk}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Messages are append-only.')
+        return super().save(*args, **kwargs)
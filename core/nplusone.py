@@ -0,0 +1,158 @@
+"""Development/test detector for repeated query shapes (N+1 queries).
+
+``NPlusOneMiddleware`` fingerprints every SQL statement a request runs:
+the SQL before parameters are bound, with whitespace and ``IN (...)``
+lists collapsed. A fingerprint seen ``NPLUSONE_THRESHOLD`` times in one
+request, typically a lazy relation loaded once per list item, is reported
+with the place the repeat came from: the template file and line being
+rendered, if any, and the innermost project source line.
+
+Reports are logged to the ``core.nplusone`` logger as warnings. With
+``NPLUSONE_RAISE`` they raise ``NPlusOneError`` instead, which fails the
+test that made the request (see ``core.test_runner``).
+
+Enabled by ``NPLUSONE_DETECT`` (defaults to ``DEBUG``). When it is off the
+middleware raises ``MiddlewareNotUsed`` and costs nothing.
+"""
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('core.nplusone')
+
+# Transaction control repeats legitimately and carries no data
+IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT')
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_SPACE = re.compile(r'\s+')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    sql = _SPACE.sub(' ', sql).strip()
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def _project_root():
+    return str(Path(settings.BASE_DIR).resolve())
+
+
+def find_origin(frame):
+    """Return ``(template_location, source_location)`` for the query in ``frame``.
+
+    Walks outwards from the executing frame: the first template ``Node``
+    being rendered gives the template file and line, the first frame in
+    project code (outside site-packages and this module) the source line.
+    """
+    from django.template.base import Node
+
+    root = _project_root()
+    template = source = None
+    while frame is not None and (template is None or source is None):
+        if template is None:
+            node = frame.f_locals.get('self')
+            if isinstance(node, Node) and getattr(node, 'token', None) and getattr(node, 'origin', None):
+                template = f'{node.origin.name}:{node.token.lineno}'
+        if source is None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(root) and 'site-packages' not in filename and filename != __file__:
+                source = f'{filename[len(root) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return template, source
+
+
+class QueryShapes:
+    """Fingerprint counts and repeat origins for one request."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(IGNORED_PREFIXES):
+            shape = fingerprint(sql)
+            self.counts[shape] += 1
+            # Inspect the stack only once per shape, when it first repeats
+            if self.counts[shape] == 2:
+                self.origins[shape] = find_origin(sys._getframe(1))
+        return execute(sql, params, many, context)
+
+    def offenders(self):
+        return [
+            (shape, count, self.origins.get(shape, (None, None)))
+            for shape, count in self.counts.most_common()
+            if count >= self.threshold
+        ]
+
+
+def describe(view, offenders):
+    lines = [f'Repeated queries in {view}:']
+    for shape, count, (template, source) in offenders:
+        where = ', '.join(part for part in (template, source) if part) or 'unknown origin'
+        lines.append(f'  {count}x {shape[:200]}\n    at {where}')
+    return '\n'.join(lines)
+
+
+class NPlusOneMiddleware:
+    """Report repeated query shapes per request; see the module docstring.
+
+    Works in both sync and async stacks. On the async path the query
+    wrapper is installed from the request's sync thread, where the async
+    ORM runs its queries.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'NPLUSONE_DETECT', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        shapes = QueryShapes(getattr(settings, 'NPLUSONE_THRESHOLD', 3))
+        with ExitStack() as stack:
+            _wrap_queries(stack, shapes)
+            response = self.get_response(request)
+        self.report(request, shapes)
+        return response
+
+    async def __acall__(self, request):
+        shapes = QueryShapes(getattr(settings, 'NPLUSONE_THRESHOLD', 3))
+        stack = ExitStack()
+        await sync_to_async(_wrap_queries)(stack, shapes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.report(request, shapes)
+        return response
+
+    def report(self, request, shapes):
+        offenders = shapes.offenders()
+        if offenders:
+            match = getattr(request, 'resolver_match', None)
+            message = describe(match.view_name if match else request.path, offenders)
+            if getattr(settings, 'NPLUSONE_RAISE', False):
+                raise NPlusOneError(message)
+            logger.warning(message)
+
+
+def _wrap_queries(stack, shapes):
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(shapes))
@@ -0,0 +1,57 @@
+from django.conf import settings
+
+
+def get_page_size(request, default=None, maximum=None):
+    """Return the page size requested via ``?page_size=``, clamped to the allowed range."""
+    default = default or getattr(settings, 'PROFILE_PAGE_SIZE', 20)
+    maximum = maximum or getattr(settings, 'PROFILE_MAX_PAGE_SIZE', 100)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def get_cursor(request, name='after'):
+    """Return the integer cursor passed in the query string, or None."""
+    try:
+        value = int(request.GET.get(name, ''))
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def keyset_page(queryset, after=None, size=20, field='id', descending=False):
+    """Fetch one page of ``queryset`` ordered by ``field`` starting after ``after``.
+
+    Instead of OFFSET (which makes the database walk every skipped row), this
+    filters on the last seen key so each page is a bounded index range scan,
+    no matter how deep the client has scrolled.
+
+    Returns ``(items, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    if after is not None:
+        lookup = f'{field}__lt' if descending else f'{field}__gt'
+        queryset = queryset.filter(**{lookup: after})
+    ordering = f'-{field}' if descending else field
+    # Fetch one extra row to know whether another page exists
+    items = list(queryset.order_by(ordering)[:size + 1])
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = getattr(items[-1], field)
+    return items, next_cursor
+
+
+async def akeyset_page(queryset, after=None, size=20, field='id', descending=False):
+    """Async version of ``keyset_page`` using async iteration."""
+    if after is not None:
+        lookup = f'{field}__lt' if descending else f'{field}__gt'
+        queryset = queryset.filter(**{lookup: after})
+    ordering = f'-{field}' if descending else field
+    items = [item async for item in queryset.order_by(ordering)[:size + 1]]
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = getattr(items[-1], field)
+    return items, next_cursor
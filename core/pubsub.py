@@ -0,0 +1,108 @@
+"""Pub/sub used to push live updates to WebSocket clients.
+
+The backend is chosen with ``PUBSUB_BACKEND`` (a dotted path). The default
+``InProcessBroker`` only reaches subscribers in the same process; a shared
+backend (e.g. Redis) can be plugged in by implementing ``publish`` and
+``subscribe`` with the same signatures.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """Messages for one channel, consumed from the subscriber's event loop."""
+
+    def __init__(self, broker, channel, loop):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def deliver(self, message):
+        # May be called from any thread (e.g. a sync view)
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def latest(self, message):
+        """Drop queued messages older than the newest one and return it."""
+        while not self.queue.empty():
+            message = self.queue.get_nowait()
+        return message
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fan messages out to subscriptions living in this process."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Subscribe the running event loop to ``channel``."""
+        subscription = Subscription(self, channel, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = getattr(settings, 'PUBSUB_BACKEND', 'core.pubsub.InProcessBroker')
+            _broker = import_string(backend)()
+        return _broker
+
+
+def profile_channel(profile_id):
+    return f'profile:{profile_id}'
+
+
+def publish_profile_counts(profile_id, counts):
+    """Push a profile's new reaction counters to its live viewers."""
+    return get_broker().publish(profile_channel(profile_id), {
+        'type': 'counts',
+        'profile_id': profile_id,
+        **counts,
+    })
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def publish_message(recipient_ids, message):
+    """Push a chat message (as built by ``core.chat.serialize``) to its participants."""
+    broker = get_broker()
+    return sum(
+        broker.publish(user_channel(user_id), {'type': 'message', **message})
+        for user_id in recipient_ids
+    )
@@ -0,0 +1,205 @@
+"""Token-bucket rate limiting for write endpoints.
+
+``ratelimit(scope)`` decorates a (sync or async) view. Each request it
+applies to takes one token from the bucket named by ``scope`` and the
+request's ``key`` (by default the user, or the client address for
+anonymous requests). A bucket holds up to N tokens and refills at N per
+period, so ``'10/10s'`` allows a burst of 10 and then one request a second.
+An empty bucket answers 429 with ``Retry-After``: JSON for AJAX requests,
+or the decorator's ``limited`` response.
+
+Rates come from ``RATELIMITS`` (scope -> ``'count/period'``, the period in
+seconds or with an ``s``/``m``/``h`` suffix); a scope without a rate is
+not limited, and ``RATELIMIT_ENABLED`` switches limiting off entirely.
+
+The bucket store is chosen with ``RATELIMIT_BACKEND`` (a dotted path):
+
+- ``LocalTokenBuckets`` (default) keeps buckets in this process, so each
+  worker process enforces the rate on its own.
+- ``CacheTokenBuckets`` keeps them in the cache ``RATELIMIT_CACHE_ALIAS``,
+  shared by every process using that cache. Django's cache API has no
+  compare-and-set, so concurrent requests for the same key may both spend
+  the last token; the limit is approximate by a request or two.
+"""
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.utils.module_loading import import_string
+
+_RATE = re.compile(r'^\s*(\d+)\s*/\s*(\d*(?:\.\d+)?)\s*([smh]?)\s*$')
+_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_rate(rate):
+    """Return ``(capacity, tokens_per_second)`` for a ``'count/period'`` rate."""
+    match = _RATE.match(rate)
+    if not match:
+        raise ValueError(f'Invalid rate {rate!r}; expected e.g. "10/10s" or "60/m".')
+    count, period, unit = match.groups()
+    seconds = float(period or 1) * _UNITS[unit]
+    if not int(count) or not seconds:
+        raise ValueError(f'Invalid rate {rate!r}; count and period must be positive.')
+    return int(count), int(count) / seconds
+
+
+def _take(tokens, stamp, now, capacity, per_second):
+    """Refill a bucket up to ``now`` and take a token.
+
+    Returns ``(tokens, retry_after)``; ``retry_after`` is 0 when the token
+    was taken, otherwise the seconds until one is available.
+    """
+    tokens = min(capacity, tokens + (now - stamp) * per_second)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / per_second
+
+
+class LocalTokenBuckets:
+    """Buckets in this process; the least recently used are dropped past ``max_keys``."""
+
+    def __init__(self, max_keys=None):
+        self.max_keys = max_keys or getattr(settings, 'RATELIMIT_LOCAL_MAX_KEYS', 10000)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, per_second):
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (capacity, now))
+            tokens, retry_after = _take(tokens, stamp, now, capacity, per_second)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                # A dropped bucket starts full again, as an idle one would be
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    async def aconsume(self, key, capacity, per_second):
+        return self.consume(key, capacity, per_second)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheTokenBuckets:
+    """Buckets in a Django cache, shared between processes; see the module docstring."""
+
+    def __init__(self, alias=None):
+        self.alias = alias or getattr(settings, 'RATELIMIT_CACHE_ALIAS', 'default')
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _update(self, state, capacity, per_second):
+        now = time.time()
+        tokens, stamp = state or (capacity, now)
+        tokens, retry_after = _take(tokens, stamp, now, capacity, per_second)
+        # Once it could have refilled completely the entry carries no information
+        timeout = math.ceil(capacity / per_second) + 1
+        return (tokens, now), timeout, retry_after
+
+    def consume(self, key, capacity, per_second):
+        state, timeout, retry_after = self._update(self.cache.get(key), capacity, per_second)
+        self.cache.set(key, state, timeout)
+        return retry_after
+
+    async def aconsume(self, key, capacity, per_second):
+        state, timeout, retry_after = self._update(await self.cache.aget(key), capacity, per_second)
+        await self.cache.aset(key, state, timeout)
+        return retry_after
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter():
+    backend = getattr(settings, 'RATELIMIT_BACKEND', 'core.ratelimit.LocalTokenBuckets')
+    with _limiters_lock:
+        if backend not in _limiters:
+            _limiters[backend] = import_string(backend)()
+        return _limiters[backend]
+
+
+def get_rate(scope):
+    if not getattr(settings, 'RATELIMIT_ENABLED', True):
+        return None
+    rate = getattr(settings, 'RATELIMITS', {}).get(scope)
+    return parse_rate(rate) if rate else None
+
+
+def user_key(request, kwargs):
+    """One bucket per user; anonymous requests share one per client address."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def user_profile_key(request, kwargs):
+    """One bucket per user and target profile (the view's ``pk``)."""
+    return f"{user_key(request, kwargs)}:profile:{kwargs['pk']}"
+
+
+def too_many_requests(request, retry_after):
+    """Default response for a limited request: 429, JSON when the client wants it."""
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest' or (
+        'application/json' in (request.headers.get('accept') or '')
+    ):
+        response = JsonResponse({'error': 'Too many requests', 'retry_after': retry_after}, status=429)
+    else:
+        response = HttpResponse('Too many requests.', status=429, content_type='text/plain')
+    return retry_after_header(response, retry_after)
+
+
+def retry_after_header(response, retry_after):
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, key=user_key, methods=('POST',), limited=too_many_requests):
+    """Limit a view to the rate configured for ``scope``; see the module docstring.
+
+    ``key(request, view_kwargs)`` names the bucket within the scope; only
+    requests whose method is in ``methods`` take tokens. ``limited(request,
+    retry_after)`` builds the response for a limited request, with
+    ``retry_after`` in whole seconds.
+    """
+    def bucket(request, kwargs):
+        rate = get_rate(scope) if request.method in methods else None
+        if rate is None:
+            return None
+        return (f'ratelimit:{scope}:{key(request, kwargs)}', *rate)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if request.method in methods:
+                    # Keys read request.user, which must not load lazily here
+                    request.user = await request.auser()
+                params = bucket(request, kwargs)
+                if params is not None:
+                    retry_after = await get_limiter().aconsume(*params)
+                    if retry_after:
+                        return limited(request, math.ceil(retry_after))
+                return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                params = bucket(request, kwargs)
+                if params is not None:
+                    retry_after = get_limiter().consume(*params)
+                    if retry_after:
+                        return limited(request, math.ceil(retry_after))
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,244 @@
+"""Reaction write path shared by the views.
+
+``apply_reaction`` performs the create / toggle-off / switch logic and the
+matching counter adjustment in a fixed, small number of statements:
+
+1. ``SELECT ... FOR UPDATE`` on the profile row (existence, owner and the
+   current counters in one read),
+2. ``SELECT`` of the reactor's existing reaction,
+3. one ``INSERT``, ``DELETE`` or ``UPDATE`` on the reaction row,
+4. one ``UPDATE`` of the profile counters using ``CASE`` expressions,
+
+The daily rollups (``core.rollups``) are buffered after commit and written
+outside this transaction.
+
+The new counts are computed from the locked snapshot, so no follow-up
+SELECTs are needed to build the response.
+
+When ``REACTION_COUNTER_SHARDS`` is set, step 4 instead adds the deltas to a
+random ``ReactionCounterShard`` row and the profile row is never locked, so
+reactors on one hot profile no longer queue on a single row. Reads then sum
+the shards on top of the base counters until ``flush_reaction_shards`` folds
+them back.
+"""
+import random
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.utils import timezone
+
+from . import cache as profile_cache
+from . import rollups
+from .models import Reaction, ReactionCounterShard, UserProfile
+
+# Denormalized counter on UserProfile for each reaction type
+COUNTER_FIELDS = {
+    Reaction.LIKE: 'likes_count',
+    Reaction.LOVE: 'loves_count',
+    Reaction.DISLIKE: 'dislikes_count',
+}
+
+
+def counter_deltas(old, new):
+    """Return ``{counter_field: delta}`` for moving a reaction from ``old`` to ``new``.
+
+    Either side may be None (no reaction).
+    """
+    deltas = {}
+    if old is not None:
+        deltas[COUNTER_FIELDS[old]] = deltas.get(COUNTER_FIELDS[old], 0) - 1
+    if new is not None:
+        deltas[COUNTER_FIELDS[new]] = deltas.get(COUNTER_FIELDS[new], 0) + 1
+    return {field: delta for field, delta in deltas.items() if delta}
+
+
+def counter_updates(deltas):
+    """Build ``update()`` kwargs applying ``deltas`` to the counter columns.
+
+    Decrements are wrapped in a CASE so a drifted counter is clamped at zero
+    instead of violating the unsigned column. ``updated_at`` is bumped along
+    with any counter change.
+    """
+    updates = {}
+    for field, delta in deltas.items():
+        if delta > 0:
+            updates[field] = F(field) + delta
+        else:
+            updates[field] = Case(
+                When(**{f'{field}__gte': -delta}, then=F(field) + delta),
+                default=Value(0),
+            )
+    if updates:
+        updates['updated_at'] = timezone.now()
+    return updates
+
+
+def get_shard_count():
+    """Number of counter shards per profile; 0 disables sharding."""
+    return getattr(settings, 'REACTION_COUNTER_SHARDS', 0)
+
+
+def add_to_shard(profile_id, deltas, shards):
+    """Apply counter ``deltas`` to a random one of the profile's ``shards`` rows."""
+    if not deltas:
+        return
+    shard = random.randrange(shards)
+    rows = ReactionCounterShard.objects.filter(profile_id=profile_id, shard=shard)
+    increments = {field: F(field) + delta for field, delta in deltas.items()}
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            ReactionCounterShard.objects.create(profile_id=profile_id, shard=shard, **deltas)
+    except IntegrityError:
+        # Another reactor created the shard row first
+        rows.update(**increments)
+
+
+def get_counts(profile_ids):
+    """Return ``{profile_id: {counter: value}}`` with pending shard deltas included.
+
+    Uses one aggregate query, so the base value and the shard sums come from
+    the same snapshot even while a flush is running. Profiles pending
+    deletion are left out.
+    """
+    sums = {field: Sum(f'counter_shards__{field}') for field in COUNTER_FIELDS.values()}
+    rows = (
+        UserProfile.objects.visible().filter(pk__in=profile_ids)
+        .values('pk', *COUNTER_FIELDS.values())
+        .annotate(**{f'pending_{field}': agg for field, agg in sums.items()})
+    )
+    return {
+        row['pk']: {
+            field: max(0, row[field] + (row[f'pending_{field}'] or 0))
+            for field in COUNTER_FIELDS.values()
+        }
+        for row in rows
+    }
+
+
+def include_pending_counts(profiles):
+    """Add unflushed shard deltas to the counters of ``profiles`` in place."""
+    profiles = list(profiles)
+    if not profiles or not get_shard_count():
+        return profiles
+    pending = (
+        ReactionCounterShard.objects.filter(profile_id__in=[p.pk for p in profiles])
+        .values('profile_id')
+        .annotate(**{field: Sum(field) for field in COUNTER_FIELDS.values()})
+    )
+    by_profile = {row['profile_id']: row for row in pending}
+    for profile in profiles:
+        row = by_profile.get(profile.pk)
+        if row:
+            for field in COUNTER_FIELDS.values():
+                setattr(profile, field, max(0, getattr(profile, field) + row[field]))
+    return profiles
+
+
+def fold_shards(profile_id):
+    """Move a profile's shard deltas into its ``UserProfile`` counters."""
+    with transaction.atomic():
+        rows = list(
+            ReactionCounterShard.objects.select_for_update()
+            .filter(profile_id=profile_id)
+            .values('pk', *COUNTER_FIELDS.values())
+        )
+        if not rows:
+            return False
+        totals = {field: sum(row[field] for row in rows) for field in COUNTER_FIELDS.values()}
+        ReactionCounterShard.objects.filter(pk__in=[row['pk'] for row in rows]).delete()
+        updates = counter_updates({field: delta for field, delta in totals.items() if delta})
+        if updates:
+            UserProfile.objects.filter(pk=profile_id).update(**updates)
+            # Cached snapshots hold the old base counters, which no longer
+            # add up with the (now empty) shards
+            transaction.on_commit(lambda: profile_cache.invalidate_profile(profile_id))
+    return True
+
+
+def _insert_reaction(user, profile_id, value, savepoint):
+    """Insert a reaction row; False if one for the same user and profile won the race."""
+    reaction = Reaction(user=user, profile_id=profile_id, reaction=value)
+    if not savepoint:
+        Reaction.objects.bulk_create([reaction])
+        return True
+    try:
+        with transaction.atomic():
+            Reaction.objects.bulk_create([reaction])
+    except IntegrityError:
+        return False
+    return True
+
+
+def apply_reaction(user, profile_id, value, shards=None):
+    """Create, remove (toggle off) or switch ``user``'s reaction on a profile.
+
+    Returns a dict with the new ``likes_count``, ``loves_count``,
+    ``dislikes_count`` and the user's resulting ``my_reaction`` (or None).
+    ``shards`` overrides the ``REACTION_COUNTER_SHARDS`` setting.
+
+    Raises ``UserProfile.DoesNotExist`` if the profile is gone and
+    ``ValidationError`` for an invalid reaction or a self-reaction.
+    """
+    if value not in COUNTER_FIELDS:
+        raise ValidationError('Invalid reaction.')
+    if shards is None:
+        shards = get_shard_count()
+
+    with transaction.atomic():
+        profiles = UserProfile.objects.visible().filter(pk=profile_id)
+        if not shards:
+            # Unsharded: the profile row is the serialization point
+            profiles = profiles.select_for_update()
+        snapshot = profiles.values('user_id', *COUNTER_FIELDS.values()).first()
+        if snapshot is None:
+            raise UserProfile.DoesNotExist('No UserProfile matches the given query.')
+        if snapshot['user_id'] == user.pk:
+            raise ValidationError("You can't react to your own profile.")
+
+        reactions = Reaction.objects.filter(user=user, profile_id=profile_id)
+        if shards:
+            reactions = reactions.select_for_update()
+        existing = reactions.values_list('pk', 'reaction').first()
+        while existing is None:
+            # The ownership check above replaces Reaction.clean(), so skip the
+            # extra validation queries done by Reaction.save()
+            if _insert_reaction(user, profile_id, value, savepoint=bool(shards)):
+                break
+            # Sharded mode takes no profile lock, so a concurrent request by
+            # the same user can insert first; act on its row instead
+            existing = reactions.values_list('pk', 'reaction').first()
+        old = existing[1] if existing else None
+        if existing is None:
+            current = value
+        elif old == value:
+            Reaction.objects.filter(pk=existing[0]).delete()
+            current = None
+        else:
+            Reaction.objects.filter(pk=existing[0]).update(
+                reaction=value, updated_at=timezone.now(),
+            )
+            current = value
+
+        deltas = counter_deltas(old, current)
+        rollups.record(profile_id, old, current)
+        if shards:
+            add_to_shard(profile_id, deltas, shards)
+        else:
+            UserProfile.objects.filter(pk=profile_id).update(**counter_updates(deltas))
+
+    if shards:
+        # The snapshot was not locked, so read base + shards back in one query
+        state = get_counts([profile_id]).get(profile_id, dict.fromkeys(COUNTER_FIELDS.values(), 0))
+        state['my_reaction'] = current
+        return state
+
+    state = {
+        field: max(0, snapshot[field] + deltas.get(field, 0))
+        for field in COUNTER_FIELDS.values()
+    }
+    state['my_reaction'] = current
+    return state
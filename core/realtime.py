@@ -0,0 +1,131 @@
+"""WebSocket endpoints served from the ASGI entry point (``chat_app/asgi.py``).
+
+``/ws/profiles/<id>/`` streams ``{"type": "counts", ...}`` messages whenever a
+reaction on that profile commits. Bursts are coalesced so each connection
+receives at most ``REALTIME_MAX_UPDATES_PER_SECOND`` messages; every
+message carries the latest counters, so skipped ones lose nothing.
+
+``/ws/messages/`` streams ``{"type": "message", ...}`` for every chat
+message in the user's conversations (``core.chat``). These are never
+coalesced or rate limited.
+
+Browsers send the session cookie with cross-site WebSocket handshakes, so
+a handshake is refused unless its ``Origin`` is this site: a host in
+``ALLOWED_HOSTS`` or an origin in ``CSRF_TRUSTED_ORIGINS``.
+"""
+import asyncio
+import json
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.http.request import split_domain_port, validate_host
+from django.utils.http import is_same_domain
+
+from .pubsub import get_broker, profile_channel, user_channel
+
+PROFILE_PATH = re.compile(r'^/ws/profiles/(?P<pk>\d+)/$')
+MESSAGES_PATH = '/ws/messages/'
+
+# Close codes in the application range (4000-4999)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+
+
+async def authenticate(scope):
+    """Return the user owning the session cookie sent with the handshake."""
+    headers = dict(scope.get('headers') or [])
+    cookies = SimpleCookie(headers.get(b'cookie', b'').decode('latin-1'))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(morsel.value if morsel else None)
+    return await aget_user(SimpleNamespace(session=session))
+
+
+def origin_allowed(scope):
+    """Whether the handshake's ``Origin`` header names this site."""
+    headers = dict(scope.get('headers') or [])
+    origin = headers.get(b'origin', b'').decode('latin-1')
+    parsed = urlsplit(origin)
+    if not parsed.scheme or not parsed.netloc:
+        return False
+    # Same fallback as HttpRequest.get_host()
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    domain = split_domain_port(parsed.netloc)[0]
+    if domain and validate_host(domain, allowed_hosts):
+        return True
+    for trusted in settings.CSRF_TRUSTED_ORIGINS:
+        if origin == trusted:
+            return True
+        trusted = urlsplit(trusted)
+        if '*' in trusted.netloc and trusted.scheme == parsed.scheme:
+            if is_same_domain(parsed.netloc, trusted.netloc.lstrip('*')):
+                return True
+    return False
+
+
+def update_interval():
+    rate = getattr(settings, 'REALTIME_MAX_UPDATES_PER_SECOND', 4)
+    return 1 / rate if rate else 0
+
+
+async def forward(subscription, send, interval, coalesce=True):
+    """Relay messages to the socket, at most one per ``interval`` seconds.
+
+    With ``coalesce`` off every message is relayed, without pausing.
+    """
+    while True:
+        message = await subscription.get()
+        if not coalesce:
+            await send({'type': 'websocket.send', 'text': json.dumps(message)})
+            continue
+        # Everything queued during the last pause is superseded by the newest
+        message = subscription.latest(message)
+        await send({'type': 'websocket.send', 'text': json.dumps(message)})
+        if interval:
+            await asyncio.sleep(interval)
+
+
+async def stream_channel(scope, receive, send, channel, coalesce=True):
+    """Accept the socket and stream ``channel`` until the client goes away."""
+    await send({'type': 'websocket.accept'})
+    subscription = get_broker().subscribe(channel)
+    relay = asyncio.create_task(forward(subscription, send, update_interval(), coalesce))
+    try:
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                break
+            # Clients only listen; anything they send is ignored
+    finally:
+        relay.cancel()
+        subscription.close()
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI application handling ``websocket`` connections."""
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    match = PROFILE_PATH.match(scope['path'])
+    if match is None and scope['path'] != MESSAGES_PATH:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    if not origin_allowed(scope):
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+    user = await authenticate(scope)
+    if not user.is_authenticated:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+    if match is None:
+        await stream_channel(scope, receive, send, user_channel(user.pk), coalesce=False)
+    else:
+        await stream_channel(scope, receive, send, profile_channel(int(match['pk'])))
@@ -0,0 +1,160 @@
+"""Per-profile daily reaction rollups for time-series charts.
+
+``record`` is called by ``apply_reaction`` but writes nothing itself: once
+the reaction's transaction commits, the change is added to a per-process
+buffer, and a timer flushes the buffer ``ROLLUP_FLUSH_SECONDS`` after its
+first entry, one upsert per ``(profile, day, reaction)``. Reactors on a hot
+profile therefore never queue on its rollup row, and the reaction
+transaction holds no lock for it. Changes still buffered when a process
+dies are lost; the charts are analytics, not a ledger. Reads
+(``daily_series``) only touch ``ReactionDailyRollup``, one index range scan
+over ``(profile, day)``, never the reactions table.
+
+With ``BACKGROUND_TASKS_ASYNC`` off (as ``core.test_runner`` sets it) each
+change is flushed as soon as it is buffered.
+
+Days are in the current time zone (``timezone.localdate``).
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import tasks
+from .models import Reaction, ReactionDailyRollup
+
+logger = logging.getLogger(__name__)
+
+REACTIONS = [value for value, label in Reaction.REACTION_CHOICES]
+
+# (profile_id, day, reaction) -> Counter(added=..., removed=...)
+_pending = {}
+_pending_lock = threading.Lock()
+_timer = None
+
+
+def _bump(profile_id, day, reaction, **amounts):
+    """Add ``amounts`` (``added``/``removed``) to one rollup row, creating it if needed."""
+    increments = {field: F(field) + amount for field, amount in amounts.items() if amount}
+    if not increments:
+        return
+    rows = ReactionDailyRollup.objects.filter(profile_id=profile_id, day=day, reaction=reaction)
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            ReactionDailyRollup.objects.create(
+                profile_id=profile_id, day=day, reaction=reaction, **amounts,
+            )
+    except IntegrityError:
+        # Another process created the row first, or the profile is gone
+        rows.update(**increments)
+
+
+def get_flush_interval():
+    return getattr(settings, 'ROLLUP_FLUSH_SECONDS', 10)
+
+
+def _tasks_async():
+    return getattr(settings, 'BACKGROUND_TASKS_ASYNC', True)
+
+
+def _schedule_flush():
+    # Called with _pending_lock held
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(get_flush_interval(), tasks.submit, args=(flush,))
+        _timer.daemon = True
+        _timer.start()
+
+
+def _buffer(changes):
+    with _pending_lock:
+        for key, field in changes:
+            _pending.setdefault(key, Counter())[field] += 1
+        if _tasks_async():
+            _schedule_flush()
+    if not _tasks_async():
+        flush()
+
+
+def flush():
+    """Write the buffered changes; returns the number of rollup rows touched."""
+    global _timer
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _timer = None
+    failed = {}
+    for (profile_id, day, reaction), amounts in pending.items():
+        try:
+            _bump(profile_id, day, reaction, **amounts)
+        except Exception:
+            logger.exception("Could not flush rollup for profile %s on %s", profile_id, day)
+            failed[profile_id, day, reaction] = amounts
+    if failed:
+        # Keep them for the next flush
+        with _pending_lock:
+            for key, amounts in failed.items():
+                _pending.setdefault(key, Counter()).update(amounts)
+            if _tasks_async():
+                _schedule_flush()
+    return len(pending) - len(failed)
+
+
+atexit.register(flush)
+
+
+def record(profile_id, old, new, day=None):
+    """Count a reaction moving from ``old`` to ``new`` (either may be None).
+
+    Buffered once the current transaction commits; see the module docstring.
+    """
+    if old == new:
+        return
+    day = day or timezone.localdate()
+    changes = []
+    if old is not None:
+        changes.append(((profile_id, day, old), 'removed'))
+    if new is not None:
+        changes.append(((profile_id, day, new), 'added'))
+    transaction.on_commit(lambda: _buffer(changes))
+
+
+def record_removed(profile_id, reaction, count, day=None):
+    """Count ``count`` reactions of one type withdrawn at once (bulk deletion)."""
+    if count:
+        _bump(profile_id, day or timezone.localdate(), reaction, removed=count)
+
+
+def daily_series(profile_id, start, end):
+    """Return one entry per day from ``start`` to ``end`` inclusive.
+
+    Each entry is ``{'day': date, '<reaction>': {'added', 'removed', 'net'}}``
+    for every reaction type; days without activity are zero-filled.
+    """
+    rows = (
+        ReactionDailyRollup.objects
+        .filter(profile_id=profile_id, day__gte=start, day__lte=end)
+        .values_list('day', 'reaction', 'added', 'removed')
+    )
+    by_day = {}
+    for day, reaction, added, removed in rows:
+        by_day[day, reaction] = (added, removed)
+
+    series = []
+    day = start
+    while day <= end:
+        entry = {'day': day}
+        for reaction in REACTIONS:
+            added, removed = by_day.get((day, reaction), (0, 0))
+            entry[reaction] = {'added': added, 'removed': removed, 'net': added - removed}
+        series.append(entry)
+        day += timedelta(days=1)
+    return series
@@ -0,0 +1,158 @@
+"""Index-backed profile search.
+
+- Names: case-insensitive prefix match, expressed as a range on
+  ``LOWER(firstname)`` / ``LOWER(lastname)`` so the expression indexes on
+  ``UserProfile`` serve it (``LIKE 'x%'`` with case folding generally can't).
+- Gender and age: equality/range on the ``(gender, age)`` and ``age`` indexes.
+- Address: full-text match through SQLite FTS5 or a MySQL FULLTEXT index
+  (created by migration 0009). On other databases, or SQLite built without FTS5,
+  ``fulltext_available`` is False and callers should refuse address queries
+  rather than fall back to a ``LIKE '%x%'`` scan.
+"""
+import re
+
+from django.db import connection as default_connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'core_userprofile_address_fts'
+MYSQL_FULLTEXT_INDEX = 'core_profile_address_ft'
+
+_SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_userprofile BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, address) VALUES (new.id, new.address);
+    END""",
+    f'{FTS_TABLE}_ad': f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_userprofile BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, address) VALUES ('delete', old.id, old.address);
+    END""",
+    # Only address writes touch the index, not the hot counter updates
+    f'{FTS_TABLE}_au': f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF address ON core_userprofile BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, address) VALUES ('delete', old.id, old.address);
+        INSERT INTO {FTS_TABLE}(rowid, address) VALUES (new.id, new.address);
+    END""",
+}
+
+# Per-alias memo of fulltext_available()
+_available = {}
+
+
+def _sqlite_objects(cursor, kind):
+    cursor.execute('SELECT name FROM sqlite_master WHERE type = %s', [kind])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def install_fulltext(connection):
+    """Create the address full-text index for ``connection`` if supported."""
+    _available.pop(connection.alias, None)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    f"address, content='core_userprofile', content_rowid='id')"
+                )
+            except OperationalError:
+                # SQLite compiled without FTS5
+                return
+            for statement in _SQLITE_TRIGGERS.values():
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'mysql':
+            cursor.execute(f'CREATE FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} ON core_userprofile (address)')
+
+
+def uninstall_fulltext(connection):
+    _available.pop(connection.alias, None)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in _SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        elif connection.vendor == 'mysql':
+            cursor.execute(f'DROP INDEX {MYSQL_FULLTEXT_INDEX} ON core_userprofile')
+
+
+def repair_fulltext_triggers(connection):
+    """Recreate SQLite sync triggers lost when a migration rebuilt the table.
+
+    SQLite's ``ALTER`` emulation copies ``core_userprofile`` into a new table,
+    which drops its triggers; run after every ``migrate`` (see ``apps.py``).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if FTS_TABLE not in _sqlite_objects(cursor, 'table'):
+            return
+        if set(_SQLITE_TRIGGERS) <= _sqlite_objects(cursor, 'trigger'):
+            return
+    install_fulltext(connection)
+
+
+def fulltext_available(connection=default_connection):
+    if connection.alias not in _available:
+        if connection.vendor == 'mysql':
+            _available[connection.alias] = True
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                _available[connection.alias] = FTS_TABLE in _sqlite_objects(cursor, 'table')
+        else:
+            _available[connection.alias] = False
+    return _available[connection.alias]
+
+
+def prefix_range(prefix):
+    """Return ``(low, high)`` such that ``low <= s < high`` iff ``s`` starts with ``prefix``."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def name_prefix(field, prefix):
+    low, high = prefix_range(prefix.lower())
+    return Q(GreaterThanOrEqual(Lower(field), low), LessThan(Lower(field), high))
+
+
+def name_filter(text):
+    """``Q`` for a name query: one word matches either name, two match first and last."""
+    words = text.split()
+    if not words:
+        return Q()
+    if len(words) == 1:
+        return name_prefix('firstname', words[0]) | name_prefix('lastname', words[0])
+    return name_prefix('firstname', words[0]) & name_prefix('lastname', words[-1])
+
+
+def address_filter(text, connection=default_connection):
+    """Filter expression matching addresses containing all words of ``text`` (as prefixes)."""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return Q()
+    if connection.vendor == 'mysql':
+        query = ' '.join(f'+{word}*' for word in words)
+        return RawSQL(
+            'MATCH(core_userprofile.address) AGAINST (%s IN BOOLEAN MODE)', [query],
+            output_field=BooleanField(),
+        )
+    query = ' '.join(f'"{word}"*' for word in words)
+    return Q(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query]))
+
+
+def search_profiles(queryset, name=None, gender=None, age_min=None, age_max=None, address=None):
+    """Narrow ``queryset`` of ``UserProfile`` by the given criteria.
+
+    Raises ``ValueError`` for an address query the database can't index.
+    """
+    if name:
+        queryset = queryset.filter(name_filter(name))
+    if gender:
+        queryset = queryset.filter(gender=gender)
+    if age_min is not None:
+        queryset = queryset.filter(age__gte=age_min)
+    if age_max is not None:
+        queryset = queryset.filter(age__lte=age_max)
+    if address:
+        if not fulltext_available():
+            raise ValueError('Address search is not available.')
+        queryset = queryset.filter(address_filter(address))
+    return queryset
@@ -0,0 +1,51 @@
+"""Small in-process worker pool for work that should not block a request."""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                thread_name_prefix='core-worker',
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+        raise
+    finally:
+        # Worker threads keep their own connection; release it between tasks
+        close_old_connections()
+
+
+def submit(func, *args, **kwargs):
+    """Run ``func`` on the worker pool.
+
+    With ``BACKGROUND_TASKS_ASYNC = False`` (set by ``core.test_runner``) the
+    call runs inline instead and its result is returned.
+    """
+    if not getattr(settings, 'BACKGROUND_TASKS_ASYNC', True):
+        return func(*args, **kwargs)
+    return _get_executor().submit(_run, func, args, kwargs)
+
+
+def submit_on_commit(func, *args, **kwargs):
+    """Like ``submit``, but only once the current transaction commits."""
+    transaction.on_commit(lambda: submit(func, *args, **kwargs))
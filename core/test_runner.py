@@ -0,0 +1,44 @@
+import os
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class DetectingTestRunner(DiscoverRunner):
+    """Test runner with the N+1 query detector (``core.nplusone``) switched on.
+
+    Repeated query shapes are logged for every request the tests make;
+    ``--nplusone-raise`` (or ``NPLUSONE_RAISE=1``) turns them into errors
+    that fail the offending test.
+
+    Background tasks (``core.tasks``) run inline: a worker thread would query
+    the test database outside the test's transaction. Passwords are hashed
+    with MD5, which is much cheaper than the production hasher. Rate limit
+    buckets live in the cache, so the ``cache.clear()`` in each test's setUp
+    resets them.
+    """
+
+    def __init__(self, nplusone_raise=False, **kwargs):
+        super().__init__(**kwargs)
+        self.nplusone_raise = nplusone_raise or os.getenv('NPLUSONE_RAISE') == '1'
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--nplusone-raise', action='store_true',
+            help='Fail tests whose requests repeat a query shape too often.',
+        )
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(
+            NPLUSONE_DETECT=True, NPLUSONE_RAISE=self.nplusone_raise, BACKGROUND_TASKS_ASYNC=False,
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+            RATELIMIT_BACKEND='core.ratelimit.CacheTokenBuckets',
+        )
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
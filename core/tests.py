@@ -1,12 +1,56 @@
-from django.test import TestCase, Client
+import asyncio
+import importlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from PIL import Image
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.http import HttpResponse
+from django.template import engines
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
-from django.urls import reverse
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F, QuerySet, Sum
+from django.utils import timezone
+from django.urls import clear_url_caches, resolve, reverse
 
-from .models import UserProfile, Reaction
+from chat_app import settings as project_settings
+from chat_app import urls as root_urls
+from . import urls as core_urls
+from .models import (
+    Conversation, Message, UserProfile, Reaction, ReactionCounterShard, ReactionDailyRollup,
+)
+from . import cache as profile_cache
+from . import chat
+from . import deletion
+from . import instrumentation
+from . import leaderboard
+from . import rollups
+from .nplusone import NPlusOneError, NPlusOneMiddleware, fingerprint
+from .pubsub import publish_profile_counts
+from .ratelimit import LocalTokenBuckets, parse_rate
+from .reactions import apply_reaction
+from .search import name_filter
+from .realtime import websocket_application
 
 
 class ReactionViewTests(TestCase):
     def setUp(self):
+        cache.clear()
         # Users
         self.owner = User.objects.create_user(username='owner', password='pass12345')
         self.other = User.objects.create_user(username='other', password='pass12345')
@@ -99,3 +143,1448 @@ class ReactionViewTests(TestCase):
 from django.test import TestCase
 
 # Create your tests here.
+
+
+class ProfileListPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='viewer', password='pass12345')
+        self.profiles = [
+            UserProfile.objects.create(
+                firstname=f'First{i}', lastname='User', age=20 + i,
+                gender='F', address=f'{i} Long Address Road',
+                profile_picture=f'profile_pictures/{i}.jpg',
+            )
+            for i in range(5)
+        ]
+        self.client.login(username='viewer', password='pass12345')
+
+    def test_first_page_and_cursor(self):
+        res = self.client.get(reverse('profile_view'), {'page_size': 2})
+        self.assertEqual(res.status_code, 200)
+        page = res.context['profiles']
+        self.assertEqual([p.pk for p in page], [p.pk for p in self.profiles[:2]])
+        self.assertEqual(res.context['next_cursor'], self.profiles[1].pk)
+        # The address is shown on the cards, so the projection must load it
+        self.assertNotIn('address', page[0].get_deferred_fields())
+        self.assertContains(res, 'Address: 0 Long Address Road')
+
+    def test_last_page_has_no_cursor(self):
+        res = self.client.get(reverse('profile_view'), {
+            'page_size': 2, 'after': self.profiles[3].pk,
+        })
+        self.assertEqual([p.pk for p in res.context['profiles']], [self.profiles[4].pk])
+        self.assertIsNone(res.context['next_cursor'])
+
+    def test_page_size_is_clamped(self):
+        with self.settings(PROFILE_MAX_PAGE_SIZE=3):
+            res = self.client.get(reverse('profile_view'), {'page_size': 1000})
+        self.assertEqual(res.context['page_size'], 3)
+        self.assertEqual(len(res.context['profiles']), 3)
+
+
+class ReactionServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.profile = UserProfile.objects.create(
+            user=self.owner,
+            firstname='Owner', lastname='User', age=30,
+            gender='M', address='123 Owner St',
+            profile_picture='profile_pictures/owner.jpg',
+        )
+
+    def test_create_switch_toggle(self):
+        state = apply_reaction(self.other, self.profile.pk, Reaction.LIKE)
+        self.assertEqual(state, {
+            'likes_count': 1, 'loves_count': 0, 'dislikes_count': 0, 'my_reaction': Reaction.LIKE,
+        })
+        state = apply_reaction(self.other, self.profile.pk, Reaction.DISLIKE)
+        self.assertEqual((state['likes_count'], state['dislikes_count']), (0, 1))
+        self.assertEqual(state['my_reaction'], Reaction.DISLIKE)
+        state = apply_reaction(self.other, self.profile.pk, Reaction.DISLIKE)
+        self.assertIsNone(state['my_reaction'])
+        self.assertFalse(Reaction.objects.exists())
+        prof = UserProfile.objects.get(pk=self.profile.pk)
+        self.assertEqual((prof.likes_count, prof.loves_count, prof.dislikes_count), (0, 0, 0))
+
+    def test_profile_touched_by_one_read_and_one_update(self):
+        apply_reaction(self.other, self.profile.pk, Reaction.LIKE)
+        with CaptureQueriesContext(connection) as ctx:
+            apply_reaction(self.other, self.profile.pk, Reaction.LOVE)
+        profile_sql = [q['sql'] for q in ctx.captured_queries if 'core_userprofile' in q['sql']]
+        self.assertEqual(len(profile_sql), 2)
+        self.assertTrue(profile_sql[-1].startswith('UPDATE'))
+
+    def test_drifted_counter_is_clamped_at_zero(self):
+        Reaction.objects.create(user=self.other, profile=self.profile, reaction=Reaction.LOVE)
+        state = apply_reaction(self.other, self.profile.pk, Reaction.LOVE)
+        self.assertEqual(state['loves_count'], 0)
+        self.assertEqual(UserProfile.objects.get(pk=self.profile.pk).loves_count, 0)
+
+    def test_self_reaction_and_missing_profile(self):
+        with self.assertRaises(ValidationError):
+            apply_reaction(self.owner, self.profile.pk, Reaction.LIKE)
+        with self.assertRaises(UserProfile.DoesNotExist):
+            apply_reaction(self.other, self.profile.pk + 100, Reaction.LIKE)
+
+    def test_reaction_stored_as_small_integer(self):
+        apply_reaction(self.other, self.profile.pk, Reaction.LOVE)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reaction FROM core_reaction')
+            self.assertEqual(cursor.fetchone()[0], 2)
+        reaction = Reaction.objects.get()
+        self.assertEqual(reaction.reaction, Reaction.LOVE)
+        self.assertEqual(reaction.get_reaction_display(), 'Love')
+        self.assertEqual(Reaction.objects.filter(reaction__in=[Reaction.LIKE, Reaction.LOVE]).count(), 1)
+        self.assertEqual(list(Reaction.objects.values_list('reaction', flat=True)), [Reaction.LOVE])
+        self.client.login(username='other', password='pass12345')
+        response = self.client.get(reverse('reaction_states'), {'ids': self.profile.pk})
+        self.assertEqual(response.json()['profiles'][str(self.profile.pk)]['my_reaction'], 'love')
+
+
+class ShardedCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.profile = UserProfile.objects.create(
+            user=self.owner,
+            firstname='Hot', lastname='Profile', age=30,
+            gender='F', address='1 Hot St',
+            profile_picture='profile_pictures/hot.jpg',
+        )
+        self.reactors = [
+            User.objects.create_user(username=f'reactor{i}', password='pass12345')
+            for i in range(6)
+        ]
+
+    def test_reads_sum_shards_and_flush_folds_them(self):
+        for user in self.reactors:
+            state = apply_reaction(user, self.profile.pk, Reaction.LOVE, shards=4)
+        self.assertEqual(state['loves_count'], 6)
+        # Base row untouched until the flush
+        self.assertEqual(UserProfile.objects.get(pk=self.profile.pk).loves_count, 0)
+        apply_reaction(self.reactors[0], self.profile.pk, Reaction.LIKE, shards=4)
+
+        with self.settings(REACTION_COUNTER_SHARDS=4):
+            self.client.login(username='reactor1', password='pass12345')
+            res = self.client.get(reverse('view_profile', args=[self.profile.pk]))
+        self.assertEqual(res.context['profile'].loves_count, 5)
+        self.assertEqual(res.context['profile'].likes_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('flush_reaction_shards', verbosity=0)
+        self.assertFalse(ReactionCounterShard.objects.exists())
+        prof = UserProfile.objects.get(pk=self.profile.pk)
+        self.assertEqual((prof.likes_count, prof.loves_count), (1, 5))
+        # The cached snapshot with the pre-flush base counters is gone
+        cached = profile_cache.get_profile(self.profile.pk)
+        self.assertEqual((cached.likes_count, cached.loves_count), (1, 5))
+
+    def test_concurrent_first_reaction_by_same_user(self):
+        user = self.reactors[0]
+        apply_reaction(user, self.profile.pk, Reaction.LIKE, shards=4)
+        real_first = QuerySet.first
+        missed = []
+
+        def first(queryset):
+            # The reaction read misses the row another request just inserted
+            if queryset.model is Reaction and not missed:
+                missed.append(True)
+                return None
+            return real_first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', first):
+            state = apply_reaction(user, self.profile.pk, Reaction.LIKE, shards=4)
+        self.assertEqual(missed, [True])
+        # Handled as the toggle-off it is, not a 500
+        self.assertEqual((state['likes_count'], state['my_reaction']), (0, None))
+        self.assertFalse(Reaction.objects.exists())
+
+
+class ReconcileReactionCountsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='pass12345')
+            for i in range(3)
+        ]
+        self.profiles = [
+            UserProfile.objects.create(
+                user=user, firstname=f'First{i}', lastname='User', age=30,
+                address='-', profile_picture=f'profile_pictures/{i}.jpg',
+            )
+            for i, user in enumerate(self.users)
+        ]
+        # Profile 0: two likes recorded, but the counters were never bumped
+        Reaction.objects.create(user=self.users[1], profile=self.profiles[0], reaction=Reaction.LIKE)
+        Reaction.objects.create(user=self.users[2], profile=self.profiles[0], reaction=Reaction.LIKE)
+        # Profile 1: a stale love count with no reactions behind it
+        UserProfile.objects.filter(pk=self.profiles[1].pk).update(loves_count=4)
+        # Profile 2: consistent
+        apply_reaction(self.users[0], self.profiles[2].pk, Reaction.DISLIKE)
+
+    def counts(self, profile):
+        prof = UserProfile.objects.get(pk=profile.pk)
+        return prof.likes_count, prof.loves_count, prof.dislikes_count
+
+    def test_dry_run_reports_without_writing(self):
+        out = StringIO()
+        call_command('reconcile_reaction_counts', '--dry-run', '--batch-size=2', stdout=out)
+        self.assertIn(f'profile {self.profiles[0].pk}: likes_count 0 -> 2', out.getvalue())
+        self.assertIn(f'profile {self.profiles[1].pk}: loves_count 4 -> 0', out.getvalue())
+        self.assertIn('Checked 3 profile(s); 2 would be updated.', out.getvalue())
+        self.assertEqual(self.counts(self.profiles[0]), (0, 0, 0))
+
+    def test_fixes_only_drifted_rows(self):
+        profile_cache.get_profile(self.profiles[0].pk)
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_reaction_counts', '--batch-size=2', stdout=out)
+        self.assertIn('2 updated', out.getvalue())
+        self.assertEqual(self.counts(self.profiles[0]), (2, 0, 0))
+        self.assertEqual(profile_cache.get_profile(self.profiles[0].pk).likes_count, 2)
+        self.assertEqual(self.counts(self.profiles[1]), (0, 0, 0))
+        self.assertEqual(self.counts(self.profiles[2]), (0, 0, 1))
+
+
+class ProfileCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        profile_cache.reset_stats()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.profile = UserProfile.objects.create(
+            user=self.owner,
+            firstname='Owner', lastname='User', age=30,
+            gender='M', address='123 Owner St',
+            profile_picture='profile_pictures/owner.jpg',
+        )
+        self.client.login(username='other', password='pass12345')
+        self.url = reverse('view_profile', args=[self.profile.pk])
+
+    def test_repeat_view_served_from_cache(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        detail_sql = [
+            q['sql'] for q in ctx.captured_queries
+            if 'core_reaction' in q['sql'] or '"core_userprofile"."id" =' in q['sql']
+        ]
+        self.assertEqual(detail_sql, [])
+        stats = profile_cache.stats()
+        self.assertEqual(stats['profile_hits'], 1)
+        self.assertEqual(stats['profile_misses'], 1)
+        self.assertEqual(stats['reaction_hits'], 1)
+
+    def test_reaction_refreshes_counts_and_state(self):
+        self.client.get(self.url)
+        self.client.post(reverse('react_profile', args=[self.profile.pk]), {'reaction': Reaction.LOVE})
+        res = self.client.get(self.url)
+        self.assertEqual(res.context['profile'].loves_count, 1)
+        self.assertEqual(res.context['my_reaction'], Reaction.LOVE)
+
+    def test_edit_invalidates_snapshot(self):
+        self.client.get(self.url)
+        UserProfile.objects.filter(pk=self.profile.pk).update(firstname='Changed')
+        self.assertEqual(profile_cache.get_profile(self.profile.pk).firstname, 'Owner')
+        profile_cache.invalidate_profile(self.profile.pk)
+        self.assertEqual(profile_cache.get_profile(self.profile.pk).firstname, 'Changed')
+
+    def test_missing_profile_is_404(self):
+        res = self.client.get(reverse('view_profile', args=[self.profile.pk + 100]))
+        self.assertEqual(res.status_code, 404)
+
+
+class CurrentProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.profile = UserProfile.objects.create(
+            user=self.owner,
+            firstname='Owner', lastname='User', age=30,
+            gender='M', address='123 Owner St',
+            profile_picture='profile_pictures/owner.jpg',
+        )
+
+    def test_profile_id_is_cached(self):
+        self.client.login(username='owner', password='pass12345')
+        self.client.get(reverse('my_profile'))
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(reverse('my_profile'))
+        self.assertRedirects(res, reverse('view_profile', args=[self.profile.pk]), fetch_redirect_response=False)
+        self.assertFalse([q for q in ctx.captured_queries if 'core_userprofile' in q['sql']])
+
+    def test_ownership_check_does_not_load_user(self):
+        self.client.login(username='owner', password='pass12345')
+        self.client.get(reverse('view_profile', args=[self.profile.pk]))
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(reverse('view_profile', args=[self.profile.pk]))
+        self.assertContains(res, 'Edit')
+        user_sql = [q for q in ctx.captured_queries if 'FROM "auth_user"' in q['sql']]
+        # Only the session user lookup done by AuthenticationMiddleware
+        self.assertEqual(len(user_sql), 1)
+
+    def test_create_and_delete_update_the_current_profile(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.login(username='other', password='pass12345')
+        res = self.client.get(reverse('my_profile'))
+        self.assertRedirects(res, reverse('create_profile'), fetch_redirect_response=False)
+
+        created = UserProfile.objects.create(
+            user=other, firstname='Other', lastname='User', age=25,
+            address='-', profile_picture='profile_pictures/other.jpg',
+        )
+        # As create_profile does
+        profile_cache.invalidate_user_profile(other.pk)
+        res = self.client.get(reverse('my_profile'))
+        self.assertRedirects(res, reverse('view_profile', args=[created.pk]), fetch_redirect_response=False)
+        res = self.client.post(reverse('delete_profile', args=[created.pk]))
+        self.assertRedirects(res, reverse('profile_view'), fetch_redirect_response=False)
+        res = self.client.get(reverse('my_profile'))
+        self.assertRedirects(res, reverse('create_profile'), fetch_redirect_response=False)
+
+    def test_other_sessions_see_profile_changes(self):
+        User.objects.create_user(username='other', password='pass12345')
+        first, second = Client(), Client()
+        for client in (first, second):
+            client.login(username='other', password='pass12345')
+            res = client.get(reverse('my_profile'))
+            self.assertRedirects(res, reverse('create_profile'), fetch_redirect_response=False)
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        with self.settings(MEDIA_ROOT=media, BACKGROUND_TASKS_ASYNC=False):
+            first.post(reverse('create_profile'), {
+                'firstname': 'Other', 'lastname': 'User', 'age': 25, 'address': '-',
+                'profile_picture': make_image(),
+            })
+            created = UserProfile.objects.get(user__username='other')
+            # Even a stale cache entry cannot produce a second profile
+            cache.set(profile_cache.user_profile_key(created.user_id), None)
+            res = second.post(reverse('create_profile'), {
+                'firstname': 'Again', 'lastname': 'User', 'age': 25, 'address': '-',
+                'profile_picture': make_image(),
+            })
+        self.assertRedirects(res, reverse('my_profile'), fetch_redirect_response=False)
+        self.assertEqual(UserProfile.objects.filter(user__username='other').count(), 1)
+        # The second session neither offers nor accepts a second profile
+        res = second.get(reverse('create_profile'))
+        self.assertRedirects(res, reverse('view_profile', args=[created.pk]), fetch_redirect_response=False)
+
+        first.post(reverse('delete_profile', args=[created.pk]))
+        res = second.get(reverse('create_profile'))
+        self.assertEqual(res.status_code, 200)
+
+
+def make_image(size=(64, 48), fmt='JPEG', name='pic.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{fmt.lower()}')
+
+
+class ProfileImagePipelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        overrides = self.settings(
+            MEDIA_ROOT=media, BACKGROUND_TASKS_ASYNC=False,
+            PROFILE_IMAGE_MAX_DIMENSION=100, PROFILE_THUMBNAIL_SIZE=32,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.client.login(username='owner', password='pass12345')
+
+    def create(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('create_profile'), {
+                'firstname': 'Pic', 'lastname': 'Owner', 'age': 30, 'gender': 'F',
+                'address': '1 Pixel Way', 'profile_picture': image,
+            })
+
+    def test_upload_is_downscaled_and_thumbnailed(self):
+        res = self.create(make_image(size=(400, 200)))
+        self.assertEqual(res.status_code, 302)
+        profile = UserProfile.objects.get(user=self.user)
+        with Image.open(profile.profile_picture.path) as original:
+            self.assertEqual(original.size, (100, 50))
+        self.assertTrue(profile.profile_thumbnail)
+        with Image.open(profile.profile_thumbnail.path) as thumb:
+            self.assertEqual(thumb.size, (32, 32))
+
+    def test_non_image_rejected(self):
+        res = self.create(SimpleUploadedFile('notes.jpg', b'not an image', content_type='image/jpeg'))
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.context['form'].errors['profile_picture'])
+        self.assertFalse(UserProfile.objects.exists())
+
+    def test_backfill_command(self):
+        self.create(make_image())
+        profile = UserProfile.objects.get(user=self.user)
+        UserProfile.objects.filter(pk=profile.pk).update(profile_thumbnail='')
+        out = StringIO()
+        call_command('backfill_thumbnails', '--workers=1', stdout=out)
+        self.assertIn('Generated 1 thumbnail(s)', out.getvalue())
+        self.assertTrue(UserProfile.objects.get(pk=profile.pk).profile_thumbnail)
+
+
+def png_header(width, height):
+    """A PNG that declares ``width`` x ``height`` pixels but carries no pixel data."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', b'') + chunk(b'IEND', b'')
+
+
+class BoundedUploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media, BACKGROUND_TASKS_ASYNC=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.client.login(username='owner', password='pass12345')
+
+    def create(self, image):
+        return self.client.post(reverse('create_profile'), {
+            'firstname': 'Pic', 'lastname': 'Owner', 'age': 30, 'gender': 'F',
+            'address': '1 Pixel Way', 'profile_picture': image,
+        })
+
+    def picture_errors(self, res):
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(UserProfile.objects.exists())
+        return res.context['form'].errors['profile_picture']
+
+    def test_byte_limit_enforced_while_streaming(self):
+        with self.settings(PROFILE_IMAGE_MAX_UPLOAD_SIZE=100):
+            res = self.create(make_image(size=(300, 300)))
+        self.assertEqual(self.picture_errors(res), ['Image files must be smaller than 100\xa0bytes.'])
+
+    def test_decompression_bomb_rejected_from_header(self):
+        bomb = SimpleUploadedFile('bomb.png', png_header(50000, 50000), content_type='image/png')
+        res = self.create(bomb)
+        self.assertEqual(self.picture_errors(res), ['Image dimensions are too large.'])
+        self.assertIn('profile_picture', res.wsgi_request.upload_errors)
+
+    def test_non_image_bytes_rejected_early(self):
+        fake = SimpleUploadedFile('fake.jpg', b'<?php echo "hi"; ?>' * 10, content_type='image/jpeg')
+        res = self.create(fake)
+        self.assertEqual(self.picture_errors(res), ['Upload a valid JPEG, PNG, GIF or WebP image.'])
+
+    def test_valid_upload_accepted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.create(make_image())
+        self.assertEqual(res.status_code, 302)
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
+
+    def test_new_profile_not_hidden_by_cached_miss(self):
+        next_id = (UserProfile.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        self.assertEqual(self.client.get(reverse('view_profile', args=[next_id])).status_code, 404)
+        # The thumbnail task would invalidate the entry too; leave it out
+        with self.captureOnCommitCallbacks(execute=True), mock.patch('core.views.schedule_thumbnail'):
+            res = self.create(make_image())
+        self.assertRedirects(res, reverse('view_profile', args=[next_id]), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('view_profile', args=[next_id])).status_code, 200)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.profile = UserProfile.objects.create(
+            user=self.owner,
+            firstname='Owner', lastname='User', age=30,
+            gender='M', address='123 Owner St',
+            profile_picture='profile_pictures/owner.jpg',
+        )
+        self.client.login(username='other', password='pass12345')
+        self.detail = reverse('view_profile', args=[self.profile.pk])
+        self.react = reverse('react_profile', args=[self.profile.pk])
+        self.ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest', 'HTTP_ACCEPT': 'application/json'}
+
+    def test_detail_304_until_reaction(self):
+        res = self.client.get(self.detail)
+        etag = res.headers['ETag']
+        self.assertIn('Last-Modified', res.headers)
+        res = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertFalse(res.content)
+
+        self.client.post(self.react, {'reaction': Reaction.LIKE}, **self.ajax)
+        res = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+    def test_list_304(self):
+        res = self.client.get(reverse('profile_view'))
+        self.assertNotIn('Last-Modified', res.headers)
+        etag = res.headers['ETag']
+        res = self.client.get(reverse('profile_view'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        # A deletion changes the page without touching any remaining row
+        deletion.hide_profile(self.profile.pk)
+        res = self.client.get(reverse('profile_view'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(REACTION_COUNTER_SHARDS=4)
+    def test_sharded_counts_change_the_detail_etag(self):
+        res = self.client.get(self.detail)
+        self.assertNotIn('Last-Modified', res.headers)
+        etag = res.headers['ETag']
+        apply_reaction(User.objects.create_user(username='third'), self.profile.pk, Reaction.LOVE)
+        # Only a shard row changed; updated_at did not move
+        self.assertTrue(ReactionCounterShard.objects.exists())
+        res = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.context['profile'].loves_count, 1)
+
+    def test_pending_messages_disable_validators(self):
+        self.client.get(self.detail)
+        # Reacting via the form redirects with an error message to show
+        self.client.post(self.react, {'reaction': 'bogus'})
+        res = self.client.get(self.detail)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('ETag', res.headers)
+
+    def test_reaction_json_polling(self):
+        res = self.client.post(self.react, {'reaction': Reaction.LOVE}, **self.ajax)
+        etag = res.headers['ETag']
+        res = self.client.get(self.react, HTTP_IF_NONE_MATCH=etag, **self.ajax)
+        self.assertEqual(res.status_code, 304)
+        apply_reaction(User.objects.create_user(username='third'), self.profile.pk, Reaction.LOVE)
+        profile_cache.invalidate_profile(self.profile.pk)
+        res = self.client.get(self.react, HTTP_IF_NONE_MATCH=etag, **self.ajax)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['loves_count'], 2)
+        self.assertEqual(res.json()['my_reaction'], Reaction.LOVE)
+
+
+class ReactionStatesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(username='viewer', password='pass12345')
+        self.profiles = []
+        for i in range(4):
+            owner = User.objects.create_user(username=f'owner{i}', password='pass12345')
+            self.profiles.append(UserProfile.objects.create(
+                user=owner, firstname=f'First{i}', lastname='User', age=30,
+                address='-', profile_picture=f'profile_pictures/{i}.jpg',
+            ))
+        apply_reaction(self.viewer, self.profiles[0].pk, Reaction.LIKE)
+        apply_reaction(self.viewer, self.profiles[2].pk, Reaction.DISLIKE)
+        self.client.login(username='viewer', password='pass12345')
+        self.url = reverse('reaction_states')
+
+    def test_batch_in_two_queries(self):
+        ids = ','.join(str(p.pk) for p in self.profiles)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.url, {'ids': ids + ',999999'})
+        self.assertEqual(res.status_code, 200)
+        core_sql = [q for q in ctx.captured_queries if '"core_' in q['sql']]
+        self.assertEqual(len(core_sql), 2)
+        data = res.json()['profiles']
+        self.assertEqual(set(data), {str(p.pk) for p in self.profiles})
+        self.assertEqual(data[str(self.profiles[0].pk)]['my_reaction'], Reaction.LIKE)
+        self.assertEqual(data[str(self.profiles[0].pk)]['likes_count'], 1)
+        self.assertEqual(data[str(self.profiles[2].pk)]['dislikes_count'], 1)
+        self.assertIsNone(data[str(self.profiles[1].pk)]['my_reaction'])
+
+    def test_pending_delete_profiles_omitted(self):
+        deletion.hide_profile(self.profiles[0].pk)
+        ids = ','.join(str(p.pk) for p in self.profiles)
+        for shards in (0, 4):
+            with self.subTest(shards=shards), self.settings(REACTION_COUNTER_SHARDS=shards):
+                data = self.client.get(self.url, {'ids': ids}).json()['profiles']
+                self.assertEqual(set(data), {str(p.pk) for p in self.profiles[1:]})
+
+    def test_invalid_and_oversized_batches(self):
+        self.assertEqual(self.client.get(self.url, {'ids': '1,x'}).status_code, 400)
+        with self.settings(REACTION_STATE_MAX_IDS=2):
+            self.assertEqual(self.client.get(self.url, {'ids': '1,2,3'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).json(), {'profiles': {}})
+
+
+class FakeSocket:
+    """Drives an ASGI websocket application from a test."""
+
+    def __init__(self, app, path, cookie='', origin='http://testserver'):
+        self.incoming = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        headers = [(b'cookie', cookie.encode()), (b'origin', origin.encode())]
+        scope = {'type': 'websocket', 'path': path, 'headers': headers}
+        self.task = asyncio.create_task(app(scope, self.incoming.get, self.sent.put))
+
+    async def connect(self):
+        await self.incoming.put({'type': 'websocket.connect'})
+        return await asyncio.wait_for(self.sent.get(), 5)
+
+    async def receive_json(self):
+        message = await asyncio.wait_for(self.sent.get(), 5)
+        return json.loads(message['text'])
+
+    async def close(self):
+        await self.incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, 5)
+
+
+class RealtimeCountsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.profile = UserProfile.objects.create(
+            user=self.owner,
+            firstname='Owner', lastname='User', age=30,
+            gender='M', address='123 Owner St',
+            profile_picture='profile_pictures/owner.jpg',
+        )
+        self.client.login(username='other', password='pass12345')
+        self.cookie = f'sessionid={self.client.cookies["sessionid"].value}'
+        self.path = f'/ws/profiles/{self.profile.pk}/'
+
+    async def test_anonymous_socket_rejected(self):
+        socket = FakeSocket(websocket_application, self.path)
+        self.assertEqual(await socket.connect(), {'type': 'websocket.close', 'code': 4401})
+
+    async def test_counts_pushed_and_coalesced(self):
+        socket = FakeSocket(websocket_application, self.path, self.cookie)
+        self.assertEqual((await socket.connect())['type'], 'websocket.accept')
+        for likes in range(1, 6):
+            publish_profile_counts(self.profile.pk, {
+                'likes_count': likes, 'loves_count': 0, 'dislikes_count': 0,
+            })
+        message = await socket.receive_json()
+        # A burst published before the socket could send collapses to the newest state
+        self.assertEqual(message['likes_count'], 5)
+        self.assertTrue(socket.sent.empty())
+        await socket.close()
+
+    def test_react_profile_publishes_after_commit(self):
+        url = reverse('react_profile', args=[self.profile.pk])
+        with mock.patch('core.views.publish_profile_counts') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, {'reaction': Reaction.LOVE})
+        publish.assert_called_once_with(self.profile.pk, {
+            'likes_count': 0, 'loves_count': 1, 'dislikes_count': 0,
+        })
+
+
+class AsyncViewTests(TestCase):
+    """The ASGI routing serves the async views with the same behaviour."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.profile = UserProfile.objects.create(
+            user=self.owner,
+            firstname='Owner', lastname='User', age=30,
+            gender='M', address='123 Owner St',
+            profile_picture='profile_pictures/owner.jpg',
+        )
+        self.use_async_views(True)
+        self.addCleanup(self.use_async_views, False)
+        self.ajax = {'x-requested-with': 'XMLHttpRequest', 'accept': 'application/json'}
+
+    def use_async_views(self, enabled):
+        with self.settings(ASYNC_VIEWS=enabled):
+            importlib.reload(core_urls)
+            importlib.reload(root_urls)
+        clear_url_caches()
+
+    def test_routes_resolve_to_coroutines(self):
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse('view_profile', args=[1])).func))
+
+    async def test_list_and_detail(self):
+        await self.async_client.aforce_login(self.other)
+        res = await self.async_client.get(reverse('profile_view'))
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'Owner')
+        res = await self.async_client.get(reverse('profile_view'), headers={'if-none-match': res.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+
+        res = await self.async_client.get(reverse('view_profile', args=[self.profile.pk]))
+        self.assertContains(res, '123 Owner St')
+        res = await self.async_client.get(reverse('view_profile', args=[999999]))
+        self.assertEqual(res.status_code, 404)
+
+    async def test_my_profile_redirects(self):
+        await self.async_client.aforce_login(self.owner)
+        res = await self.async_client.get(reverse('my_profile'))
+        self.assertRedirects(res, reverse('view_profile', args=[self.profile.pk]), fetch_redirect_response=False)
+        await self.async_client.aforce_login(self.other)
+        res = await self.async_client.get(reverse('my_profile'))
+        self.assertRedirects(res, reverse('create_profile'), fetch_redirect_response=False)
+
+    async def test_reaction_json(self):
+        await self.async_client.aforce_login(self.other)
+        url = reverse('react_profile', args=[self.profile.pk])
+        res = await self.async_client.post(url, {'reaction': Reaction.LIKE}, headers=self.ajax)
+        self.assertEqual(res.json()['likes_count'], 1)
+        res = await self.async_client.get(url, headers={**self.ajax, 'if-none-match': res.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+        res = await self.async_client.post(url, {'reaction': 'bogus'}, headers=self.ajax)
+        self.assertEqual(res.status_code, 400)
+
+    @override_settings(RATELIMITS={'react-profile': '1/m'})
+    async def test_reaction_rate_limited(self):
+        await self.async_client.aforce_login(self.other)
+        url = reverse('react_profile', args=[self.profile.pk])
+        res = await self.async_client.post(url, {'reaction': Reaction.LIKE}, headers=self.ajax)
+        self.assertEqual(res.status_code, 200)
+        res = await self.async_client.post(url, {'reaction': Reaction.LIKE}, headers=self.ajax)
+        self.assertEqual(res.status_code, 429)
+        self.assertEqual(res.headers['Retry-After'], '60')
+        self.assertEqual(await Reaction.objects.acount(), 1)
+
+    async def test_anonymous_redirected_to_login(self):
+        res = await self.async_client.get(reverse('profile_view'))
+        self.assertEqual(res.status_code, 302)
+
+
+class ProfileSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        rows = [
+            ('Anna', 'Smith', 'F', 25, '12 Baker Street, London'),
+            ('annabel', 'Jones', 'F', 41, '3 Rue de Rivoli, Paris'),
+            ('Andrew', 'SMALL', 'M', 33, '99 Baker Road, Leeds'),
+            ('Bob', 'Anders', 'M', 19, '1 Main Street, Boston'),
+        ]
+        self.profiles = {}
+        for i, (first, last, gender, age, address) in enumerate(rows):
+            owner = User.objects.create_user(username=f'owner{i}', password='pass12345')
+            self.profiles[first] = UserProfile.objects.create(
+                user=owner, firstname=first, lastname=last, gender=gender, age=age,
+                address=address, profile_picture=f'profile_pictures/{i}.jpg',
+            )
+        self.client.login(username='owner0', password='pass12345')
+        self.url = reverse('search_profiles')
+
+    def names(self, **params):
+        res = self.client.get(self.url, params)
+        self.assertEqual(res.status_code, 200, res.content)
+        return sorted(r['firstname'] for r in res.json()['results'])
+
+    def test_name_prefix_is_case_insensitive(self):
+        self.assertEqual(self.names(q='ANN'), ['Anna', 'annabel'])
+        # One word matches first or last names
+        self.assertEqual(self.names(q='and'), ['Andrew', 'Bob'])
+        self.assertEqual(self.names(q='an sm'), ['Andrew', 'Anna'])
+        self.assertEqual(self.names(q='nna'), [])
+
+    def test_gender_and_age_filters(self):
+        self.assertEqual(self.names(gender='F', age_min=30), ['annabel'])
+        self.assertEqual(self.names(age_max=25), ['Anna', 'Bob'])
+        self.assertEqual(self.client.get(self.url, {'gender': 'X'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'age_min': 'old'}).status_code, 400)
+
+    def test_address_full_text(self):
+        self.assertEqual(self.names(address='baker'), ['Andrew', 'Anna'])
+        self.assertEqual(self.names(address='bak lond'), ['Anna'])
+        # The index follows edits and deletes
+        anna = self.profiles['Anna']
+        anna.address = '5 Canal Street, Manchester'
+        anna.save()
+        self.assertEqual(self.names(address='baker'), ['Andrew'])
+        self.profiles['Andrew'].delete()
+        self.assertEqual(self.names(address='baker'), [])
+        self.assertEqual(self.names(address='manchester'), ['Anna'])
+
+    def test_counter_updates_leave_full_text_alone(self):
+        apply_reaction(User.objects.get(username='owner1'), self.profiles['Anna'].pk, Reaction.LIKE)
+        self.assertEqual(self.names(address='london'), ['Anna'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Checks the SQLite query plan')
+    def test_name_prefix_uses_expression_index(self):
+        with connection.cursor() as cursor:
+            query = UserProfile.objects.filter(name_filter('ann')).order_by('id').query
+            sql, params = query.sql_with_params()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('core_profile_firstname_lower', plan)
+        self.assertIn('core_profile_lastname_lower', plan)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.profiles = []
+        for i, likes in enumerate([5, 3, 8, 1, 0]):
+            owner = User.objects.create_user(username=f'owner{i}', password='pass12345')
+            self.profiles.append(UserProfile.objects.create(
+                user=owner, firstname=f'First{i}', lastname='User', age=30,
+                address='-', profile_picture=f'profile_pictures/{i}.jpg', likes_count=likes,
+            ))
+        self.viewer = User.objects.create_user(username='viewer', password='pass12345')
+        self.client.login(username='viewer', password='pass12345')
+
+    def ids(self, *indexes):
+        return [self.profiles[i].pk for i in indexes]
+
+    def test_refresh_keeps_top_k(self):
+        with self.settings(LEADERBOARD_SIZE=3):
+            entry = leaderboard.refresh('liked')
+        self.assertEqual([pk for count, pk in entry['rows']], self.ids(2, 0, 1))
+        self.assertEqual(entry['floor'], 3)
+
+    def test_incremental_updates(self):
+        with self.settings(LEADERBOARD_SIZE=3):
+            leaderboard.refresh('liked')
+            # Below the floor: ignored
+            leaderboard.record_counts(self.profiles[3].pk, {'likes_count': 2})
+            self.assertEqual(leaderboard.ranked_ids('liked'), self.ids(2, 0, 1))
+            # Above the floor: enters and pushes out the last entry
+            leaderboard.record_counts(self.profiles[4].pk, {'likes_count': 6})
+            self.assertEqual(leaderboard.ranked_ids('liked'), self.ids(2, 4, 0))
+            self.assertEqual(cache.get(leaderboard.board_key('liked'))['floor'], 3)
+            # A listed profile falling below the floor leaves the list
+            leaderboard.record_counts(self.profiles[2].pk, {'likes_count': 2})
+            self.assertEqual(leaderboard.ranked_ids('liked'), self.ids(4, 0))
+
+    def test_updates_do_not_postpone_rebuild(self):
+        with self.settings(LEADERBOARD_SIZE=3, LEADERBOARD_REFRESH_SECONDS=60):
+            with mock.patch('core.leaderboard.time.time', return_value=1000):
+                leaderboard.refresh('liked')
+            # Drift the table behind the board's back
+            UserProfile.objects.filter(pk=self.profiles[3].pk).update(likes_count=9)
+            with mock.patch('core.leaderboard.time.time', return_value=1059):
+                leaderboard.record_counts(self.profiles[4].pk, {'likes_count': 6})
+                self.assertEqual(leaderboard.ranked_ids('liked'), self.ids(2, 4, 0))
+            with mock.patch('core.leaderboard.time.time', return_value=1060):
+                self.assertEqual(leaderboard.ranked_ids('liked'), self.ids(3, 2, 0))
+
+    def test_reaction_updates_board_without_table_query(self):
+        leaderboard.refresh('loved')
+        url = reverse('react_profile', args=[self.profiles[3].pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'reaction': Reaction.LOVE})
+        self.assertEqual(leaderboard.ranked_ids('loved')[0], self.profiles[3].pk)
+
+    def test_views(self):
+        res = self.client.get(reverse('leaderboard_data', args=['liked']), {'page_size': 2, 'page': 2})
+        data = res.json()
+        self.assertEqual([r['id'] for r in data['results']], self.ids(1, 3))
+        self.assertEqual(data['results'][0]['rank'], 3)
+        self.assertEqual(data['num_pages'], 3)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(reverse('leaderboard', args=['liked']))
+        self.assertContains(res, 'First2')
+        # The cached board is reused: only the page's rows are fetched
+        ranking = [q for q in ctx.captured_queries if 'ORDER BY' in q['sql'] and 'likes_count' in q['sql']]
+        self.assertEqual(ranking, [])
+        self.assertEqual(self.client.get(reverse('leaderboard', args=['hated'])).status_code, 404)
+
+
+class ReactionRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.profile = UserProfile.objects.create(
+            user=self.owner, firstname='Owner', lastname='User', age=30,
+            address='-', profile_picture='profile_pictures/owner.jpg',
+        )
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='pass12345') for i in range(3)]
+        self.client.login(username='fan0', password='pass12345')
+        self.url = reverse('reaction_series', args=[self.profile.pk])
+
+    def rollup(self, reaction):
+        row = ReactionDailyRollup.objects.filter(profile=self.profile, reaction=reaction).first()
+        return (row.added, row.removed) if row else (0, 0)
+
+    def test_apply_reaction_records_rollups(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_reaction(self.fans[0], self.profile.pk, Reaction.LIKE)
+            apply_reaction(self.fans[1], self.profile.pk, Reaction.LIKE)
+            apply_reaction(self.fans[1], self.profile.pk, Reaction.LOVE)   # switch
+            apply_reaction(self.fans[0], self.profile.pk, Reaction.LIKE)   # toggle off
+            # Nothing is written inside the reactions' transactions
+            self.assertFalse(ReactionDailyRollup.objects.exists())
+        self.assertEqual(self.rollup(Reaction.LIKE), (2, 2))
+        self.assertEqual(self.rollup(Reaction.LOVE), (1, 0))
+        self.assertEqual(self.rollup(Reaction.DISLIKE), (0, 0))
+
+    @override_settings(BACKGROUND_TASKS_ASYNC=True)
+    def test_changes_are_buffered_until_the_timer_flushes(self):
+        with mock.patch('core.rollups.threading.Timer') as timer:
+            with self.captureOnCommitCallbacks(execute=True):
+                for fan in self.fans:
+                    apply_reaction(fan, self.profile.pk, Reaction.LIKE)
+        # One timer for the whole batch, which runs flush on the worker pool
+        timer.assert_called_once()
+        self.assertEqual(timer.call_args.kwargs['args'], (rollups.flush,))
+        self.assertFalse(ReactionDailyRollup.objects.exists())
+        self.assertEqual(rollups.flush(), 1)
+        self.assertEqual(self.rollup(Reaction.LIKE), (3, 0))
+
+    def test_series_reads_rollups_only(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_reaction(self.fans[1], self.profile.pk, Reaction.LOVE)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(self.url, {'days': 7})
+        self.assertFalse([q for q in ctx.captured_queries if '"core_reaction"' in q['sql']])
+        series = res.json()['series']
+        self.assertEqual(len(series), 7)
+        self.assertEqual(series[-1]['love'], {'added': 1, 'removed': 0, 'net': 1})
+        self.assertEqual(series[0]['love']['added'], 0)
+
+    def test_series_validation(self):
+        self.assertEqual(self.client.get(self.url, {'start': '2024-02-30'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2024-03-02', 'end': '2024-03-01'}).status_code, 400)
+        with self.settings(REACTION_SERIES_MAX_DAYS=10):
+            self.assertEqual(self.client.get(self.url, {'days': 11}).status_code, 400)
+        for days in ('99999999999', '-99999999999', '0'):
+            self.assertEqual(self.client.get(self.url, {'days': days}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '0001-01-01', 'end': '0001-01-02'}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('reaction_series', args=[999999])).status_code, 404)
+
+    def test_backfill_before_inline_recording(self):
+        apply_reaction(self.fans[0], self.profile.pk, Reaction.LIKE)
+        apply_reaction(self.fans[1], self.profile.pk, Reaction.LIKE)
+        # Pretend both reactions predate the rollups
+        ReactionDailyRollup.objects.all().delete()
+        old = timezone.now() - timedelta(days=3)
+        Reaction.objects.update(created_at=old)
+        out = StringIO()
+        call_command('backfill_reaction_rollups', stdout=out)
+        call_command('backfill_reaction_rollups', stdout=out)
+        row = ReactionDailyRollup.objects.get()
+        self.assertEqual((row.day, row.reaction, row.added), (timezone.localdate(old), Reaction.LIKE, 2))
+
+
+class SeedLoadTests(TestCase):
+    def test_seed_is_consistent_and_reproducible(self):
+        out = StringIO()
+        call_command('seed_load', users=40, reactions=300, batch_size=50, stdout=out)
+        self.assertEqual(UserProfile.objects.count(), 40)
+        self.assertEqual(Reaction.objects.count(), 300)
+        self.assertFalse(Reaction.objects.filter(user_id=F('profile__user_id')).exists())
+        check = StringIO()
+        call_command('reconcile_reaction_counts', dry_run=True, stdout=check)
+        self.assertIn('0 would be updated', check.getvalue())
+        self.assertEqual(ReactionDailyRollup.objects.aggregate(total=Sum('added'))['total'], 300)
+        # Power law: the most popular profile gets far more than the average
+        top = UserProfile.objects.order_by('-likes_count').values_list('likes_count', flat=True)[0]
+        self.assertGreater(top, 300 * 0.6 / 40 * 3)
+
+        first = sorted(Reaction.objects.values_list('user__username', 'profile__user__username', 'reaction'))
+        with self.assertRaises(CommandError):
+            call_command('seed_load', users=40, reactions=300, stdout=out)
+        call_command('seed_load', users=40, reactions=300, clear=True, stdout=out)
+        second = sorted(Reaction.objects.values_list('user__username', 'profile__user__username', 'reaction'))
+        self.assertEqual(first, second)
+
+    def test_seed_option_varies_profile_attributes(self):
+        def attributes(seed):
+            call_command('seed_load', users=20, reactions=20, seed=seed, clear=True, stdout=StringIO())
+            return list(UserProfile.objects.order_by('user__username').values_list('lastname', 'age', 'address'))
+
+        self.assertEqual(attributes(1), attributes(1))
+        self.assertNotEqual(attributes(1), attributes(2))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BenchViewsTests(TestCase):
+    def test_report_and_budgets(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir, ignore_errors=True)
+        path = os.path.join(workdir, 'bench.json')
+        call_command('bench_views', users=30, reactions=200, iterations=2, json=path, stdout=StringIO())
+        with open(path) as fh:
+            report = json.load(fh)
+        self.assertEqual(report['failures'], [])
+        for name in ('profile_view', 'view_profile', 'react_switch_ajax', 'react_toggle_form', 'signup'):
+            scenario = report['scenarios'][name]
+            self.assertLessEqual(scenario['queries'], scenario['query_budget'])
+            self.assertGreater(scenario['p99_ms'], 0)
+        # The reaction cycles leave the seeded counters consistent
+        out = StringIO()
+        call_command('reconcile_reaction_counts', dry_run=True, stdout=out)
+        self.assertIn('0 would be updated', out.getvalue())
+
+        with self.assertRaisesMessage(CommandError, 'view_profile: 2 queries > budget 1'):
+            call_command('bench_views', reuse=True, iterations=1, budget=['view_profile=1'], stdout=StringIO())
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentation.registry.reset()
+        self.owner = User.objects.create_user(username='owner', password='pass12345', is_staff=True)
+        self.profile = UserProfile.objects.create(
+            user=self.owner, firstname='Owner', lastname='User', age=30,
+            address='-', profile_picture='profile_pictures/owner.jpg',
+        )
+        self.client.login(username='owner', password='pass12345')
+
+    def test_server_timing_and_histograms(self):
+        detail = reverse('view_profile', args=[self.profile.pk])
+        res = self.client.get(detail)
+        timing = res.headers['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(timing, r'tpl;dur=[\d.]+')
+        self.assertIn('total;dur=', timing)
+        self.client.get(detail)
+
+        views = self.client.get(reverse('request_metrics')).json()['views']
+        stats = views['view_profile']
+        self.assertEqual(stats['duration_ms']['count'], 2)
+        self.assertGreater(stats['queries']['sum'], 0)
+        self.assertGreater(stats['template_ms']['sum'], 0)
+        # Second request found the profile and reaction in the cache
+        self.assertGreaterEqual(stats['cache_hits'], 2)
+
+    def test_async_views_stay_async(self):
+        async def view(request):
+            return HttpResponse()
+
+        self.assertTrue(asyncio.iscoroutinefunction(instrumentation.RequestMetricsMiddleware(view)))
+        with self.settings(ASYNC_VIEWS=True):
+            importlib.reload(core_urls)
+            importlib.reload(root_urls)
+        self.addCleanup(lambda: (importlib.reload(core_urls), importlib.reload(root_urls), clear_url_caches()))
+        clear_url_caches()
+        self.async_client.force_login(self.owner)
+        res = async_to_sync(self.async_client.get)(reverse('view_profile', args=[self.profile.pk]))
+        self.assertEqual(res.status_code, 200)
+        self.assertRegex(res.headers['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertEqual(instrumentation.registry.snapshot()['view_profile']['duration_ms']['count'], 1)
+
+    def test_metrics_hidden_from_non_staff(self):
+        User.objects.create_user(username='other', password='pass12345')
+        self.client.login(username='other', password='pass12345')
+        self.assertEqual(self.client.get(reverse('request_metrics')).status_code, 404)
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled_removes_middleware(self):
+        res = self.client.get(reverse('profile_view'))
+        self.assertNotIn('Server-Timing', res.headers)
+        self.assertEqual(self.client.get(reverse('request_metrics')).status_code, 404)
+
+
+@override_settings(NPLUSONE_DETECT=True, NPLUSONE_RAISE=True, NPLUSONE_THRESHOLD=3)
+class NPlusOneDetectorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(4):
+            owner = User.objects.create_user(username=f'owner{i}', password='pass12345')
+            UserProfile.objects.create(
+                user=owner, firstname=f'First{i}', lastname='User', age=30,
+                address='-', profile_picture=f'profile_pictures/{i}.jpg',
+            )
+
+    def lazy_owner_page(self, request):
+        template = engines['django'].from_string('{% for p in profiles %}\n{{ p.user.username }}{% endfor %}')
+        return HttpResponse(template.render({'profiles': UserProfile.objects.all()}))
+
+    def test_repeated_shape_reported_with_template_and_source_line(self):
+        middleware = NPlusOneMiddleware(self.lazy_owner_page)
+        with self.assertRaises(NPlusOneError) as ctx:
+            middleware(RequestFactory().get('/'))
+        message = str(ctx.exception)
+        self.assertIn('4x SELECT', message)
+        self.assertIn('"auth_user"', message)
+        self.assertIn(':2', message)
+        self.assertIn('core/tests.py', message)
+
+    def test_logs_instead_of_raising(self):
+        middleware = NPlusOneMiddleware(self.lazy_owner_page)
+        with self.settings(NPLUSONE_RAISE=False), self.assertLogs('core.nplusone', 'WARNING'):
+            middleware(RequestFactory().get('/'))
+
+    def test_async_views_stay_async(self):
+        async def view(request):
+            # The async ORM's queries run in the request's sync thread too
+            return await sync_to_async(self.lazy_owner_page)(request)
+
+        middleware = NPlusOneMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        with self.assertRaises(NPlusOneError):
+            async_to_sync(middleware)(RequestFactory().get('/'))
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT  *\n FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_profile_pages_have_no_repeated_queries(self):
+        self.client.login(username='owner0', password='pass12345')
+        self.assertEqual(self.client.get(reverse('profile_view')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('leaderboard', args=['liked'])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('search_profiles'), {'q': 'first'}).status_code, 200)
+
+
+class DatabaseSettingsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def load_settings(self, **env):
+        # Re-executes the settings module only; django.conf.settings keeps its values
+        with mock.patch.dict(os.environ, env):
+            module = importlib.reload(project_settings)
+        self.addCleanup(importlib.reload, project_settings)
+        return module.DATABASES['default']
+
+    def test_mysql_persistent_connections(self):
+        db = self.load_settings(DB_CONNECTION='mysql', DB_CONN_MAX_AGE='300', DB_CONNECT_TIMEOUT='2')
+        self.assertEqual(db['CONN_MAX_AGE'], 300)
+        self.assertTrue(db['CONN_HEALTH_CHECKS'])
+        self.assertEqual(db['OPTIONS'], {'connect_timeout': 2})
+
+    def test_empty_max_age_keeps_connections_open(self):
+        db = self.load_settings(DB_CONNECTION='mysql', DB_CONN_MAX_AGE='', DB_CONN_HEALTH_CHECKS='0')
+        self.assertIsNone(db['CONN_MAX_AGE'])
+        self.assertFalse(db['CONN_HEALTH_CHECKS'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite pragmas')
+    def test_sqlite_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+@override_settings(BACKGROUND_TASKS_ASYNC=False)
+class ChatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(username=name, password='pass12345') for name in ('alice', 'bob', 'carol')
+        )
+        self.profiles = {
+            user.username: UserProfile.objects.create(
+                user=user, firstname=user.username.title(), lastname='User', age=30,
+                address='-', profile_picture=f'profile_pictures/{user.username}.jpg',
+            )
+            for user in (self.alice, self.bob, self.carol)
+        }
+
+    def react(self, user, target, value):
+        client = Client()
+        client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('react_profile', args=[self.profiles[target].pk]), {'reaction': value})
+
+    def match(self):
+        self.react(self.alice, 'bob', Reaction.LIKE)
+        self.react(self.bob, 'alice', Reaction.LOVE)
+        return Conversation.objects.get()
+
+    def test_mutual_like_and_love_open_one_conversation(self):
+        self.react(self.alice, 'bob', Reaction.LIKE)
+        self.assertFalse(Conversation.objects.exists())
+        self.react(self.bob, 'alice', Reaction.LOVE)
+        self.react(self.alice, 'bob', Reaction.LOVE)  # switching keeps the same conversation
+        conversation = Conversation.objects.get()
+        self.assertEqual((conversation.user_low, conversation.user_high), (self.alice, self.bob))
+        self.assertEqual(
+            sorted(conversation.members.values_list('user__username', 'unread_count')),
+            [('alice', 1), ('bob', 1)],
+        )
+        notice = Message.objects.get()
+        self.assertIsNone(notice.sender)
+
+    def test_dislike_does_not_match(self):
+        self.react(self.alice, 'bob', Reaction.LIKE)
+        self.react(self.bob, 'alice', Reaction.DISLIKE)
+        self.assertFalse(Conversation.objects.exists())
+
+    def test_send_updates_unread_and_inbox(self):
+        conversation = self.match()
+        chat.mark_read(self.bob, conversation.pk)
+        first = chat.send_message(self.alice, conversation.pk, ' hi ')
+        second = chat.send_message(self.alice, conversation.pk, 'there')
+        self.assertEqual(first.body, 'hi')
+        bob, alice = (conversation.members.get(user=u) for u in (self.bob, self.alice))
+        self.assertEqual((bob.unread_count, bob.last_message_id), (2, second.pk))
+        self.assertEqual((alice.last_read_id, alice.unread_count), (second.pk, 1))  # the notice
+        self.assertEqual(chat.unread_total(self.bob), 2)
+
+        entries, _ = chat.inbox(self.bob)
+        self.assertEqual(entries[0]['partner'], self.profiles['alice'])
+        self.assertEqual(entries[0]['last_message'], second)
+
+        self.client.force_login(self.bob)
+        response = self.client.get(reverse('conversation', args=[conversation.pk]))
+        self.assertContains(response, 'there')
+        self.assertEqual(chat.unread_total(self.bob), 0)
+
+    def test_history_pages_by_keyset(self):
+        conversation = self.match()
+        sent = [chat.send_message(self.alice, conversation.pk, f'm{i}') for i in range(5)]
+        self.client.force_login(self.bob)
+        url = reverse('conversation_messages', args=[conversation.pk])
+        page = self.client.get(url, {'page_size': 2}).json()
+        self.assertEqual([m['body'] for m in page['messages']], ['m3', 'm4'])
+        with self.assertNumQueries(4):  # session, user, membership, page
+            older = self.client.get(url, {'page_size': 2, 'before': page['next_cursor']}).json()
+        self.assertEqual([m['body'] for m in older['messages']], ['m1', 'm2'])
+        newer = self.client.get(url, {'after': sent[2].pk}).json()
+        self.assertEqual([m['body'] for m in newer['messages']], ['m3', 'm4'])
+
+    def test_post_message_and_outsider_rejected(self):
+        conversation = self.match()
+        url = reverse('conversation_messages', args=[conversation.pk])
+        self.client.force_login(self.bob)
+        response = self.client.post(url, {'body': 'hello'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['message']['sender_id'], self.bob.pk)
+        self.assertEqual(self.client.post(url, {'body': '  '}, HTTP_X_REQUESTED_WITH='XMLHttpRequest').status_code, 400)
+
+        self.client.force_login(self.carol)
+        self.assertEqual(self.client.post(url, {'body': 'hi'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('conversation', args=[conversation.pk])).status_code, 404)
+
+    def test_other_methods_do_not_mark_read(self):
+        conversation = self.match()
+        self.client.force_login(self.bob)
+        url = reverse('conversation_messages', args=[conversation.pk])
+        for method in (self.client.put, self.client.delete):
+            self.assertEqual(method(url).status_code, 405)
+        self.assertEqual(chat.unread_total(self.bob), 1)
+
+    @override_settings(RATELIMITS={'chat-send': '2/m'})
+    def test_sending_is_rate_limited(self):
+        conversation = self.match()
+        self.client.force_login(self.bob)
+        url = reverse('conversation_messages', args=[conversation.pk])
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {'body': 'hi'}, **ajax).status_code, 201)
+        response = self.client.post(url, {'body': 'hi'}, **ajax)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '30')
+        response = self.client.post(url, {'body': 'hi'}, follow=True)
+        self.assertRedirects(response, reverse('conversation', args=[conversation.pk]))
+        self.assertContains(response, 'You are sending messages too fast.')
+        self.assertEqual(Message.objects.filter(sender=self.bob).count(), 2)
+        # Reading is not limited
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_messages_are_append_only(self):
+        message = Message.objects.get(pk=chat.send_message(self.alice, self.match().pk, 'hi').pk)
+        message.body = 'edited'
+        with self.assertRaises(ValueError):
+            message.save()
+
+    async def test_every_message_delivered_over_websocket(self):
+        conversation = await sync_to_async(self.match)()
+        client = Client()
+        await sync_to_async(client.force_login)(self.bob)
+        socket = FakeSocket(websocket_application, '/ws/messages/', f'sessionid={client.cookies["sessionid"].value}')
+        self.assertEqual((await socket.connect())['type'], 'websocket.accept')
+
+        def send(body):
+            with self.captureOnCommitCallbacks(execute=True):
+                chat.send_message(self.alice, conversation.pk, body)
+
+        for i in range(3):
+            await sync_to_async(send)(f'm{i}')
+        # Not coalesced like the counters: all three arrive
+        received = [await socket.receive_json() for _ in range(3)]
+        self.assertEqual([m['body'] for m in received], ['m0', 'm1', 'm2'])
+        await socket.close()
+
+    async def test_websocket_from_foreign_origin_rejected(self):
+        client = Client()
+        await sync_to_async(client.force_login)(self.bob)
+        cookie = f'sessionid={client.cookies["sessionid"].value}'
+        for origin in ('https://evil.example', ''):
+            socket = FakeSocket(websocket_application, '/ws/messages/', cookie, origin=origin)
+            self.assertEqual(await socket.connect(), {'type': 'websocket.close', 'code': 4403})
+        with self.settings(CSRF_TRUSTED_ORIGINS=['https://*.example.com']):
+            socket = FakeSocket(websocket_application, '/ws/messages/', cookie, origin='https://chat.example.com')
+            self.assertEqual((await socket.connect())['type'], 'websocket.accept')
+            await socket.close()
+
+
+@override_settings(DELETION_BATCH_SIZE=2)
+class BulkDeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass12345') for i in range(5)]
+        self.profiles = [
+            UserProfile.objects.create(
+                user=user, firstname=f'First{i}', lastname='User', age=30,
+                address='-', profile_picture=f'profile_pictures/{i}.jpg',
+            )
+            for i, user in enumerate(self.users)
+        ]
+        self.owner, self.target = self.users[0], self.profiles[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            for user in self.users[1:]:
+                apply_reaction(user, self.target.pk, Reaction.LIKE)
+            # user0 reacted to everyone else
+            for profile in self.profiles[1:]:
+                apply_reaction(self.owner, profile.pk, Reaction.LOVE)
+
+    def test_profile_hidden_at_once_and_purged_in_chunks(self):
+        self.client.login(username='user0', password='pass12345')
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self.client.post(reverse('delete_profile', args=[self.target.pk]))
+        self.assertRedirects(res, reverse('profile_view'), fetch_redirect_response=False)
+        # Hidden before the purge has run
+        self.assertEqual(Reaction.objects.filter(profile=self.target).count(), 4)
+        self.assertEqual(self.client.get(reverse('view_profile', args=[self.target.pk])).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('profile_view')), 'First0')
+        self.assertEqual(self.client.get(reverse('my_profile')).status_code, 302)
+        other = Client()
+        other.force_login(self.users[1])
+        res = other.post(
+            reverse('react_profile', args=[self.target.pk]), {'reaction': Reaction.LOVE},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(res.status_code, 404)
+
+        with CaptureQueriesContext(connection) as ctx:
+            for callback in callbacks:
+                callback()
+        chunks = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('DELETE FROM "core_reaction" WHERE "id" IN')]
+        self.assertEqual(len(chunks), 2)  # 4 reactions, 2 per chunk
+        self.assertFalse(UserProfile.objects.filter(pk=self.target.pk).exists())
+        self.assertFalse(Reaction.objects.filter(profile_id=self.target.pk).exists())
+        # The owner's reactions on other profiles are untouched
+        self.assertEqual(Reaction.objects.filter(user=self.owner).count(), 4)
+
+    def test_user_deletion_fixes_counters_of_profiles_they_reacted_to(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            deletion.schedule_user_deletion(self.owner)
+        self.assertFalse(User.objects.filter(pk=self.owner.pk).exists())
+        self.assertFalse(Reaction.objects.filter(user_id=self.owner.pk).exists())
+        self.assertEqual(
+            list(UserProfile.objects.order_by('pk').values_list('loves_count', flat=True)),
+            [0, 0, 0, 0],
+        )
+        rollup = ReactionDailyRollup.objects.get(profile=self.profiles[1], reaction=Reaction.LOVE)
+        self.assertEqual((rollup.added, rollup.removed), (1, 1))
+
+    def test_command_finishes_pending_profiles(self):
+        deletion.hide_profile(self.target.pk)
+        out = StringIO()
+        call_command('purge_deleted_profiles', stdout=out)
+        self.assertIn('Purged 1 pending profile(s).', out.getvalue())
+        self.assertFalse(UserProfile.objects.filter(pk=self.target.pk).exists())
+        self.assertEqual(Reaction.objects.count(), 4)
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_signup_logs_in_without_hashing_again(self):
+        with mock.patch('django.contrib.auth.hashers.MD5PasswordHasher.verify') as verify:
+            response = self.client.post(reverse('signup'), {
+                'username': 'newcomer', 'password1': 'Maple-river-7301', 'password2': 'Maple-river-7301',
+            })
+        self.assertRedirects(response, reverse('create_profile'), fetch_redirect_response=False)
+        verify.assert_not_called()
+        user = User.objects.get(username='newcomer')
+        self.assertEqual(int(self.client.session['_auth_user_id']), user.pk)
+        self.assertTrue(user.check_password('Maple-river-7301'))
+
+    @override_settings(PASSWORD_HASHERS=['core.hashers.PBKDF2PasswordHasher'], PASSWORD_PBKDF2_ITERATIONS=1200)
+    def test_login_rehashes_at_the_configured_cost(self):
+        user = User.objects.create_user('old-cost', password='pw')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1200$'))
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1500):
+            self.assertTrue(self.client.login(username='old-cost', password='pw'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1500$'))
+
+    @override_settings(PASSWORD_HASHERS=['core.hashers.PBKDF2PasswordHasher'], PASSWORD_PBKDF2_ITERATIONS=1500)
+    def test_seeded_passwords_are_cheap_until_first_login(self):
+        call_command('seed_load', users=2, reactions=1, hash_iterations=10, stdout=StringIO())
+        user = User.objects.get(username='seed-0')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$10$'))
+        self.assertTrue(self.client.login(username='seed-0', password='seed-password'))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1500$'))
+
+
+@override_settings(RATELIMITS={'react-user': '3/m', 'react-profile': '2/m'})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(username='viewer', password='pw')
+        self.profiles = [
+            UserProfile.objects.create(
+                user=User.objects.create_user(username=f'target{i}', password='pw'),
+                firstname=f'Target{i}', lastname='User', age=30, gender='F', address='1 Street',
+                profile_picture='profile_pictures/target.jpg',
+            )
+            for i in range(2)
+        ]
+        self.client.force_login(self.viewer)
+        self.ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest', 'HTTP_ACCEPT': 'application/json'}
+
+    def react(self, profile, **headers):
+        return self.client.post(reverse('react_profile', args=[profile.pk]), {'reaction': Reaction.LIKE}, **headers)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/10s'), (10, 1.0))
+        self.assertEqual(parse_rate('60/m'), (60, 1.0))
+        self.assertEqual(parse_rate('7200 / 2h'), (7200, 1.0))
+        self.assertEqual(parse_rate('5/2'), (5, 2.5))
+        for rate in ('10', 'ten/m', '0/m', '5/0s'):
+            with self.assertRaises(ValueError):
+                parse_rate(rate)
+
+    def test_ajax_toggles_on_one_profile_get_429(self):
+        self.assertEqual(self.react(self.profiles[0], **self.ajax).json()['likes_count'], 1)
+        self.assertEqual(self.react(self.profiles[0], **self.ajax).json()['likes_count'], 0)
+        res = self.react(self.profiles[0], **self.ajax)
+        self.assertEqual(res.status_code, 429)
+        self.assertEqual(res.headers['Retry-After'], '30')
+        self.assertEqual(res.json(), {'error': 'Too many requests', 'retry_after': 30})
+        self.assertFalse(Reaction.objects.exists())
+        # Reading the state takes no tokens
+        res = self.client.get(reverse('react_profile', args=[self.profiles[0].pk]), **self.ajax)
+        self.assertEqual(res.status_code, 200)
+
+    def test_per_user_bucket_spans_profiles(self):
+        self.react(self.profiles[0], **self.ajax)
+        self.react(self.profiles[0], **self.ajax)
+        self.assertEqual(self.react(self.profiles[1], **self.ajax).status_code, 200)
+        self.assertEqual(self.react(self.profiles[1], **self.ajax).status_code, 429)
+        # Another user has their own buckets
+        self.client.force_login(self.profiles[0].user)
+        self.assertEqual(self.react(self.profiles[1], **self.ajax).status_code, 200)
+
+    def test_form_post_redirects_with_message(self):
+        for _ in range(2):
+            self.react(self.profiles[0])
+        res = self.react(self.profiles[0], follow=True)
+        self.assertRedirects(res, reverse('view_profile', args=[self.profiles[0].pk]))
+        self.assertContains(res, 'You are reacting too fast. Try again in 30 seconds.')
+
+    @override_settings(RATELIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertEqual(self.react(self.profiles[0], **self.ajax).status_code, 200)
+
+    def test_local_buckets_refill_and_evict(self):
+        buckets = LocalTokenBuckets(max_keys=2)
+        with mock.patch('core.ratelimit.time.monotonic', return_value=100.0) as clock:
+            self.assertEqual(buckets.consume('a', 2, 0.5), 0)
+            self.assertEqual(buckets.consume('a', 2, 0.5), 0)
+            self.assertEqual(buckets.consume('a', 2, 0.5), 2.0)
+            clock.return_value = 101.0
+            self.assertEqual(buckets.consume('a', 2, 0.5), 1.0)
+            clock.return_value = 102.0
+            self.assertEqual(buckets.consume('a', 2, 0.5), 0)
+            # 'a' is the least recently used once two more keys arrive
+            buckets.consume('b', 2, 0.5)
+            buckets.consume('c', 2, 0.5)
+            self.assertEqual(buckets.consume('a', 2, 0.5), 0)
@@ -0,0 +1,109 @@
+"""Streaming upload handling for profile pictures.
+
+``ProfilePictureUploadHandler`` writes each chunk straight to a temporary
+file and rejects an upload as early as possible:
+
+- when the declared or received size exceeds ``PROFILE_IMAGE_MAX_UPLOAD_SIZE``,
+- when the first bytes are not a JPEG, PNG, GIF or WebP header,
+- when the header declares more than ``PROFILE_IMAGE_MAX_PIXELS`` pixels,
+  which stops decompression bombs before any pixel data is decoded.
+
+Rejection reasons are collected in ``request.upload_errors`` so the form can
+show them next to the field.
+"""
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from .images import open_image
+
+# Magic numbers of the accepted formats
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',  # JPEG
+    b'\x89PNG\r\n\x1a\n',  # PNG
+    b'GIF87a',
+    b'GIF89a',
+)
+# Bytes buffered while looking for the dimensions; JPEG EXIF/ICC segments
+# can push the frame header this far in
+HEADER_LIMIT = 256 * 1024
+
+
+def max_upload_size():
+    return getattr(settings, 'PROFILE_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+
+
+def looks_like_image(header):
+    if header.startswith(IMAGE_SIGNATURES):
+        return True
+    return header[:4] == b'RIFF' and header[8:12] == b'WEBP'
+
+
+class ProfilePictureUploadHandler(TemporaryFileUploadHandler):
+    """Stream image uploads to disk, enforcing byte and pixel limits."""
+
+    def new_file(self, field_name, file_name, content_type, content_length, *args, **kwargs):
+        super().new_file(field_name, file_name, content_type, content_length, *args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.header_checked = False
+        if content_length is not None and content_length > max_upload_size():
+            self.reject(self.too_large_message())
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > max_upload_size():
+            self.reject(self.too_large_message())
+        if not self.header_checked:
+            self.check_header(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def check_header(self, raw_data):
+        self.header += raw_data[:HEADER_LIMIT - len(self.header)]
+        if len(self.header) >= 12 and not looks_like_image(self.header):
+            self.reject('Upload a valid JPEG, PNG, GIF or WebP image.')
+        try:
+            # Parses the header only; pixel data is never decoded here
+            open_image(BytesIO(self.header))
+        except ValidationError as e:
+            if e.code == 'too_large':
+                self.reject(e.messages[0])
+            if len(self.header) >= HEADER_LIMIT:
+                self.reject('Upload a valid JPEG, PNG, GIF or WebP image.')
+            # Header not complete yet; try again with the next chunk
+            return
+        self.header_checked = True
+        self.header = b''
+
+    def too_large_message(self):
+        return f'Image files must be smaller than {filesizeformat(max_upload_size())}.'
+
+    def reject(self, message):
+        if self.request is not None:
+            if not hasattr(self.request, 'upload_errors'):
+                self.request.upload_errors = {}
+            self.request.upload_errors[self.field_name] = message
+        self.upload_interrupted()
+        raise SkipFile(message)
+
+
+def bounded_image_uploads(view):
+    """Use ``ProfilePictureUploadHandler`` for the file uploads of ``view``.
+
+    Upload handlers must be swapped before anything reads ``request.POST``,
+    including the CSRF middleware, so CSRF is checked here instead.
+    """
+    protected = csrf_protect(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [ProfilePictureUploadHandler(request)]
+        request.upload_errors = {}
+        return protected(request, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
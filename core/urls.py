@@ -1,13 +1,30 @@
+from django.conf import settings
+
 from . import views
 from django.urls import path
 
+# Under ASGI the read-heavy pages use their async versions
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
-    path('', views.profile_view, name='profile_view'),
+    path('', read_views.profile_view, name='profile_view'),
     path('create/', views.create_profile, name='create_profile'),
     path('delete/<int:pk>/', views.delete_profile, name='delete_profile'),
-    path('profile/<int:pk>/', views.view_profile, name='view_profile'),
+    path('profile/<int:pk>/', read_views.view_profile, name='view_profile'),
     path('profile/<int:pk>/edit/', views.edit_profile, name='edit_profile'),
-    path('profile/<int:pk>/react/', views.react_profile, name='react_profile'),
-    path('me/', views.my_profile, name='my_profile'),
+    path('profile/<int:pk>/react/', read_views.react_profile, name='react_profile'),
+    path('profile/<int:pk>/reactions/daily/', views.reaction_series, name='reaction_series'),
+    path('reactions/state/', views.reaction_states, name='reaction_states'),
+    path('search/', views.search_profiles, name='search_profiles'),
+    path('top/<slug:board>/', views.leaderboard_view, name='leaderboard'),
+    path('top/<slug:board>/data/', views.leaderboard_data, name='leaderboard_data'),
+    path('messages/', views.inbox, name='inbox'),
+    path('messages/<int:pk>/', views.conversation_view, name='conversation'),
+    path('messages/<int:pk>/data/', views.conversation_messages, name='conversation_messages'),
+    path('metrics/', views.request_metrics, name='request_metrics'),
+    path('me/', read_views.my_profile, name='my_profile'),
     path('settings/', views.profile_settings, name='profile_settings'),
 ]
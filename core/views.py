@@ -1,41 +1,134 @@
+from datetime import timedelta
+
 from django.shortcuts import render, get_object_or_404
 from . import models
 from . import forms
 from django.shortcuts import redirect
 from .forms import UserProfileForm
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
-from django.contrib.auth import authenticate, login
-from django.db import transaction
-from django.db.models import F
-from django.http import JsonResponse
+from django.contrib.auth import login
+from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_http_methods
+from . import cache as profile_cache
+from . import chat
+from . import deletion
+from . import instrumentation
+from . import leaderboard
+from . import rollups
+from .conditional import latest, make_etag, not_modified, set_validators, viewer_parts
+from .middleware import get_current_profile, get_current_profile_id, remember_profile
+from .images import schedule_thumbnail
+from .uploads import bounded_image_uploads
+from .pubsub import publish_profile_counts
+from .ratelimit import ratelimit, retry_after_header, user_profile_key
+from .pagination import get_cursor, get_page_size, keyset_page
+from .search import search_profiles as filter_profiles
+from .reactions import COUNTER_FIELDS, apply_reaction, get_counts, get_shard_count, include_pending_counts
+
+# Columns rendered by the profile list cards. The cards show nearly every
+# column today; listing them keeps fields added to the model later out of
+# the directory queries until a card needs them.
+PROFILE_LIST_FIELDS = (
+    'id', 'user_id', 'firstname', 'lastname', 'age', 'gender', 'address', 'profile_picture',
+    'profile_thumbnail', 'likes_count', 'loves_count', 'dislikes_count', 'updated_at',
+)
 
 # Create your views here.
 @login_required
 def profile_view(request):
-    # Show all profiles
-    profiles = models.UserProfile.objects.all()
-    my_profile = models.UserProfile.objects.filter(user=request.user).first()
-    return render(request, 'core/profile.html', {
+    # Show profiles one keyset page at a time (``?after=<id>&page_size=<n>``)
+    page_size = get_page_size(request)
+    after = get_cursor(request)
+    profiles, next_cursor = keyset_page(
+        models.UserProfile.objects.visible().only(*PROFILE_LIST_FIELDS),
+        after=after, size=page_size,
+    )
+    include_pending_counts(profiles)
+    my_profile = get_current_profile_id(request)
+
+    # Revalidate against the page's rows; a 304 skips rendering entirely
+    etag, last_modified = list_validators(request, profiles, page_size, after, next_cursor)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    response = render(request, 'core/profile.html', {
         'profiles': profiles,
         'my_profile': my_profile,
+        'page_size': page_size,
+        'after': after,
+        'next_cursor': next_cursor,
     })
+    return set_validators(request, response, etag, last_modified)
+
+def list_validators(request, profiles, page_size, after, next_cursor):
+    """ETag of one page of the profile list, and no Last-Modified.
+
+    The ETag covers the page's ids and counters as shown, pending shard
+    deltas included. No timestamp can vouch for the page: a profile
+    deleted from it leaves every remaining ``updated_at`` unchanged.
+    """
+    etag = make_etag(
+        'list', page_size, after, next_cursor,
+        [(p.pk, p.updated_at, p.likes_count, p.loves_count, p.dislikes_count) for p in profiles],
+        *viewer_parts(request),
+    )
+    return etag, None
+
+
+def detail_validators(request, profile, my_reaction):
+    """ETag and Last-Modified of a profile detail page.
+
+    The counters in the ETag include pending shard deltas. With sharded
+    counters ``updated_at`` only moves when the shards are folded, so no
+    Last-Modified is given then.
+    """
+    etag = make_etag(
+        'detail', profile.pk, profile.updated_at,
+        profile.likes_count, profile.loves_count, profile.dislikes_count,
+        my_reaction, *viewer_parts(request),
+    )
+    if get_shard_count():
+        return etag, None
+    viewer = get_current_profile(request)
+    last_modified = latest(profile.updated_at, viewer.updated_at if viewer else None)
+    return etag, last_modified
+
 
 @login_required
+@bounded_image_uploads
 def create_profile(request):
     # If the user already has a profile, send them to view/edit it
-    existing = models.UserProfile.objects.filter(user=request.user).first()
+    existing = get_current_profile_id(request)
     if existing:
         messages.info(request, 'You already have a profile.')
-        return redirect('view_profile', pk=existing.pk)
+        return redirect('view_profile', pk=existing)
 
     if request.method == "POST":
-        form = UserProfileForm(request.POST, request.FILES)
+        form = UserProfileForm(request.POST, request.FILES, upload_errors=request.upload_errors)
         if form.is_valid():
             profile = form.save(commit=False)
             profile.user = request.user
-            profile.save()
+            try:
+                with transaction.atomic():
+                    profile.save()
+            except IntegrityError:
+                # Created meanwhile from another session or tab
+                profile_cache.invalidate_user_profile(request.user.pk)
+                messages.info(request, 'You already have a profile.')
+                return redirect('my_profile')
+            remember_profile(request, profile.pk)
+            # A lookup of this id before it existed may have cached "missing"
+            transaction.on_commit(lambda: profile_cache.invalidate_profile(profile.pk))
+            schedule_thumbnail(profile.pk)
             messages.success(request, 'Profile created successfully.')
             return redirect('view_profile', pk=profile.pk)
     else:
@@ -48,14 +141,16 @@ def delete_profile(request, pk):
     """Confirm and delete a UserProfile by primary key.
 
     GET: render confirmation page.
-    POST: delete and redirect to profile list.
+    POST: hide the profile at once and redirect to the profile list; its
+    rows are purged in the background (``core.deletion``).
     """
-    profile = get_object_or_404(models.UserProfile, pk=pk)
-    if profile.user != request.user:
+    profile = get_object_or_404(models.UserProfile.objects.visible(), pk=pk)
+    if profile.user_id != request.user.id:
         messages.error(request, "You don't have permission to delete this profile.")
         return redirect('view_profile', pk=profile.pk)
     if request.method == 'POST':
-        profile.delete()
+        deletion.schedule_profile_deletion(pk)
+        remember_profile(request, None)
         messages.success(request, 'Profile deleted.')
         return redirect('profile_view')
     return render(request, 'core/delete_profile.html', {'profile': profile})
@@ -64,28 +159,42 @@ def delete_profile(request, pk):
 @login_required
 def view_profile(request, pk):
     """Show a single profile with options to edit or delete."""
-    profile = get_object_or_404(models.UserProfile, pk=pk)
-    # Find the current user's reaction if any
-    my_reaction = None
-    try:
-        from .models import Reaction
-        my_reaction = Reaction.objects.filter(user=request.user, profile=profile).first()
-    except Exception:
-        my_reaction = None
-    return render(request, 'core/profile_detail.html', {'profile': profile, 'my_reaction': my_reaction})
+    profile = profile_cache.get_profile(pk)
+    if profile is None:
+        raise Http404('No UserProfile matches the given query.')
+    include_pending_counts([profile])
+    # The current user's reaction value ('like', 'love', 'dislike') if any
+    my_reaction = profile_cache.get_reaction(request.user.pk, pk)
+
+    etag, last_modified = detail_validators(request, profile, my_reaction)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    response = render(request, 'core/profile_detail.html', {'profile': profile, 'my_reaction': my_reaction})
+    return set_validators(request, response, etag, last_modified)
 
 
 @login_required
+@bounded_image_uploads
 def edit_profile(request, pk):
     """Edit an existing profile."""
-    profile = get_object_or_404(models.UserProfile, pk=pk)
-    if profile.user != request.user:
+    profile = get_object_or_404(models.UserProfile.objects.visible(), pk=pk)
+    if profile.user_id != request.user.id:
         messages.error(request, "You don't have permission to edit this profile.")
         return redirect('view_profile', pk=profile.pk)
     if request.method == 'POST':
-        form = UserProfileForm(request.POST, request.FILES, instance=profile)
+        form = UserProfileForm(
+            request.POST, request.FILES, instance=profile, upload_errors=request.upload_errors,
+        )
         if form.is_valid():
+            picture_changed = 'profile_picture' in form.changed_data
+            if picture_changed:
+                # The old thumbnail no longer matches; fall back to the original until regenerated
+                profile.profile_thumbnail = ''
             form.save()
+            if picture_changed:
+                schedule_thumbnail(profile.pk)
+            profile_cache.invalidate_profile(pk)
             messages.success(request, 'Profile updated.')
             return redirect('view_profile', pk=profile.pk)
     else:
@@ -96,9 +205,9 @@ def edit_profile(request, pk):
 @login_required
 def my_profile(request):
     """Redirect the current user to their own profile detail, or to create one."""
-    profile = models.UserProfile.objects.filter(user=request.user).first()
-    if profile:
-        return redirect('view_profile', pk=profile.pk)
+    profile_id = get_current_profile_id(request)
+    if profile_id:
+        return redirect('view_profile', pk=profile_id)
     messages.info(request, "You don't have a profile yet. Let's create one.")
     return redirect('create_profile')
 
@@ -106,14 +215,25 @@ def my_profile(request):
 @login_required
 def profile_settings(request):
     """Go to edit page for the user's profile or to create if none exists."""
-    profile = models.UserProfile.objects.filter(user=request.user).first()
-    if profile:
-        return redirect('edit_profile', pk=profile.pk)
+    profile_id = get_current_profile_id(request)
+    if profile_id:
+        return redirect('edit_profile', pk=profile_id)
     messages.info(request, "Create your profile to access settings.")
     return redirect('create_profile')
 
 
+def _reaction_limited(request, retry_after):
+    """Answer a reaction refused by the rate limiter."""
+    if is_ajax_request(request):
+        response = JsonResponse({'error': 'Too many requests', 'retry_after': retry_after}, status=429)
+        return retry_after_header(response, retry_after)
+    messages.error(request, f'You are reacting too fast. Try again in {retry_after} seconds.')
+    return redirect('view_profile', pk=request.resolver_match.kwargs['pk'])
+
+
 @login_required
+@ratelimit('react-profile', key=user_profile_key, limited=_reaction_limited)
+@ratelimit('react-user', limited=_reaction_limited)
 def react_profile(request, pk):
     """Create, update, or remove a reaction for the given profile.
 
@@ -121,118 +241,387 @@ def react_profile(request, pk):
     - If no existing reaction: create it and increment the matching counter.
     - If existing reaction matches the selected: remove it (toggle off) and decrement the counter.
     - If existing reaction differs: update it and adjust counters accordingly.
+
+    The write itself is delegated to ``record_reaction``. POSTs are rate
+    limited per user and per user and profile (``RATELIMITS``).
     """
     # Detect AJAX/JSON request
-    is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest' or (
-        'application/json' in (request.headers.get('accept') or '')
-    )
+    is_ajax = is_ajax_request(request)
 
     if request.method != 'POST':
+        if is_ajax and request.method in ('GET', 'HEAD'):
+            return _reaction_state(request, pk)
         if is_ajax:
             return JsonResponse({'error': 'Method not allowed'}, status=405)
         return redirect('view_profile', pk=pk)
 
-    profile = get_object_or_404(models.UserProfile, pk=pk)
-    # Disallow reacting to your own profile
-    if profile.user_id == request.user.id:
-        if is_ajax:
-            return JsonResponse({'error': "You can't react to your own profile."}, status=400)
-        messages.error(request, "You can't react to your own profile.")
-        return redirect('view_profile', pk=pk)
     reaction_value = request.POST.get('reaction')
-    from .models import Reaction
-    allowed = {Reaction.LIKE, Reaction.LOVE, Reaction.DISLIKE}
-    if reaction_value not in allowed:
-        if is_ajax:
-            return JsonResponse({'error': 'Invalid reaction.'}, status=400)
-        messages.error(request, 'Invalid reaction.')
-        return redirect('view_profile', pk=pk)
-
-    from django.core.exceptions import ValidationError
     try:
-        with transaction.atomic():
-            existing = Reaction.objects.select_for_update().filter(user=request.user, profile=profile).first()
-            if existing is None:
-                # create new reaction
-                Reaction.objects.create(user=request.user, profile=profile, reaction=reaction_value)
-                if reaction_value == Reaction.LIKE:
-                    models.UserProfile.objects.filter(pk=profile.pk).update(likes_count=F('likes_count') + 1)
-                elif reaction_value == Reaction.LOVE:
-                    models.UserProfile.objects.filter(pk=profile.pk).update(loves_count=F('loves_count') + 1)
-                else:
-                    models.UserProfile.objects.filter(pk=profile.pk).update(dislikes_count=F('dislikes_count') + 1)
-            else:
-                if existing.reaction == reaction_value:
-                    # toggle off: delete existing and decrement
-                    if existing.reaction == Reaction.LIKE:
-                        models.UserProfile.objects.filter(pk=profile.pk).update(likes_count=F('likes_count') - 1)
-                    elif existing.reaction == Reaction.LOVE:
-                        models.UserProfile.objects.filter(pk=profile.pk).update(loves_count=F('loves_count') - 1)
-                    else:
-                        models.UserProfile.objects.filter(pk=profile.pk).update(dislikes_count=F('dislikes_count') - 1)
-                    existing.delete()
-                else:
-                    # change reaction: decrement old, increment new
-                    if existing.reaction == Reaction.LIKE:
-                        models.UserProfile.objects.filter(pk=profile.pk).update(likes_count=F('likes_count') - 1)
-                    elif existing.reaction == Reaction.LOVE:
-                        models.UserProfile.objects.filter(pk=profile.pk).update(loves_count=F('loves_count') - 1)
-                    else:
-                        models.UserProfile.objects.filter(pk=profile.pk).update(dislikes_count=F('dislikes_count') - 1)
-
-                    existing.reaction = reaction_value
-                    existing.save(update_fields=['reaction', 'updated_at'])
-
-                    if reaction_value == Reaction.LIKE:
-                        models.UserProfile.objects.filter(pk=profile.pk).update(likes_count=F('likes_count') + 1)
-                    elif reaction_value == Reaction.LOVE:
-                        models.UserProfile.objects.filter(pk=profile.pk).update(loves_count=F('loves_count') + 1)
-                    else:
-                        models.UserProfile.objects.filter(pk=profile.pk).update(dislikes_count=F('dislikes_count') + 1)
+        state = record_reaction(request.user, pk, reaction_value)
+    except models.UserProfile.DoesNotExist:
+        raise Http404('No UserProfile matches the given query.')
     except ValidationError as e:
-        if is_ajax:
-            return JsonResponse({'error': "; ".join(e.messages)}, status=400)
-        messages.error(request, "; ".join(e.messages))
+        return _reaction_error(request, pk, e, is_ajax)
+    return _reaction_response(pk, state, is_ajax)
 
-    # Prepare fresh values and current reaction
-    from .models import Reaction
-    profile = models.UserProfile.objects.get(pk=profile.pk)
-    current = Reaction.objects.filter(user=request.user, profile=profile).first()
 
+def is_ajax_request(request):
+    return request.headers.get('x-requested-with') == 'XMLHttpRequest' or (
+        'application/json' in (request.headers.get('accept') or '')
+    )
+
+
+def record_reaction(user, pk, value):
+    """Apply a reaction and refresh the caches and live viewers that depend on it."""
+    state = apply_reaction(user, pk, value)
+    # Counters changed; the viewer's new reaction is known, so store it directly
+    profile_cache.invalidate_profile(pk)
+    profile_cache.set_reaction(user.pk, pk, state['my_reaction'])
+    # Push the new counters to everyone watching this profile
+    counts = {key: value for key, value in state.items() if key != 'my_reaction'}
+    transaction.on_commit(lambda: publish_profile_counts(pk, counts))
+    transaction.on_commit(lambda: leaderboard.record_counts(pk, counts))
+    # A like/love may complete a mutual match and open a conversation
+    chat.schedule_match_check(user.pk, pk, state['my_reaction'])
+    return state
+
+
+def _reaction_error(request, pk, error, is_ajax):
     if is_ajax:
-        return JsonResponse({
-            'status': 'ok',
-            'likes_count': profile.likes_count,
-            'loves_count': profile.loves_count,
-            'dislikes_count': profile.dislikes_count,
-            'my_reaction': current.reaction if current else None,
-        })
+        return JsonResponse({'error': "; ".join(error.messages)}, status=400)
+    messages.error(request, "; ".join(error.messages))
+    return redirect('view_profile', pk=pk)
 
+
+def _reaction_response(pk, state, is_ajax):
+    if is_ajax:
+        response = JsonResponse({'status': 'ok', **state})
+        # Lets pollers start revalidating against the state they just got
+        response.headers['ETag'] = _reaction_etag(pk, state)
+        return response
     return redirect('view_profile', pk=pk)
 
 
+def _reaction_etag(pk, state):
+    return make_etag('reaction', pk, *(state[key] for key in sorted(state)))
+
+
+def _reaction_state(request, pk):
+    """JSON counts and the viewer's reaction, answered with 304 when unchanged."""
+    profile = profile_cache.get_profile(pk)
+    if profile is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    include_pending_counts([profile])
+    state = {
+        'likes_count': profile.likes_count,
+        'loves_count': profile.loves_count,
+        'dislikes_count': profile.dislikes_count,
+        'my_reaction': profile_cache.get_reaction(request.user.pk, pk),
+    }
+    return reaction_state_response(request, pk, state)
+
+
+def reaction_state_response(request, pk, state):
+    etag = _reaction_etag(pk, state)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse({'status': 'ok', **state})
+        response.headers['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def reaction_states(request):
+    """Counts and the viewer's reaction for a batch of profiles.
+
+    ``GET ?ids=1,2,3`` (or repeated ``ids``) returns
+    ``{"profiles": {"<id>": {"likes_count": .., ..., "my_reaction": ..}}}``
+    using one counter query and one reaction query for the whole batch.
+    """
+    try:
+        ids = {
+            int(value)
+            for raw in request.GET.getlist('ids')
+            for value in raw.split(',') if value.strip()
+        }
+    except ValueError:
+        return JsonResponse({'error': 'ids must be integers.'}, status=400)
+    limit = getattr(settings, 'REACTION_STATE_MAX_IDS', 100)
+    if len(ids) > limit:
+        return JsonResponse({'error': f'At most {limit} ids per request.'}, status=400)
+    if not ids:
+        return JsonResponse({'profiles': {}})
+
+    if get_shard_count():
+        counts = get_counts(ids)
+    else:
+        counts = {
+            row.pop('pk'): row
+            for row in models.UserProfile.objects.visible().filter(pk__in=ids).values('pk', *COUNTER_FIELDS.values())
+        }
+    mine = dict(
+        models.Reaction.objects.filter(user=request.user, profile_id__in=list(counts))
+        .values_list('profile_id', 'reaction')
+    )
+    return JsonResponse({
+        'profiles': {
+            str(pk): {**row, 'my_reaction': mine.get(pk)}
+            for pk, row in counts.items()
+        },
+    })
+
+
+@login_required
+def search_profiles(request):
+    """Search profiles as JSON.
+
+    ``GET ?q=<name prefix>&gender=M|F&age_min=&age_max=&address=<words>``,
+    paged like the list with ``after``/``page_size``. ``q`` matches the start
+    of first or last name case-insensitively ("ann sm" matches first name
+    "Ann…" and last name "Sm…"); ``address`` is a full-text match.
+    """
+    params = request.GET
+    try:
+        age_min = int(params['age_min']) if params.get('age_min') else None
+        age_max = int(params['age_max']) if params.get('age_max') else None
+    except ValueError:
+        return JsonResponse({'error': 'age_min and age_max must be integers.'}, status=400)
+    gender = params.get('gender') or None
+    if gender and gender not in dict(models.UserProfile.GENDER_CHOICES):
+        return JsonResponse({'error': 'Unknown gender.'}, status=400)
+
+    try:
+        queryset = filter_profiles(
+            models.UserProfile.objects.visible().only(*PROFILE_LIST_FIELDS),
+            name=params.get('q', '').strip(), gender=gender,
+            age_min=age_min, age_max=age_max, address=params.get('address', '').strip(),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    profiles, next_cursor = keyset_page(queryset, after=get_cursor(request), size=get_page_size(request))
+    include_pending_counts(profiles)
+    return JsonResponse({
+        'results': [
+            {
+                'id': p.pk,
+                'firstname': p.firstname,
+                'lastname': p.lastname,
+                'age': p.age,
+                'gender': p.gender,
+                'picture': _picture_url(p),
+                **{field: getattr(p, field) for field in COUNTER_FIELDS.values()},
+            }
+            for p in profiles
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+def _leaderboard_page(request, board):
+    if board not in leaderboard.BOARDS:
+        raise Http404('Unknown leaderboard.')
+    paginator = Paginator(leaderboard.ranked_ids(board), get_page_size(request))
+    page = paginator.get_page(request.GET.get('page'))
+    profiles = models.UserProfile.objects.visible().only(*PROFILE_LIST_FIELDS).in_bulk(page.object_list)
+    # Profiles deleted since the board was built are skipped
+    ranked = [profiles[pk] for pk in page.object_list if pk in profiles]
+    include_pending_counts(ranked)
+    return page, ranked
+
+
+@login_required
+def leaderboard_view(request, board):
+    """Ranked list of the most liked or most loved profiles.
+
+    Served from the cached top-K, so the cost doesn't grow with the number
+    of profiles: one cache read plus a primary-key lookup for the page.
+    """
+    page, profiles = _leaderboard_page(request, board)
+    return render(request, 'core/leaderboard.html', {
+        'board': board,
+        'boards': list(leaderboard.BOARDS),
+        'page': page,
+        'profiles': profiles,
+        'first_rank': page.start_index(),
+    })
+
+
+@login_required
+def leaderboard_data(request, board):
+    """JSON version of ``leaderboard_view``."""
+    page, profiles = _leaderboard_page(request, board)
+    return JsonResponse({
+        'board': board,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'results': [
+            {
+                'rank': page.start_index() + i,
+                'id': p.pk,
+                'firstname': p.firstname,
+                'lastname': p.lastname,
+                'picture': _picture_url(p),
+                **{field: getattr(p, field) for field in COUNTER_FIELDS.values()},
+            }
+            for i, p in enumerate(profiles)
+        ],
+    })
+
+
+@login_required
+def reaction_series(request, pk):
+    """Daily reaction activity of one profile as JSON, for charts.
+
+    ``GET ?days=30`` (ending today) or ``?start=YYYY-MM-DD&end=YYYY-MM-DD``.
+    Answered from the daily rollups only; the range is capped at
+    ``REACTION_SERIES_MAX_DAYS``.
+    """
+    if profile_cache.get_profile(pk) is None:
+        raise Http404('No UserProfile matches the given query.')
+    limit = getattr(settings, 'REACTION_SERIES_MAX_DAYS', 366)
+    try:
+        end = parse_date(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+        if request.GET.get('start'):
+            start = parse_date(request.GET['start'])
+        else:
+            # Anything outside 1..limit is refused below; clamping first keeps
+            # huge values from overflowing timedelta
+            days = min(max(int(request.GET.get('days', 30)), 0), limit + 1)
+            start = end - timedelta(days=days - 1)
+    except (ValueError, OverflowError):
+        start = end = None
+    if start is None or end is None:
+        return JsonResponse({'error': 'Invalid date range.'}, status=400)
+    if start > end or (end - start).days >= limit:
+        return JsonResponse({'error': f'The range must cover 1 to {limit} days.'}, status=400)
+
+    series = rollups.daily_series(pk, start, end)
+    return JsonResponse({
+        'profile_id': pk,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': [{**entry, 'day': entry['day'].isoformat()} for entry in series],
+    })
+
+
+@login_required
+def request_metrics(request):
+    """Per-view request metrics collected by ``RequestMetricsMiddleware`` (staff only)."""
+    if not instrumentation.is_enabled() or not request.user.is_staff:
+        raise Http404
+    return JsonResponse({'views': instrumentation.registry.snapshot()})
+
+
+@login_required
+def inbox(request):
+    """The viewer's conversations, most recent activity first (``?before=`` pages)."""
+    entries, next_cursor = chat.inbox(request.user, before=get_cursor(request, 'before'), size=get_page_size(request))
+    return render(request, 'core/inbox.html', {
+        'entries': entries,
+        'next_cursor': next_cursor,
+        'unread_total': chat.unread_total(request.user),
+    })
+
+
+@login_required
+def conversation_view(request, pk):
+    """One conversation: a page of history and the reply form.
+
+    Opening the newest page marks the conversation read; ``?before=<id>``
+    shows older messages.
+    """
+    try:
+        member = chat.get_membership(request.user, pk)
+    except models.Conversation.DoesNotExist as e:
+        raise Http404(str(e))
+    before = get_cursor(request, 'before')
+    if before is None:
+        # Mark first: anything arriving after this stays unread
+        chat.mark_read(request.user, pk)
+    page, next_cursor = chat.history(pk, before=before, size=get_page_size(request))
+    partner_id = member.conversation.partner_id(request.user.pk)
+    return render(request, 'core/conversation.html', {
+        'conversation': member.conversation,
+        'partner': models.UserProfile.objects.filter(user_id=partner_id).first(),
+        'chat_messages': page,
+        'next_cursor': next_cursor,
+    })
+
+
+def _chat_limited(request, retry_after):
+    """Answer a message refused by the rate limiter."""
+    if is_ajax_request(request):
+        response = JsonResponse({'error': 'Too many requests', 'retry_after': retry_after}, status=429)
+        return retry_after_header(response, retry_after)
+    messages.error(request, f'You are sending messages too fast. Try again in {retry_after} seconds.')
+    return redirect('conversation', pk=request.resolver_match.kwargs['pk'])
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+@ratelimit('chat-send', limited=_chat_limited)
+def conversation_messages(request, pk):
+    """Message history as JSON (GET) or send a message (POST).
+
+    ``GET ?before=<id>`` pages backwards, ``?after=<id>`` returns newer
+    messages; without either the newest page is returned and the
+    conversation marked read. ``POST body=...`` appends a message; form
+    posts are redirected back to the conversation. Sending is rate limited
+    per user (``RATELIMITS['chat-send']``).
+    """
+    is_ajax = is_ajax_request(request)
+    if request.method == 'POST':
+        try:
+            message = chat.send_message(request.user, pk, request.POST.get('body'))
+        except models.Conversation.DoesNotExist as e:
+            raise Http404(str(e))
+        except ValidationError as e:
+            if is_ajax:
+                return JsonResponse({'error': "; ".join(e.messages)}, status=400)
+            messages.error(request, "; ".join(e.messages))
+            return redirect('conversation', pk=pk)
+        if is_ajax:
+            return JsonResponse({'status': 'ok', 'message': chat.serialize(message)}, status=201)
+        return redirect('conversation', pk=pk)
+
+    try:
+        chat.get_membership(request.user, pk)
+    except models.Conversation.DoesNotExist as e:
+        raise Http404(str(e))
+    before, after = get_cursor(request, 'before'), get_cursor(request, 'after')
+    if before is None and after is None:
+        chat.mark_read(request.user, pk)
+    page, next_cursor = chat.history(pk, before=before, after=after, size=get_page_size(request))
+    return JsonResponse({
+        'messages': [chat.serialize(message) for message in page],
+        'next_cursor': next_cursor,
+    })
+
+
+def _picture_url(profile):
+    picture = profile.profile_thumbnail or profile.profile_picture
+    return picture.url if picture else None
+
+
 def signup(request):
     """Register a new user using Django's built-in UserCreationForm.
 
-    On success, automatically log the user in and redirect to the profile list.
+    On success, automatically log the user in and send them on to create a
+    profile.
     """
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
         if form.is_valid():
             user = form.save()
-            # Authenticate with the credentials just set to attach a backend
-            raw_password = form.cleaned_data.get('password1')
-            authenticated = authenticate(request, username=user.username, password=raw_password)
-            if authenticated is not None:
-                login(request, authenticated)
-                messages.success(request, 'Welcome! Your account has been created.')
-                # After signup, if no profile exists, direct to create profile
-                if not models.UserProfile.objects.filter(user=authenticated).exists():
-                    messages.info(request, 'Let\'s complete your profile.')
-                    return redirect('create_profile')
-                return redirect('profile_view')
-            messages.info(request, 'Account created. Please log in.')
-            return redirect('login')
+            # The password was just set, so skip authenticate() and its second
+            # hash; name the backend that would have accepted the credentials
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+            messages.success(request, 'Welcome! Your account has been created.')
+            # A brand-new account has no profile yet: go create one
+            remember_profile(request, None)
+            messages.info(request, 'Let\'s complete your profile.')
+            return redirect('create_profile')
     else:
         form = UserCreationForm()
     return render(request, 'registration/signup.html', {'form': form})
\ No newline at end of file